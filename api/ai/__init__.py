@@ -1,6 +1,7 @@
 # AI Providers module
 from api.ai.base_provider import BaseAIProvider
 from api.ai.ollama_provider import OllamaProvider
+from api.ai.routing_provider import RoutingProvider, ProviderRoute
 
 def get_ai_provider(provider_name: str = "ollama") -> BaseAIProvider:
     """Фабрика для получения AI провайдера по имени"""
@@ -15,4 +16,4 @@ def get_ai_provider(provider_name: str = "ollama") -> BaseAIProvider:
         raise ValueError(f"Неизвестный AI провайдер: {provider_name}")
     return provider_class()
 
-__all__ = ['BaseAIProvider', 'OllamaProvider', 'get_ai_provider']
+__all__ = ['BaseAIProvider', 'OllamaProvider', 'RoutingProvider', 'ProviderRoute', 'get_ai_provider']
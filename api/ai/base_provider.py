@@ -4,18 +4,57 @@
 Определяет интерфейс, который должны реализовать все провайдеры.
 """
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
 import re
+import time
+
+from api.ai.metrics import metrics_registry
+
+
+# Разбор ответа и очистка markdown выполняются для каждой карточки:
+# шаблоны компилируются один раз
+_TITLE_RE = re.compile(r'^[*_]*[^:\n\r]{2,30}[:*_ \t]*')
+_BOLD_STAR_RE = re.compile(r'\*\*(.+?)\*\*')
+_BOLD_UNDERSCORE_RE = re.compile(r'__(.+?)__')
+_ITALIC_STAR_RE = re.compile(r'\*(.+?)\*')
+_ITALIC_UNDERSCORE_RE = re.compile(r'_(.+?)_')
+_HEADING_RE = re.compile(r'^#+\s+', re.MULTILINE)
+_LIST_MARKER_RE = re.compile(r'^\s*[\*\-\+]\s+', re.MULTILINE)
+_TABLE_RULE_RE = re.compile(r'\|[\s-]+\|')
+
+
+@lru_cache(maxsize=32)
+def _context_split_re(delimiter: str):
+    """Шаблон разделителя контекста: пользовательский + стандартные варианты"""
+    # dict.fromkeys: без дубликатов и пустых строк, в постоянном порядке
+    patterns = dict.fromkeys(p for p in (delimiter, 'КОНТЕКСТ', 'CONTEXT') if p)
+    return re.compile(r'[*_]*(' + '|'.join(re.escape(p) for p in patterns) + r')[:*_]*', re.IGNORECASE)
 
 
 @dataclass
 class GenerationResult:
-    """Результат генерации AI"""
+    """Результат генерации AI (текст + метрики запроса, время в секундах)"""
     translation: str
     context: str = ""
     raw_response: str = ""
     model_used: str = ""
+    provider: str = ""
+    latency: float = 0.0               # Полное время запроса (wall clock)
+    time_to_first_token: float = 0.0   # Без стриминга: загрузка модели + prefill
+    queue_wait: float = 0.0            # Ожидание на сервере/в сети сверх времени генерации
+    load_duration: float = 0.0         # Загрузка модели в память
+    prompt_eval_duration: float = 0.0  # Prefill (обработка промпта)
+    eval_duration: float = 0.0         # Decode (генерация токенов)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    
+    @property
+    def tokens_per_sec(self) -> float:
+        """Скорость decode (или по полному времени, если decode неизвестен)"""
+        duration = self.eval_duration or self.latency
+        return self.completion_tokens / duration if self.completion_tokens and duration else 0.0
 
 
 class BaseAIProvider(ABC):
@@ -24,6 +63,12 @@ class BaseAIProvider(ABC):
     Наследники: OllamaProvider, OpenRouterProvider, GoogleProvider
     """
     
+    # Сколько запросов провайдер выдерживает одновременно (пакетная очистка текста)
+    max_concurrency = 1
+    
+    # Умеет ли провайдер считать эмбеддинги (семантический поиск дубликатов)
+    supports_embeddings = False
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -53,14 +98,14 @@ class BaseAIProvider(ABC):
     
     @abstractmethod
     def generate(self, prompt: str, model: str = None, 
-                 timeout: float = 45) -> str:
+                 timeout: float = None) -> str:
         """
         Генерирует ответ на промпт.
         
         Args:
             prompt: Текст промпта
             model: Имя модели (если None, используется дефолтная)
-            timeout: Таймаут в секундах
+            timeout: Таймаут в секундах (None - адаптивный, по наблюдаемым задержкам)
             
         Returns:
             Сгенерированный текст
@@ -70,6 +115,35 @@ class BaseAIProvider(ABC):
         """
         pass
     
+    def generate_result(self, prompt: str, model: str = None,
+                        timeout: float = None) -> GenerationResult:
+        """
+        Генерирует ответ и возвращает его вместе с метриками.
+        Базовая реализация измеряет только полное время вызова generate();
+        провайдеры, отдающие метрики API, переопределяют этот метод.
+        """
+        start = time.time()
+        try:
+            text = self.generate(prompt, model, timeout=timeout)
+        except Exception as e:
+            metrics_registry.observe_error(self.name, model, e)
+            raise
+        result = GenerationResult(
+            translation=text, raw_response=text, model_used=model or "",
+            provider=self.name, latency=time.time() - start
+        )
+        metrics_registry.observe(result)
+        return result
+    
+    def embed(self, texts: List[str], model: str = None) -> List[List[float]]:
+        """
+        Эмбеддинги текстов (по одному вектору на текст, в том же порядке).
+        
+        Raises:
+            NotImplementedError: Провайдер не поддерживает эмбеддинги
+        """
+        raise NotImplementedError(f"{self.name}: эмбеддинги не поддерживаются")
+    
     def translate(self, phrase: str, translate_prompt: str, 
                   model: str = None) -> Tuple[str, str]:
         """
@@ -110,23 +184,13 @@ class BaseAIProvider(ABC):
     
     def _extract_translation_and_context(self, text: str, delimiter: str = "КОНТЕКСТ") -> Tuple[str, str]:
         """Извлекает перевод и контекст из ответа AI"""
-        
-        # Формируем паттерн для разделителя контекста
-        # Добавляем стандартные варианты для надежности + пользовательский delimiter
-        context_patterns = [delimiter, 'КОНТЕКСТ', 'CONTEXT']
-        # Убираем дубликаты и пустые строки, экранируем для regex
-        unique_patterns = list(set([p for p in context_patterns if p]))
-        escaped_patterns = [re.escape(p) for p in unique_patterns]
-        
-        context_regex = r'[*_]*(' + '|'.join(escaped_patterns) + r')[:*_]*'
-        
-        parts = re.split(context_regex, text, maxsplit=1, flags=re.IGNORECASE)
+        parts = _context_split_re(delimiter).split(text, maxsplit=1)
         
         # Первая часть - это перевод. 
         # Автоматически убираем любой заголовок в начале, если он есть (текст до первого двоеточия)
         # Паттерн ищет: начало строки, возможные *, затем любые символы кроме двоеточия (2-30 шт), двоеточие
         translation_part = parts[0].strip()
-        translation = re.sub(r'^[*_]*[^:\n\r]{2,30}[:*_ \t]*', '', translation_part, count=1).strip()
+        translation = _TITLE_RE.sub('', translation_part, count=1).strip()
         
         # Если после очистки ничего не осталось (вдруг перевод был очень коротким и совпал с паттерном), 
         # возвращаем оригинал
@@ -144,24 +208,34 @@ class BaseAIProvider(ABC):
         return translation, context
     
     def _clean_markdown(self, text: str) -> str:
-        """Убирает markdown разметку из текста"""
-        
-        # Убираем жирный текст
-        text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-        text = re.sub(r'__(.+?)__', r'\1', text)
-        
-        # Убираем курсив
-        text = re.sub(r'\*(.+?)\*', r'\1', text)
-        text = re.sub(r'_(.+?)_', r'\1', text)
-        
-        # Убираем заголовки
-        text = re.sub(r'^#+\s+', '', text, flags=re.MULTILINE)
-        
-        # Убираем маркеры списков
-        text = re.sub(r'^\s*[\*\-\+]\s+', '', text, flags=re.MULTILINE)
-        
-        # Убираем таблицы
-        text = re.sub(r'\|[\s-]+\|', '', text)
-        text = re.sub(r'\|', '', text)
+        """
+        Убирает markdown разметку из текста.
+        Проходы идут в прежнем порядке; проход пропускается, если в тексте
+        нет его символа (обычный перевод без разметки - ни одного regex).
+        """
+        if '*' in text:
+            # Жирный текст
+            text = _BOLD_STAR_RE.sub(r'\1', text)
+        if '_' in text:
+            text = _BOLD_UNDERSCORE_RE.sub(r'\1', text)
+        
+        # Курсив
+        if '*' in text:
+            text = _ITALIC_STAR_RE.sub(r'\1', text)
+        if '_' in text:
+            text = _ITALIC_UNDERSCORE_RE.sub(r'\1', text)
+        
+        # Заголовки
+        if '#' in text:
+            text = _HEADING_RE.sub('', text)
+        
+        # Маркеры списков
+        if '-' in text or '*' in text or '+' in text:
+            text = _LIST_MARKER_RE.sub('', text)
+        
+        # Таблицы
+        if '|' in text:
+            text = _TABLE_RULE_RE.sub('', text)
+            text = text.replace('|', '')
         
         return text.strip()
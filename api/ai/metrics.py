@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики AI провайдеров.
+Счетчики и гистограммы по (провайдер, модель): задержка, время до первого
+токена, загрузка модели, prefill, decode, ожидание в очереди, токены/сек.
+"""
+import threading
+from collections import deque
+from typing import Dict, List, Tuple
+
+from api.latency import percentile
+
+
+class Histogram:
+    """Гистограмма на скользящем окне последних значений + общий счетчик и сумма"""
+
+    def __init__(self, window: int = 500):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> float:
+        return percentile(list(self.values), p)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+# Поля GenerationResult, которые попадают в гистограммы
+HISTOGRAM_FIELDS = (
+    "latency", "time_to_first_token", "queue_wait", "load_duration",
+    "prompt_eval_duration", "eval_duration", "tokens_per_sec",
+)
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр метрик генерации"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str, str], float] = {}
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+
+    def _inc(self, key: Tuple[str, str, str], value: float = 1):
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _hist(self, key: Tuple[str, str, str]) -> Histogram:
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = Histogram()
+        return hist
+
+    def observe(self, result):
+        """Учитывает успешную генерацию (GenerationResult)"""
+        provider, model = result.provider or "?", result.model_used or "default"
+        with self._lock:
+            self._inc((provider, model, "requests"))
+            self._inc((provider, model, "prompt_tokens"), result.prompt_tokens)
+            self._inc((provider, model, "completion_tokens"), result.completion_tokens)
+            for name in HISTOGRAM_FIELDS:
+                value = getattr(result, name)
+                if value:
+                    self._hist((provider, model, name)).observe(value)
+
+    def observe_error(self, provider: str, model: str, error: Exception):
+        """Учитывает ошибку генерации"""
+        with self._lock:
+            self._inc((provider or "?", model or "default", "requests"))
+            self._inc((provider or "?", model or "default", "errors"))
+
+    def snapshot(self) -> List[Dict]:
+        """Сводка по каждой паре (провайдер, модель) для окна статистики"""
+        with self._lock:
+            pairs = sorted({(p, m) for p, m, _ in self._counters})
+            rows = []
+            for provider, model in pairs:
+                def hist(name):
+                    return self._histograms.get((provider, model, name), Histogram())
+                latency = hist("latency")
+                rows.append({
+                    "provider": provider,
+                    "model": model,
+                    "requests": int(self._counters.get((provider, model, "requests"), 0)),
+                    "errors": int(self._counters.get((provider, model, "errors"), 0)),
+                    "completion_tokens": int(self._counters.get((provider, model, "completion_tokens"), 0)),
+                    "latency_p50": latency.percentile(50),
+                    "latency_p95": latency.percentile(95),
+                    "ttft_p50": hist("time_to_first_token").percentile(50),
+                    "queue_wait_p95": hist("queue_wait").percentile(95),
+                    "load_p50": hist("load_duration").percentile(50),
+                    "prefill_p50": hist("prompt_eval_duration").percentile(50),
+                    "decode_p50": hist("eval_duration").percentile(50),
+                    "tokens_per_sec": hist("tokens_per_sec").mean,
+                })
+            return rows
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Глобальный реестр метрик
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Выбор модели под запрос.
+Короткие фразы - быстрой маленькой модели, длинные предложения с
+контекстом - более крупной. Учитывает наблюдаемые задержки и ошибки моделей.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from api.ai.metrics import percentile
+
+
+class ModelRouter:
+    """
+    Политика выбора модели по правилам из настроек.
+
+    Правило (dict), все поля кроме model необязательны:
+        model: имя модели
+        provider: имя провайдера ("Ollama", "OpenRouter"), по умолчанию любой
+        min_words / max_words: границы длины фразы в словах
+        context: True/False - только с контекстом / только без
+        max_latency: модель пропускается, если ее p95 (сек) выше
+        max_failure_rate: модель пропускается, если доля ошибок выше (0..1)
+
+    Правила проверяются по порядку, побеждает первое подходящее.
+    """
+
+    WINDOW = 30       # Сколько последних вызовов учитывать
+    MIN_SAMPLES = 5   # Меньше - статистика не влияет на выбор
+    STATS_TTL = 300   # Старые замеры забываются: исключенная модель снова получит шанс
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, deque] = {}
+
+    def record(self, model: str, latency: float, ok: bool):
+        """Сохраняет результат вызова модели"""
+        if not model:
+            return
+        with self._lock:
+            window = self._stats.setdefault(model, deque(maxlen=self.WINDOW))
+            window.append((time.time(), latency, ok))
+
+    def model_stats(self, model: str) -> Optional[Dict[str, float]]:
+        """p95 задержки и доля ошибок модели (None если данных мало)"""
+        cutoff = time.time() - self.STATS_TTL
+        with self._lock:
+            samples = [(latency, ok) for t, latency, ok in self._stats.get(model, ()) if t >= cutoff]
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        latencies = [latency for latency, ok in samples if ok]
+        failures = sum(1 for _, ok in samples if not ok)
+        return {
+            "p95": percentile(latencies, 95) if latencies else 0.0,
+            "failure_rate": failures / len(samples),
+        }
+
+    def _rule_matches(self, rule: Dict, provider_name: str, words: int, with_context: bool) -> bool:
+        if not rule.get("model"):
+            return False
+        provider = rule.get("provider")
+        if provider and provider.lower() != provider_name.lower():
+            return False
+        if "min_words" in rule and words < int(rule["min_words"]):
+            return False
+        if "max_words" in rule and words > int(rule["max_words"]):
+            return False
+        if rule.get("context") is not None and bool(rule["context"]) != bool(with_context):
+            return False
+        return True
+
+    def _model_is_healthy(self, rule: Dict) -> bool:
+        stats = self.model_stats(rule["model"])
+        if stats is None:
+            return True
+        if "max_failure_rate" in rule and stats["failure_rate"] > float(rule["max_failure_rate"]):
+            return False
+        if "max_latency" in rule and stats["p95"] > float(rule["max_latency"]):
+            return False
+        return True
+
+    def select(self, rules: List[Dict], provider_name: str, phrase: str,
+               with_context: bool, default_model: Optional[str]) -> Optional[str]:
+        """
+        Выбирает модель для фразы.
+
+        Returns:
+            Модель первого подходящего правила или default_model
+        """
+        words = len(phrase.split())
+        for rule in rules or []:
+            if not isinstance(rule, dict):
+                continue
+            if self._rule_matches(rule, provider_name, words, with_context) and self._model_is_healthy(rule):
+                return rule["model"]
+        return default_model
+
+
+# Синглтон для удобства
+model_router = ModelRouter()
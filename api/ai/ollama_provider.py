@@ -3,21 +3,38 @@
 Ollama AI провайдер.
 Локальный AI через Ollama API.
 """
+import time
 import requests
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from api.ai.base_provider import BaseAIProvider
+from api.ai.base_provider import BaseAIProvider, GenerationResult
+from api.ai.metrics import metrics_registry
+from api.latency import timeout_policy
+
+NS_PER_SEC = 1e9
 
 
 class OllamaProvider(BaseAIProvider):
     """Провайдер для локального Ollama"""
     
     DEFAULT_MODEL = "gemma3:1b"
+    DEFAULT_EMBED_MODEL = "nomic-embed-text"
     API_URL = "http://localhost:11434"
     
+    # Границы адаптивного таймаута генерации, сек
+    TIMEOUT_FLOOR = 10
+    TIMEOUT_CEILING = 60
+    COLD_TIMEOUT = 180     # Модель не загружена (по /api/ps): загрузка на CPU может занять минуты
+    KEEP_ALIVE = 300       # Ollama выгружает модель после 5 минут простоя
+    
+    max_concurrency = 2    # OLLAMA_NUM_PARALLEL: больше запросов просто ждут в очереди сервера
+    supports_embeddings = True
+    EMBED_TIMEOUT = 60
+    
     def __init__(self, api_url: str = None):
         self.api_url = api_url or self.API_URL
         self.default_model = self.DEFAULT_MODEL
+        self._last_used: Dict[str, float] = {}
     
     @property
     def name(self) -> str:
@@ -54,19 +71,65 @@ class OllamaProvider(BaseAIProvider):
             return []
     
     def generate(self, prompt: str, model: str = None, 
-                 timeout: float = 45) -> str:
+                 timeout: float = None) -> str:
         """
         Генерирует ответ через Ollama.
         
         Args:
             prompt: Текст промпта
             model: Имя модели (если None, используется default)
-            timeout: Таймаут в секундах
+            timeout: Таймаут в секундах (None - адаптивный)
             
         Returns:
             Сгенерированный текст
         """
+        return self.generate_result(prompt, model, timeout=timeout).raw_response
+    
+    def is_model_warm(self, model: str) -> bool:
+        """True если модель использовалась недавно и, скорее всего, еще в памяти"""
+        last_used = self._last_used.get(model)
+        return last_used is not None and time.time() - last_used < self.KEEP_ALIVE
+    
+    def loaded_models(self) -> Optional[List[str]]:
+        """Модели, загруженные в память Ollama (/api/ps); None - узнать не удалось"""
+        try:
+            response = requests.get(f"{self.api_url}/api/ps", timeout=2.0)
+            if response.status_code != 200:
+                return None  # Старая версия Ollama без /api/ps
+            return [model.get("name", "") for model in response.json().get("models", [])]
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _full_name(model: str) -> str:
+        """Имя модели с тегом, как в /api/ps (llama3 -> llama3:latest)"""
+        return model if ":" in model else f"{model}:latest"
+    
+    def _deadline(self, model: str, timeout: float = None):
+        """
+        (connect, read) таймаут. Долгий COLD_TIMEOUT - только если Ollama
+        подтверждает, что модель не загружена; если /api/ps не ответил
+        (старая версия или сервер завис) - обычный потолок, чтобы сбой
+        обнаруживался быстро.
+        """
+        if timeout is not None:
+            return (timeout_policy.CONNECT_TIMEOUT, timeout)
+        if not self.is_model_warm(model):
+            loaded = self.loaded_models()
+            if loaded is None:
+                return (timeout_policy.CONNECT_TIMEOUT, self.TIMEOUT_CEILING)
+            if self._full_name(model) not in {self._full_name(name) for name in loaded}:
+                return (timeout_policy.CONNECT_TIMEOUT, self.COLD_TIMEOUT)
+        return timeout_policy.timeout(f"ollama:{model}", self.TIMEOUT_FLOOR, self.TIMEOUT_CEILING)
+    
+    def generate_result(self, prompt: str, model: str = None,
+                        timeout: float = None) -> GenerationResult:
+        """
+        Генерирует ответ через Ollama и собирает метрики из ответа API
+        (load_duration, prompt_eval_duration, eval_duration, eval_count).
+        """
         model_to_use = model or self.default_model
+        deadline = self._deadline(model_to_use, timeout)
         
         payload = {
             "model": model_to_use,
@@ -74,31 +137,104 @@ class OllamaProvider(BaseAIProvider):
             "stream": False
         }
         
+        start = time.time()
         try:
             response = requests.post(
                 f"{self.api_url}/api/generate",
                 json=payload,
-                timeout=timeout
+                timeout=deadline
             )
             
             if response.status_code != 200:
                 error = response.json().get('error', response.text)
                 raise Exception(f"Ollama Error: {error}")
             
-            result = response.json().get("response", "").strip()
+            data = response.json()
+            result = data.get("response", "").strip()
             if not result:
                 raise Exception("Ollama вернул пустой ответ")
             
-            return result
-            
-        except requests.exceptions.Timeout:
-            raise Exception(f"Ollama: превышено время ожидания ({timeout}с)")
         except requests.exceptions.ConnectionError:
-            raise Exception("OLLAMA_CONNECT_ERROR")
+            error = Exception("OLLAMA_CONNECT_ERROR")
+            metrics_registry.observe_error(self.name, model_to_use, error)
+            raise error
+        except requests.exceptions.Timeout:
+            timeout_policy.record_timeout(f"ollama:{model_to_use}")
+            # Возможно, модель выгрузили: следующий запрос получит время на загрузку
+            self._last_used.pop(model_to_use, None)
+            error = Exception(f"Ollama: превышено время ожидания ({deadline[1]:.0f}с)")
+            metrics_registry.observe_error(self.name, model_to_use, error)
+            raise error
         except Exception as e:
+            metrics_registry.observe_error(self.name, model_to_use, e)
             if "canceled" in str(e).lower():
                 raise Exception("Генерация прервана")
             raise
+        
+        latency = time.time() - start
+        generation = self._build_result(data, result, model_to_use, latency)
+        metrics_registry.observe(generation)
+        # Время загрузки модели не входит в распределение "теплых" запросов
+        timeout_policy.record(f"ollama:{model_to_use}", max(0.0, latency - generation.load_duration))
+        self._last_used[model_to_use] = time.time()
+        return generation
+    
+    def embed(self, texts: List[str], model: str = None) -> List[List[float]]:
+        """
+        Эмбеддинги текстов. Пакетом через /api/embed; старые версии
+        Ollama (404) - по одному через /api/embeddings.
+        
+        Raises:
+            Exception: OLLAMA_CONNECT_ERROR или ошибка API
+        """
+        if not texts:
+            return []
+        model_to_use = model or self.DEFAULT_EMBED_MODEL
+        deadline = (timeout_policy.CONNECT_TIMEOUT, self.EMBED_TIMEOUT)
+        try:
+            response = requests.post(f"{self.api_url}/api/embed",
+                                     json={"model": model_to_use, "input": list(texts)}, timeout=deadline)
+            if response.status_code == 404 and "model" not in response.text:
+                vectors = []
+                for text in texts:
+                    legacy = requests.post(f"{self.api_url}/api/embeddings",
+                                           json={"model": model_to_use, "prompt": text}, timeout=deadline)
+                    if legacy.status_code != 200:
+                        raise Exception(f"Ollama Error: {legacy.json().get('error', legacy.text)}")
+                    vectors.append(legacy.json()["embedding"])
+                return vectors
+            if response.status_code != 200:
+                raise Exception(f"Ollama Error: {response.json().get('error', response.text)}")
+            vectors = response.json().get("embeddings", [])
+        except requests.exceptions.ConnectionError:
+            raise Exception("OLLAMA_CONNECT_ERROR")
+        except requests.exceptions.Timeout:
+            raise Exception(f"Ollama: превышено время ожидания ({self.EMBED_TIMEOUT}с)")
+        if len(vectors) != len(texts):
+            raise Exception("Ollama вернул неполный ответ эмбеддингов")
+        return vectors
+    
+    def _build_result(self, data: dict, text: str, model: str, latency: float) -> GenerationResult:
+        """Переводит метрики Ollama (наносекунды) в GenerationResult"""
+        load = data.get("load_duration", 0) / NS_PER_SEC
+        prefill = data.get("prompt_eval_duration", 0) / NS_PER_SEC
+        decode = data.get("eval_duration", 0) / NS_PER_SEC
+        server_total = data.get("total_duration", 0) / NS_PER_SEC
+        return GenerationResult(
+            translation=text,
+            raw_response=text,
+            model_used=data.get("model", model),
+            provider=self.name,
+            latency=latency,
+            # Без стриминга первый токен появляется после загрузки и prefill
+            time_to_first_token=load + prefill,
+            queue_wait=max(0.0, latency - server_total) if server_total else 0.0,
+            load_duration=load,
+            prompt_eval_duration=prefill,
+            eval_duration=decode,
+            prompt_tokens=data.get("prompt_eval_count", 0),
+            completion_tokens=data.get("eval_count", 0),
+        )
 
 
 # Синглтон для удобства
@@ -3,11 +3,14 @@
 OpenRouter AI провайдер.
 Доступ к моделям через OpenRouter API (openai-compatible).
 """
+import time
 import requests
 import json
 from typing import List, Tuple
 
-from api.ai.base_provider import BaseAIProvider
+from api.ai.base_provider import BaseAIProvider, GenerationResult
+from api.ai.metrics import metrics_registry
+from api.latency import timeout_policy
 
 
 class OpenRouterProvider(BaseAIProvider):
@@ -15,6 +18,13 @@ class OpenRouterProvider(BaseAIProvider):
     
     API_URL = "https://openrouter.ai/api/v1"
     
+    # Границы адаптивного таймаута генерации, сек
+    TIMEOUT_FLOOR = 10
+    TIMEOUT_CEILING = 90
+    CONNECT_TIMEOUT = 5
+    
+    max_concurrency = 4
+    
     def __init__(self, api_key: str, model: str = "openai/gpt-4o-mini"):
         self.api_key = api_key
         self.model = model
@@ -50,14 +60,27 @@ class OpenRouterProvider(BaseAIProvider):
         except Exception:
             return []
     
-    def generate(self, prompt: str, model: str = None, timeout: float = 60) -> str:
+    def generate(self, prompt: str, model: str = None, timeout: float = None) -> str:
         """
         Генерирует ответ через OpenRouter.
         """
+        return self.generate_result(prompt, model, timeout=timeout).raw_response
+    
+    def generate_result(self, prompt: str, model: str = None,
+                        timeout: float = None) -> GenerationResult:
+        """
+        Генерирует ответ через OpenRouter и собирает метрики (usage).
+        """
         if not self.api_key:
             raise Exception("API ключ OpenRouter не задан")
             
         model_to_use = model or self.model
+        endpoint = f"openrouter:{model_to_use}"
+        if timeout is not None:
+            deadline = (self.CONNECT_TIMEOUT, timeout)
+        else:
+            deadline = timeout_policy.timeout(endpoint, self.TIMEOUT_FLOOR, self.TIMEOUT_CEILING,
+                                              connect=self.CONNECT_TIMEOUT)
         
         payload = {
             "model": model_to_use,
@@ -67,12 +90,13 @@ class OpenRouterProvider(BaseAIProvider):
             "temperature": 0.7
         }
         
+        start = time.time()
         try:
             # Используем сессию для переиспользования соединения
             response = self.session.post(
                 f"{self.API_URL}/chat/completions",
                 data=json.dumps(payload),
-                timeout=timeout
+                timeout=deadline
             )
             
             if response.status_code != 200:
@@ -91,11 +115,31 @@ class OpenRouterProvider(BaseAIProvider):
                 raise Exception("OpenRouter вернул пустой ответ")
                 
             content = choices[0].get("message", {}).get("content", "").strip()
-            return content
             
-        except requests.exceptions.Timeout:
-            raise Exception(f"OpenRouter: превышено время ожидания ({timeout}с)")
         except requests.exceptions.ConnectionError:
-            raise Exception("Ошибка подключения к OpenRouter")
+            error = Exception("Ошибка подключения к OpenRouter")
+            metrics_registry.observe_error(self.name, model_to_use, error)
+            raise error
+        except requests.exceptions.Timeout:
+            timeout_policy.record_timeout(endpoint)
+            error = Exception(f"OpenRouter: превышено время ожидания ({deadline[1]:.0f}с)")
+            metrics_registry.observe_error(self.name, model_to_use, error)
+            raise error
         except Exception as e:
+            metrics_registry.observe_error(self.name, model_to_use, e)
             raise Exception(f"Ошибка генерации OpenRouter: {e}")
+        
+        latency = time.time() - start
+        timeout_policy.record(endpoint, latency)
+        usage = result.get("usage") or {}
+        generation = GenerationResult(
+            translation=content,
+            raw_response=content,
+            model_used=result.get("model", model_to_use),
+            provider=self.name,
+            latency=latency,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+        metrics_registry.observe(generation)
+        return generation
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Маршрутизирующий AI провайдер.
+Оборачивает несколько провайдеров: переключение на резервный при ошибке
+подключения, хеджирование медленных запросов и временное исключение
+нездоровых провайдеров.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from api.ai.base_provider import BaseAIProvider, GenerationResult
+from api.ai.metrics import percentile
+
+
+# Маркеры ошибок, при которых имеет смысл переключиться на другой провайдер
+FAILOVER_ERROR_MARKERS = ("CONNECT_ERROR", "подключения", "время ожидания")
+
+
+def is_failover_error(error: Exception) -> bool:
+    """True если ошибка связана с недоступностью/зависанием провайдера"""
+    text = str(error)
+    return any(marker in text for marker in FAILOVER_ERROR_MARKERS)
+
+
+@dataclass
+class ProviderRoute:
+    """Провайдер + модель + состояние здоровья"""
+    provider: BaseAIProvider
+    model: Optional[str] = None
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=50))
+
+    @property
+    def label(self) -> str:
+        return f"{self.provider.name}:{self.model or 'default'}"
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class RoutingProvider(BaseAIProvider):
+    """
+    Провайдер, распределяющий запросы между несколькими провайдерами.
+
+    - Failover: при ошибке подключения/таймауте запрос уходит следующему по приоритету.
+    - Hedging: если первый провайдер не ответил за p95 своих прошлых ответов,
+      параллельно запускается второй; берется первый успешный ответ.
+    - Ejection: после нескольких ошибок подряд провайдер исключается на время.
+    """
+
+    MIN_SAMPLES_FOR_P95 = 5
+    DEFAULT_HEDGE_DELAY = 8.0
+    MAX_HEDGE_DELAY = 20.0
+
+    def __init__(self, routes: List[ProviderRoute], hedging: bool = False,
+                 hedge_min_delay: float = 1.5, max_failures: int = 3,
+                 eject_seconds: float = 30.0):
+        if not routes:
+            raise ValueError("RoutingProvider требует хотя бы один провайдер")
+        self.routes = routes
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> BaseAIProvider:
+        return self.routes[0].provider
+
+    @property
+    def name(self) -> str:
+        # Имя основного провайдера: от него зависит выбор модели в воркерах
+        return self.primary.name
+
+    @property
+    def is_local(self) -> bool:
+        return self.primary.is_local
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.primary.max_concurrency
+
+    @property
+    def supports_embeddings(self) -> bool:
+        return self.primary.supports_embeddings
+
+    def embed(self, texts: List[str], model: str = None) -> List[List[float]]:
+        return self.primary.embed(texts, model)
+
+    def is_available(self) -> bool:
+        return any(route.provider.is_available() for route in self.routes)
+
+    def get_models(self) -> List[str]:
+        return self.primary.get_models()
+
+    # === Здоровье провайдеров ===
+
+    def _record_success(self, route: ProviderRoute, elapsed: float):
+        with self._lock:
+            route.consecutive_failures = 0
+            route.ejected_until = 0.0
+            route.latencies.append(elapsed)
+
+    def _record_failure(self, route: ProviderRoute, error: Exception):
+        with self._lock:
+            route.consecutive_failures += 1
+            if route.consecutive_failures >= self.max_failures:
+                route.ejected_until = time.time() + self.eject_seconds
+                print(f"⚠️ Провайдер {route.label} временно исключен ({self.eject_seconds:.0f}с): {error}")
+
+    def _candidates(self) -> List[ProviderRoute]:
+        """Здоровые провайдеры по приоритету (если здоровых нет - все)"""
+        now = time.time()
+        with self._lock:
+            healthy = [r for r in self.routes if r.is_healthy(now)]
+        return healthy or list(self.routes)
+
+    def hedge_delay(self, route: ProviderRoute, timeout: float = None) -> float:
+        """Через сколько секунд без ответа запускать запасной запрос"""
+        with self._lock:
+            samples = list(route.latencies)
+        if len(samples) < self.MIN_SAMPLES_FOR_P95:
+            delay = self.DEFAULT_HEDGE_DELAY
+        else:
+            delay = percentile(samples, 95)
+        cap = timeout / 2 if timeout else self.MAX_HEDGE_DELAY
+        return min(max(delay, self.hedge_min_delay), cap)
+
+    # === Генерация ===
+
+    def generate(self, prompt: str, model: str = None,
+                 timeout: float = None) -> str:
+        """Генерирует ответ (см. generate_result)"""
+        return self.generate_result(prompt, model, timeout=timeout).raw_response
+
+    def generate_result(self, prompt: str, model: str = None,
+                        timeout: float = None) -> GenerationResult:
+        """
+        Генерирует ответ с учетом приоритетов, хеджирования и здоровья.
+        Параметр model относится к основному провайдеру.
+        Метрики записывает провайдер, который реально выполнил запрос.
+        """
+        candidates = self._candidates()
+        results = queue.Queue()
+
+        def attempt(route: ProviderRoute, route_model: Optional[str]):
+            start = time.time()
+            try:
+                result = route.provider.generate_result(prompt, route_model, timeout=timeout)
+                self._record_success(route, time.time() - start)
+                results.put((route, True, result))
+            except Exception as e:
+                self._record_failure(route, e)
+                results.put((route, False, e))
+
+        def launch():
+            route = candidates.pop(0)
+            route_model = model if route is self.routes[0] and model else route.model
+            threading.Thread(target=attempt, args=(route, route_model), daemon=True).start()
+            return route
+
+        first = launch()
+        pending = 1
+        hedged = False
+        last_error = None
+
+        while pending:
+            wait_for = None
+            if self.hedging and not hedged and candidates:
+                wait_for = self.hedge_delay(first, timeout)
+            try:
+                route, ok, value = results.get(timeout=wait_for)
+            except queue.Empty:
+                hedge_route = launch()
+                hedged = True
+                pending += 1
+                print(f"⏱ {first.label} не ответил за {wait_for:.1f}с, запасной запрос: {hedge_route.label}")
+                continue
+
+            pending -= 1
+            if ok:
+                # Проигравший запрос нельзя прервать (requests блокирующий),
+                # его ответ просто отбрасывается
+                return value
+
+            last_error = value
+            if pending == 0 and candidates and is_failover_error(value):
+                print(f"🔀 {route.label} недоступен, переключение на резервный провайдер")
+                launch()
+                pending += 1
+
+        raise last_error
@@ -3,15 +3,106 @@
 Модуль для работы с Anki через AnkiConnect API.
 """
 import os
+import json
+import time
 import requests
 import base64
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Tuple, Union
 from core.logger import debug_log
+from core.single_flight import SingleFlight
+from api.latency import timeout_policy
 
 # Константы
 MODEL_NAME = "YouTube"
 ANKI_CONNECT_URL = "http://localhost:8765"
-DEFAULT_TIMEOUT = 5
+
+# Тип записи: поля, стили и шаблон карточки (общие для AnkiConnect и .apkg)
+MODEL_FIELDS = ["Phrase", "Translation", "Context", "Sound"]
+MODEL_CSS = """
+.card {
+    font-family: 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
+    font-size: 20px;
+    text-align: center;
+}
+.phrase {
+    font-size: 32px;
+    font-weight: bold;
+    margin-bottom: 20px;
+    color: #ffffff;
+}
+.translation {
+    font-size: 24px;
+    margin-top: 20px;
+}
+.context {
+    font-size: 16px;
+    font-style: italic;
+    margin-top: 15px;
+    text-align: left;
+    display: inline-block;
+    max-width: 90%;
+    background-color: #333333;
+    color: #ffffff;
+    padding: 12px;
+    border-radius: 8px;
+    border: 1px solid #444;
+}
+.sound { margin-top: 10px; }
+"""
+CARD_TEMPLATES = [
+    {
+        "name": "Card 1",
+        "Front": '<div class="phrase">{{Phrase}}</div><div class="sound">{{Sound}}</div>',
+        "Back": '<div class="phrase">{{Phrase}}</div><hr id="answer"><div class="translation">{{Translation}}</div><div class="context">{{Context}}<div class="watermark" style="font-size: 10px; margin-top: 10px; text-align: right;"><a href="https://LanguageSage.github.io/Anki-card-andder/" style="color: #666; text-decoration: none;">Generated by Lerne Assistant</a></div></div>'
+    }
+]
+NOTE_TAGS = ["youtube", "german", "local-ai"]
+
+# Границы адаптивного таймаута (floor, ceiling) по действиям AnkiConnect, сек
+TIMEOUT_LIMITS = {
+    "version": (0.5, 3),
+    "modelNames": (1, 10),
+    "modelNamesAndIds": (1, 10),
+    "modelFieldNames": (1, 10),
+    "deckNames": (0.5, 15),
+    "getDeckStats": (1, 30),
+    "findNotes": (1, 20),
+    "notesInfo": (2, 30),
+    "notesModTime": (1, 20),
+    "cardsInfo": (2, 30),
+    "createDeck": (2, 15),
+    "multi": (5, 60),
+}
+DEFAULT_TIMEOUT_LIMITS = (2, 30)
+
+# Ошибки, означающие что Anki недоступен (а не что запрос неверный)
+CONNECTION_ERRORS = ("ANKI_CONNECT_ERROR", "ANKI_TIMEOUT_ERROR")
+
+# Экранирование в поиске Anki: \ и " внутри кавычек, * и _ - подстановочные знаки, : - поле
+_SEARCH_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "*": "\\*", "_": "\\_", ":": "\\:"})
+
+# Сколько заметок запрашивать в одном notesInfo / cardsInfo
+NOTES_INFO_CHUNK = 100
+# notesModTime отдает только ID и время изменения - порции крупнее
+NOTES_MOD_CHUNK = 1000
+# Колод в одном getDeckStats: на сотнях колод один запрос упирается в таймаут
+DECK_STATS_CHUNK = 50
+
+# Действия только для чтения: одинаковые одновременные запросы объединяются
+READ_ACTIONS = frozenset({
+    "version", "deckNames", "getDeckStats", "findNotes", "notesInfo",
+    "modelNames", "modelNamesAndIds", "modelFieldNames", "notesModTime", "cardsInfo",
+})
+
+
+def format_field(text: str) -> str:
+    """Текст -> значение поля заметки (переводы строк как <br>)"""
+    return text.replace('\n', '<br>')
+
+
+def is_connection_error(error) -> bool:
+    """Ошибка означает, что Anki недоступен (а не что заметка плохая)"""
+    return str(error) in CONNECTION_ERRORS
 
 
 class AnkiAPI:
@@ -21,15 +112,16 @@ class AnkiAPI:
         self.url = url
         self.model_name = MODEL_NAME
         self.session = requests.Session()
+        self._read_flight = SingleFlight("anki_read")
     
-    def _request(self, action: str, params: Dict = None, timeout: float = DEFAULT_TIMEOUT) -> Any:
+    def _request(self, action: str, params: Dict = None, timeout: float = None) -> Any:
         """
         Отправляет запрос к AnkiConnect.
         
         Args:
             action: Название действия API
             params: Параметры запроса
-            timeout: Таймаут в секундах
+            timeout: Фиксированный таймаут в секундах (None - адаптивный)
             
         Returns:
             Результат запроса
@@ -37,28 +129,56 @@ class AnkiAPI:
         Raises:
             Exception: При ошибке соединения или API
         """
+        if action in READ_ACTIONS:
+            key = (action, json.dumps(params, sort_keys=True, ensure_ascii=False))
+            return self._read_flight.do(key, self._send, action, params, timeout)
+        return self._send(action, params, timeout)
+    
+    def _send(self, action: str, params: Dict = None, timeout: float = None) -> Any:
+        """
+        Выполняет HTTP запрос к AnkiConnect (без объединения).
+        Чтение, не уложившееся в адаптивный дедлайн, повторяется один раз
+        с верхней границей: большие коллекции отвечают медленно, но отвечают.
+        """
         payload = {"action": action, "version": 6}
         if params:
             payload["params"] = params
         
-        try:
-            # Используем сессию для переиспользования соединения
-            response = self.session.post(self.url, json=payload, timeout=timeout)
-            result = response.json()
+        endpoint = f"anki:{action}"
+        floor, ceiling = TIMEOUT_LIMITS.get(action, DEFAULT_TIMEOUT_LIMITS)
+        if timeout is not None:
+            deadlines = [timeout]
+        else:
+            deadline = timeout_policy.timeout(endpoint, floor, ceiling)
+            deadlines = [deadline]
+            if action in READ_ACTIONS and deadline[1] < ceiling:
+                deadlines.append((deadline[0], ceiling))
+        
+        for attempt, deadline in enumerate(deadlines):
+            start = time.time()
+            try:
+                # Используем сессию для переиспользования соединения
+                response = self.session.post(self.url, json=payload, timeout=deadline)
+                result = response.json()
+            except requests.exceptions.ConnectionError:
+                raise Exception("ANKI_CONNECT_ERROR")
+            except requests.exceptions.Timeout:
+                timeout_policy.record_timeout(endpoint)
+                if attempt + 1 < len(deadlines):
+                    debug_log(f"⏱ AnkiConnect '{action}' не ответил за {deadline[1]:.1f}с, повтор", prefix="[API]")
+                    continue
+                raise Exception("ANKI_TIMEOUT_ERROR")
             
+            timeout_policy.record(endpoint, time.time() - start)
             if result.get("error"):
                 raise Exception(result["error"])
             
             return result.get("result")
-        except requests.exceptions.ConnectionError:
-            raise Exception("ANKI_CONNECT_ERROR")
-        except requests.exceptions.Timeout:
-            raise Exception("ANKI_TIMEOUT_ERROR")
     
     def is_available(self) -> bool:
         """Проверяет доступность AnkiConnect"""
         try:
-            self._request("version", timeout=0.5)
+            self._request("version")
             return True
         except Exception:
             return False
@@ -67,7 +187,15 @@ class AnkiAPI:
     
     def get_model_names(self) -> List[str]:
         """Получает список имен моделей"""
-        return self._request("modelNames", timeout=1) or []
+        return self._request("modelNames") or []
+    
+    def get_model_id(self, model_name: str = None) -> Optional[int]:
+        """ID типа записи в коллекции пользователя (None - нет такого или Anki недоступен)"""
+        name = model_name or self.model_name
+        try:
+            return (self._request("modelNamesAndIds") or {}).get(name)
+        except Exception:
+            return None
     
     def model_exists(self, model_name: str = None) -> bool:
         """Проверяет существование модели (регистронезависимо)"""
@@ -79,7 +207,7 @@ class AnkiAPI:
         """Получает список полей модели"""
         name = model_name or self.model_name
         try:
-            return self._request("modelFieldNames", {"modelName": name}, timeout=1) or []
+            return self._request("modelFieldNames", {"modelName": name}) or []
         except Exception:
             return []
 
@@ -91,47 +219,6 @@ class AnkiAPI:
         Returns:
             True если модель создана или уже существует
         """
-        required_fields = ["Phrase", "Translation", "Context", "Sound"]
-        css = """
-        .card {
-            font-family: 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
-            font-size: 20px;
-            text-align: center;
-        }
-        .phrase {
-            font-size: 32px;
-            font-weight: bold;
-            margin-bottom: 20px;
-            color: #ffffff;
-        }
-        .translation {
-            font-size: 24px;
-            margin-top: 20px;
-        }
-        .context {
-            font-size: 16px;
-            font-style: italic;
-            margin-top: 15px;
-            text-align: left;
-            display: inline-block;
-            max-width: 90%;
-            background-color: #333333;
-            color: #ffffff;
-            padding: 12px;
-            border-radius: 8px;
-            border: 1px solid #444;
-        }
-        .sound { margin-top: 10px; }
-        """
-        
-        card_templates = [
-            {
-                "name": "Card 1",
-                "Front": '<div class="phrase">{{Phrase}}</div><div class="sound">{{Sound}}</div>',
-                "Back": '<div class="phrase">{{Phrase}}</div><hr id="answer"><div class="translation">{{Translation}}</div><div class="context">{{Context}}<div class="watermark" style="font-size: 10px; margin-top: 10px; text-align: right;"><a href="https://LanguageSage.github.io/Anki-card-andder/" style="color: #666; text-decoration: none;">Generated by Lerne Assistant</a></div></div>'
-            }
-        ]
-
         existing_models = self.get_model_names()
         existing_models_lower = [m.lower().strip() for m in existing_models]
         target_lower = self.model_name.lower().strip()
@@ -144,7 +231,7 @@ class AnkiAPI:
             
             # Если модель существует, проверяем поля
             current_fields = self.get_model_field_names(actual_model_name)
-            missing_fields = [f for f in required_fields if f not in current_fields]
+            missing_fields = [f for f in MODEL_FIELDS if f not in current_fields]
             
             if missing_fields:
                 print(f"⚠️ В модели '{self.model_name}' отсутствуют поля: {missing_fields}. Попытка добавить...")
@@ -163,7 +250,7 @@ class AnkiAPI:
                 self._request("updateModelStyling", {
                     "model": {
                         "name": self.model_name,
-                        "css": css
+                        "css": MODEL_CSS
                     }
                 })
                 self._request("updateModelTemplates", {
@@ -171,8 +258,8 @@ class AnkiAPI:
                         "name": self.model_name,
                         "templates": {
                             "Card 1": {
-                                "Front": card_templates[0]["Front"],
-                                "Back": card_templates[0]["Back"]
+                                "Front": CARD_TEMPLATES[0]["Front"],
+                                "Back": CARD_TEMPLATES[0]["Back"]
                             }
                         }
                     }
@@ -188,9 +275,9 @@ class AnkiAPI:
         try:
             self._request("createModel", {
                 "modelName": self.model_name,
-                "inOrderFields": required_fields,
-                "css": css,
-                "cardTemplates": card_templates
+                "inOrderFields": MODEL_FIELDS,
+                "css": MODEL_CSS,
+                "cardTemplates": CARD_TEMPLATES
             })
             print(f"✅ Тип записи '{self.model_name}' успешно создан!")
             return True
@@ -200,6 +287,21 @@ class AnkiAPI:
     
     # === Колоды ===
     
+    def deck_names(self) -> List[str]:
+        """Имена колод (ошибки не скрываются)"""
+        return list(self._request("deckNames") or [])
+    
+    def deck_stats(self, deck_names: List[str], chunk_size: int = DECK_STATS_CHUNK) -> Dict[str, int]:
+        """Количество карточек в колодах {имя: количество}, getDeckStats порциями"""
+        deck_counts = {}
+        for start in range(0, len(deck_names), chunk_size):
+            stats = self._request("getDeckStats", {"decks": deck_names[start:start + chunk_size]}) or {}
+            for stat in stats.values():
+                name = stat.get("name")
+                if name:
+                    deck_counts[name] = stat.get("total_in_deck", 0)
+        return deck_counts
+    
     def get_deck_names(self, with_counts: bool = True) -> Union[List[str], str]:
         """
         Получает список колод.
@@ -211,20 +313,12 @@ class AnkiAPI:
             Список колод или "ANKI_CONNECT_ERROR"
         """
         try:
-            deck_names = self._request("deckNames", timeout=0.5) or []
+            deck_names = self.deck_names()
             
             if not with_counts:
                 return sorted(deck_names)
             
-            # Получаем статистику
-            stats = self._request("getDeckStats", {"decks": deck_names}, timeout=1.0) or {}
-            
-            deck_counts = {}
-            for deck_id, stat in stats.items():
-                name = stat.get("name")
-                count = stat.get("total_in_deck", 0)
-                if name:
-                    deck_counts[name] = count
+            deck_counts = self.deck_stats(deck_names)
             
             # Формируем список "Имя (Количество)"
             formatted = [f"{name} ({deck_counts.get(name, 0)})" for name in deck_names]
@@ -242,7 +336,7 @@ class AnkiAPI:
             return False
         
         try:
-            self._request("createDeck", {"deck": deck_name.strip()}, timeout=8)
+            self._request("createDeck", {"deck": deck_name.strip()})
             return True
         except Exception as e:
             print(f"❌ Ошибка создания колоды: {e}")
@@ -266,16 +360,87 @@ class AnkiAPI:
     
     # === Заметки ===
     
+    @staticmethod
+    def phrase_query(phrase: str) -> str:
+        """Поисковый запрос Anki по полю Phrase (фраза ищется буквально)"""
+        return f'Phrase:"{phrase.translate(_SEARCH_ESCAPES)}"'
+    
     def find_notes(self, phrase: str) -> List[int]:
         """Ищет ID заметок с такой же фразой"""
         try:
-            escaped_phrase = phrase.replace('"', '\\"')
-            query = f'Phrase:"{escaped_phrase}"'
-            return self._request("findNotes", {"query": query}, timeout=3) or []
+            query = self.phrase_query(phrase)
+            # Копия: результат может быть общим для нескольких вызывающих
+            return list(self._request("findNotes", {"query": query}) or [])
         except Exception as e:
             print(f"⚠️ Ошибка поиска заметок: {e}")
             return []
     
+    def find_exact_notes(self, phrase: str) -> List[int]:
+        """
+        ID заметок, у которых поле Phrase совпадает с фразой символ в символ.
+        Поиск Anki не учитывает регистр - результат сверяется по notesInfo.
+        Только эти ID можно удалять при замене карточки.
+        """
+        note_ids = self.find_notes(phrase)
+        if not note_ids:
+            return []
+        expected = format_field(phrase.strip())
+        try:
+            return [note["noteId"] for note in self.notes_info(note_ids)
+                    if self.note_field(note, "Phrase").strip() == expected]
+        except Exception as e:
+            print(f"⚠️ Ошибка проверки заметок: {e}")
+            return []
+
+    def find_notes_by_query(self, query: str) -> List[int]:
+        """ID заметок по произвольному поисковому запросу (ошибки не скрываются)"""
+        return list(self._request("findNotes", {"query": query}) or [])
+    
+    def find_notes_by_phrases(self, phrases: List[str]) -> List[int]:
+        """
+        Ищет заметки сразу для нескольких фраз одним запросом (OR).
+        В отличие от find_notes, ошибки не скрываются.
+        """
+        if not phrases:
+            return []
+        query = " OR ".join(f"({self.phrase_query(phrase)})" for phrase in phrases)
+        return self.find_notes_by_query(query)
+    
+    def notes_info(self, note_ids: List[int], chunk_size: int = NOTES_INFO_CHUNK) -> List[Dict]:
+        """Данные заметок (поля, теги, ID карточек) порциями по chunk_size"""
+        notes = []
+        for start in range(0, len(note_ids), chunk_size):
+            chunk = note_ids[start:start + chunk_size]
+            notes.extend(self._request("notesInfo", {"notes": chunk}) or [])
+        return notes
+    
+    def notes_mod_time(self, note_ids: List[int], chunk_size: int = NOTES_MOD_CHUNK) -> Dict[int, int]:
+        """
+        Время изменения заметок {note_id: mod} без полей (легкий запрос).
+
+        Raises:
+            Exception: В том числе если AnkiConnect не знает notesModTime (старая версия)
+        """
+        result = {}
+        for start in range(0, len(note_ids), chunk_size):
+            chunk = note_ids[start:start + chunk_size]
+            for item in self._request("notesModTime", {"notes": chunk}) or []:
+                result[item["noteId"]] = item["mod"]
+        return result
+
+    def cards_info(self, card_ids: List[int], chunk_size: int = NOTES_INFO_CHUNK) -> List[Dict]:
+        """Данные карточек (колода, заметка) порциями по chunk_size"""
+        cards = []
+        for start in range(0, len(card_ids), chunk_size):
+            chunk = card_ids[start:start + chunk_size]
+            cards.extend(self._request("cardsInfo", {"cards": chunk}) or [])
+        return cards
+
+    @staticmethod
+    def note_field(note: Dict, field_name: str) -> str:
+        """Значение поля из ответа notesInfo"""
+        return (note.get("fields", {}).get(field_name) or {}).get("value", "")
+    
     def delete_notes(self, note_ids: List[int]) -> bool:
         """Удаляет заметки по их ID"""
         if not note_ids:
@@ -288,21 +453,11 @@ class AnkiAPI:
             print(f"❌ Ошибка удаления заметок: {e}")
             return False
     
-    def add_note(self, phrase: str, translation: str, context: str, 
-                 deck_name: str, audio_path: str = None, allow_duplicate: bool = False) -> bool:
+    def build_note(self, phrase: str, translation: str, context: str,
+                   deck_name: str, audio_path: str = None, allow_duplicate: bool = False) -> Dict:
         """
-        Добавляет заметку в Anki.
-        
-        Args:
-            phrase: Немецкая фраза
-            translation: Перевод
-            context: Контекст
-            deck_name: Имя колоды
-            audio_path: Путь к аудиофайлу (опционально)
-            allow_duplicate: Разрешить добавление дубликатов (по умолчанию False)
-            
-        Returns:
-            True при успехе
+        Собирает заметку в формате AnkiConnect (addNote / addNotes).
+        Аудио встраивается в заметку в Base64.
         """
         clean_name = self.clean_deck_name(deck_name)
         
@@ -313,15 +468,15 @@ class AnkiAPI:
             "deckName": clean_name,
             "modelName": self.model_name,
             "fields": {
-                "Phrase": phrase.replace('\n', '<br>'),
-                "Translation": translation.replace('\n', '<br>'),
-                "Context": context.replace('\n', '<br>'),
+                "Phrase": format_field(phrase),
+                "Translation": format_field(translation),
+                "Context": format_field(context),
                 "Sound": ""  # Explicitly include the Sound field
             },
             "options": {
                 "allowDuplicate": allow_duplicate
             },
-            "tags": ["youtube", "german", "local-ai"]
+            "tags": list(NOTE_TAGS)
         }
         
         if audio_path and os.path.exists(audio_path):
@@ -329,18 +484,7 @@ class AnkiAPI:
                 with open(audio_path, "rb") as f:
                     audio_data = base64.b64encode(f.read()).decode("utf-8")
                 
-                # Check for correct field name casing
-                actual_fields = self.get_model_field_names()
-                _log(f"📋 Actual fields in model: {actual_fields}")
-                target_field = "Sound"
-                if "Sound" not in actual_fields:
-                    # Try to find a case-insensitive match or fallback to the first likely field
-                    for gf in actual_fields:
-                        if gf.lower() == "sound" or gf.lower() == "audio":
-                            target_field = gf
-                            _log(f"🔍 Found matching field: '{target_field}'")
-                            break
-                
+                target_field = self.sound_field()
                 _log(f"🔊 Attaching audio to field '{target_field}'. File: {os.path.basename(audio_path)}")
                 
                 note["audio"] = [{
@@ -351,9 +495,76 @@ class AnkiAPI:
             except Exception as e:
                 _log(f"⚠️ Ошибка кодирования аудио в Base64: {e}")
         
+        return note
+
+    def add_note(self, phrase: str, translation: str, context: str, 
+                 deck_name: str, audio_path: str = None, allow_duplicate: bool = False) -> Optional[int]:
+        """
+        Добавляет заметку в Anki.
+        
+        Args:
+            phrase: Немецкая фраза
+            translation: Перевод
+            context: Контекст
+            deck_name: Имя колоды
+            audio_path: Путь к аудиофайлу (опционально)
+            allow_duplicate: Разрешить добавление дубликатов (по умолчанию False)
+            
+        Returns:
+            ID новой заметки
+        """
+        note = self.build_note(phrase, translation, context, deck_name, audio_path, allow_duplicate)
         result = self._request("addNote", {"note": note})
-        _log(f"🎯 Anki response: {result}")
-        return True
+        debug_log(f"🎯 Anki response: {result}", prefix="[API]")
+        return result
+
+    def sound_field(self) -> str:
+        """Поле для аудио в модели: Sound или похожее по имени"""
+        fields = self.get_model_field_names()
+        if "Sound" in fields:
+            return "Sound"
+        for field in fields:
+            if field.lower() in ("sound", "audio"):
+                return field
+        return "Sound"
+    
+    def multi(self, actions: List[Tuple[str, Dict]]) -> List[Tuple[Any, Optional[str]]]:
+        """
+        Выполняет несколько действий одним запросом (multi).
+        
+        Args:
+            actions: Список пар (действие, параметры)
+            
+        Returns:
+            Список пар (результат, ошибка) в порядке действий
+            
+        Raises:
+            Exception: ANKI_CONNECT_ERROR / ANKI_TIMEOUT_ERROR - пакет не доставлен
+        """
+        if not actions:
+            return []
+        payload = [{"action": action, "version": 6, "params": params} for action, params in actions]
+        results = self._request("multi", {"actions": payload}) or []
+        pairs = []
+        for item in results:
+            if isinstance(item, dict):
+                pairs.append((item.get("result"), item.get("error")))
+            else:
+                pairs.append((item, None))
+        return pairs
+    
+    def add_notes(self, notes: List[Dict]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Добавляет несколько заметок одним запросом (multi).
+        В отличие от addNotes, ошибка одной заметки не теряет причину.
+        
+        Returns:
+            Список пар (note_id, error) в порядке заметок
+            
+        Raises:
+            Exception: ANKI_CONNECT_ERROR / ANKI_TIMEOUT_ERROR - пакет не доставлен
+        """
+        return self.multi([("addNote", {"note": note}) for note in notes])
 
 
 # Глобальный экземпляр API
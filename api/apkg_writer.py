@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Запись колоды в файл .apkg без AnkiConnect.
+Пакет - zip с коллекцией SQLite (collection.anki2, схема 11 - ее
+импортируют все версии Anki) и медиафайлами с картой "media".
+Тип записи 'YouTube' берется из тех же полей, CSS и шаблонов, что и в
+AnkiAPI.setup_model, поэтому карточки не отличаются от добавленных
+через AnkiConnect. Заметки пишутся в SQLite порциями, медиафайлы
+копируются в архив с диска при закрытии - десятки тысяч карточек не
+держатся в памяти и не требуют запущенного Anki.
+
+Чтобы заметки попали в существующий тип записи (и находились запросами
+note:YouTube), нужен его ID из коллекции пользователя: model_id /
+--model-id, по умолчанию CLI спрашивает его у AnkiConnect. Без него
+используется постоянный ID по имени - для коллекции без этого типа.
+
+Запуск без интерфейса:
+    python -m api.apkg_writer phrases.tsv out.apkg --deck "Deutsch" [--model-id 1694...]
+(колонки TSV: фраза, перевод, контекст, путь к аудио - последние две необязательны)
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Dict, List, Optional
+
+from api.anki_api import MODEL_NAME, MODEL_FIELDS, MODEL_CSS, CARD_TEMPLATES, NOTE_TAGS, anki_api, format_field
+
+
+INSERT_BATCH = 1000  # Заметок в одной транзакции
+DEFAULT_DECK_ID = 1  # Колода "Default" есть в любой коллекции
+FIELD_SEPARATOR = "\x1f"
+_GUID_CHARS = ("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+               "!#$%&()*+,-./:;<=>?@[]^_`{|}~")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+_SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null, scm integer not null,
+    ver integer not null, dty integer not null, usn integer not null, ls integer not null,
+    conf text not null, models text not null, decks text not null, dconf text not null, tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null, mod integer not null,
+    usn integer not null, tags text not null, flds text not null, sfld integer not null,
+    csum integer not null, flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null, ord integer not null,
+    mod integer not null, usn integer not null, type integer not null, queue integer not null,
+    due integer not null, ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null, odid integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null, ease integer not null,
+    ivl integer not null, lastIvl integer not null, factor integer not null, time integer not null,
+    type integer not null
+);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+# Параметры колоды по умолчанию (как у новой коллекции Anki)
+_DECK_CONF = {
+    "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True, "timer": 0,
+    "replayq": True, "dyn": False,
+    "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20,
+            "bury": False, "separate": True},
+    "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "ivlFct": 1, "maxIvl": 36500, "bury": False,
+            "minSpace": 1},
+    "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 1},
+}
+
+
+def stable_id(text: str) -> int:
+    """Постоянный ID по имени (тип записи и колода совпадают при повторном импорте)"""
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], 16) % (1 << 40) + (1 << 40)
+
+
+def note_guid(model_name: str, phrase: str) -> str:
+    """GUID заметки по фразе: повторный импорт той же фразы обновляет заметку, а не дублирует"""
+    value = int(hashlib.sha256(f"{model_name}\x1f{phrase}".encode("utf-8")).hexdigest()[:16], 16)
+    chars = []
+    while value:
+        value, rest = divmod(value, len(_GUID_CHARS))
+        chars.append(_GUID_CHARS[rest])
+    return "".join(reversed(chars))
+
+
+def strip_html(text: str) -> str:
+    return _TAG_RE.sub("", text)
+
+
+def field_checksum(plain: str) -> int:
+    """Контрольная сумма первого поля (как считает Anki: первые 8 hex SHA-1 текста без HTML)"""
+    return int(hashlib.sha1(plain.encode("utf-8")).hexdigest()[:8], 16)
+
+
+class ApkgWriter:
+    """
+    Потоковая запись пакета .apkg.
+
+    with ApkgWriter("out.apkg", "Deutsch") as writer:
+        writer.add_note(phrase, translation, context, audio_path)
+    """
+
+    def __init__(self, path: str, deck_name: str, model_name: str = MODEL_NAME, model_id: int = None):
+        self.path = path
+        self.deck_name = deck_name
+        self.model_name = model_name
+        self.model_id = model_id or stable_id(f"model:{model_name}")
+        self.deck_id = DEFAULT_DECK_ID if deck_name == "Default" else stable_id(f"deck:{deck_name}")
+        self._tmp_dir = tempfile.mkdtemp(prefix="apkg-")
+        self._db_path = os.path.join(self._tmp_dir, "collection.anki2")
+        self._conn = sqlite3.connect(self._db_path)
+        # Временная коллекция: надежность записи не нужна, скорость - да
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(_SCHEMA)
+        self._notes: List[tuple] = []
+        self._cards: List[tuple] = []
+        self._media: Dict[str, str] = {}       # имя в Anki -> путь на диске
+        self._next_id = int(time.time() * 1000)
+        self._due = 0
+        self.count = 0
+
+    # === Заметки ===
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def add_note(self, phrase: str, translation: str, context: str = "",
+                 audio_path: Optional[str] = None, tags: List[str] = None):
+        """Добавляет заметку (запись в SQLite - порциями по INSERT_BATCH)"""
+        sound = ""
+        if audio_path and os.path.exists(audio_path):
+            filename = os.path.basename(audio_path)
+            self._media.setdefault(filename, audio_path)
+            sound = f"[sound:{filename}]"
+        fields = [format_field(phrase), format_field(translation), format_field(context or ""), sound]
+        now = int(time.time())
+        note_id = self._new_id()
+        tag_text = " ".join(tags if tags is not None else NOTE_TAGS)
+        sort_field = strip_html(fields[0])
+        self._notes.append((
+            note_id, note_guid(self.model_name, phrase), self.model_id, now, -1,
+            f" {tag_text} " if tag_text else "", FIELD_SEPARATOR.join(fields), sort_field,
+            field_checksum(sort_field), 0, "",
+        ))
+        self._due += 1
+        self._cards.append((self._new_id(), note_id, self.deck_id, 0, now, -1, 0, 0, self._due,
+                            0, 0, 0, 0, 0, 0, 0, 0, ""))
+        self.count += 1
+        if len(self._notes) >= INSERT_BATCH:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные заметки одной транзакцией"""
+        if not self._notes:
+            return
+        with self._conn:
+            self._conn.executemany("INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._notes)
+            self._conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   self._cards)
+        self._notes, self._cards = [], []
+
+    # === Коллекция ===
+
+    def _model(self, now: int) -> Dict:
+        return {
+            "id": self.model_id, "name": self.model_name, "type": 0, "mod": now, "usn": -1, "sortf": 0,
+            "did": self.deck_id, "tags": [], "vers": [],
+            "flds": [{"name": name, "ord": n, "sticky": False, "rtl": False, "font": "Arial", "size": 20,
+                      "media": []} for n, name in enumerate(MODEL_FIELDS)],
+            "tmpls": [{"name": tmpl["name"], "ord": n, "qfmt": tmpl["Front"], "afmt": tmpl["Back"],
+                       "did": None, "bqfmt": "", "bafmt": ""} for n, tmpl in enumerate(CARD_TEMPLATES)],
+            "css": MODEL_CSS,
+            "latexPre": "\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n\\usepackage{amssymb,amsmath}\n"
+                        "\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n\\begin{document}\n",
+            "latexPost": "\\end{document}",
+            "latexsvg": False,
+            "req": [[0, "any", [0]]],
+        }
+
+    @staticmethod
+    def _deck(deck_id: int, name: str, now: int) -> Dict:
+        return {
+            "id": deck_id, "name": name, "mod": now, "usn": -1, "desc": "", "dyn": 0, "conf": 1,
+            "collapsed": False, "browserCollapsed": False, "extendNew": 0, "extendRev": 0,
+            "lrnToday": [0, 0], "revToday": [0, 0], "newToday": [0, 0], "timeToday": [0, 0],
+        }
+
+    def _write_collection(self):
+        now = int(time.time())
+        decks = {str(DEFAULT_DECK_ID): self._deck(DEFAULT_DECK_ID, "Default", now)}
+        decks[str(self.deck_id)] = self._deck(self.deck_id, self.deck_name, now)
+        conf = {"nextPos": self._due + 1, "estTimes": True, "activeDecks": [1], "sortType": "noteFld",
+                "timeLim": 0, "sortBackwards": False, "addToCur": True, "curDeck": 1, "newBury": True,
+                "newSpread": 0, "dueCounts": True, "curModel": str(self.model_id), "collapseTime": 1200}
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+                (now - now % 86400, now * 1000, now * 1000, json.dumps(conf),
+                 json.dumps({str(self.model_id): self._model(now)}), json.dumps(decks),
+                 json.dumps({"1": _DECK_CONF})))
+
+    def close(self) -> str:
+        """Дописывает коллекцию и собирает .apkg. Возвращает путь к файлу"""
+        self.flush()
+        self._write_collection()
+        self._conn.close()
+        try:
+            with zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED) as package:
+                package.write(self._db_path, "collection.anki2")
+                media_map = {}
+                for n, (filename, source) in enumerate(self._media.items()):
+                    # Аудио уже сжато: без повторного сжатия
+                    package.write(source, str(n), compress_type=zipfile.ZIP_STORED)
+                    media_map[str(n)] = filename
+                package.writestr("media", json.dumps(media_map))
+        finally:
+            os.remove(self._db_path)
+            os.rmdir(self._tmp_dir)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._conn.close()
+            os.remove(self._db_path)
+            os.rmdir(self._tmp_dir)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="TSV с фразами -> колода .apkg (без Anki)")
+    parser.add_argument("source", help="TSV: фраза, перевод, [контекст], [путь к аудио]")
+    parser.add_argument("output", help="Файл .apkg")
+    parser.add_argument("--deck", default="Default", help="Имя колоды")
+    parser.add_argument("--model-id", type=int,
+                        help=f"ID типа записи '{MODEL_NAME}' в коллекции (по умолчанию - из AnkiConnect)")
+    args = parser.parse_args(argv)
+
+    model_id = args.model_id or anki_api.get_model_id(MODEL_NAME)
+    if not model_id:
+        print(f"⚠️ ID типа записи '{MODEL_NAME}' неизвестен (Anki не запущен?): если он уже есть в "
+              f"коллекции, Anki создаст копию. Укажите --model-id.")
+
+    start = time.time()
+    with open(args.source, encoding="utf-8", newline="") as f, \
+            ApkgWriter(args.output, args.deck, model_id=model_id) as writer:
+        for row in csv.reader(f, delimiter="\t"):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            row += [""] * (4 - len(row))
+            writer.add_note(row[0].strip(), row[1], row[2], row[3].strip() or None)
+    print(f"📦 {writer.count} заметок -> {args.output} ({time.time() - start:.1f}с)")
+
+
+if __name__ == "__main__":
+    main()
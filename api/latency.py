@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Статистика задержек и адаптивные таймауты.
+Дедлайны запросов вычисляются из наблюдаемых задержек каждого endpoint'а
+(высокий перцентиль x запас) с нижней и верхней границей, вместо
+фиксированных 0.5-60 секунд.
+"""
+import threading
+from collections import deque
+from typing import Dict, Tuple
+
+
+def percentile(values, p: float) -> float:
+    """Перцентиль (nearest-rank) для небольших выборок"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class TimeoutPolicy:
+    """
+    Адаптивные таймауты по endpoint'ам.
+
+    - Пока замеров мало (или запрос "холодный", например модель еще не
+      загружена), используется верхняя граница: медленный, но живой
+      запрос не обрывается.
+    - Дальше дедлайн = p99 * MULTIPLIER + MARGIN, но не меньше floor и
+      не больше ceiling: зависший backend обнаруживается быстро.
+    - После таймаута дедлайн endpoint'а удваивается до успешного ответа.
+    """
+
+    MULTIPLIER = 3.0
+    MARGIN = 0.25
+    MIN_SAMPLES = 5
+    WINDOW = 200
+    CONNECT_TIMEOUT = 1.5  # Соединение с локальным сервисом либо есть сразу, либо его нет
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._backoff: Dict[str, float] = {}
+
+    def record(self, endpoint: str, seconds: float):
+        """Сохраняет задержку успешного запроса"""
+        with self._lock:
+            window = self._samples.setdefault(endpoint, deque(maxlen=self.WINDOW))
+            window.append(seconds)
+            self._backoff.pop(endpoint, None)
+
+    def record_timeout(self, endpoint: str):
+        """Учитывает таймаут: следующий дедлайн будет больше"""
+        with self._lock:
+            self._backoff[endpoint] = min(self._backoff.get(endpoint, 1.0) * 2, 16.0)
+
+    def read_timeout(self, endpoint: str, floor: float, ceiling: float, cold: bool = False) -> float:
+        """Дедлайн чтения ответа в секундах"""
+        with self._lock:
+            samples = list(self._samples.get(endpoint, ()))
+            backoff = self._backoff.get(endpoint, 1.0)
+        if cold or len(samples) < self.MIN_SAMPLES:
+            return ceiling
+        deadline = (percentile(samples, 99) * self.MULTIPLIER + self.MARGIN) * backoff
+        return min(max(deadline, floor), ceiling)
+
+    def timeout(self, endpoint: str, floor: float, ceiling: float,
+                cold: bool = False, connect: float = None) -> Tuple[float, float]:
+        """Пара (connect, read) для параметра timeout библиотеки requests"""
+        read = self.read_timeout(endpoint, floor, ceiling, cold)
+        return (min(connect or self.CONNECT_TIMEOUT, read), read)
+
+    def stats(self, endpoint: str) -> Dict[str, float]:
+        """Сводка по endpoint'у (для отладки)"""
+        with self._lock:
+            samples = list(self._samples.get(endpoint, ()))
+        return {
+            "samples": len(samples),
+            "p50": percentile(samples, 50),
+            "p99": percentile(samples, 99),
+        }
+
+
+# Глобальная политика таймаутов
+timeout_policy = TimeoutPolicy()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки без Anki, Ollama и сети: локальные эмуляторы AnkiConnect и
+Ollama (benchmarks.emulators), сквозной замер пропускной способности
+(python -m benchmarks.throughput) и микробенчмарки обработки текста
+(python -m benchmarks.micro).
+"""
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Корпус для микробенчмарков: ответы моделей (с разметкой и без, разные
+разделители контекста), субтитры из буфера обмена, тексты собирателя до
+10 тыс. символов и имена колод. Генерируется детерминированно.
+"""
+from typing import List
+
+_PHRASES = [
+    "Ich weiß nicht, was du meinst.",
+    "Das kommt darauf an.",
+    "Wir haben uns lange nicht gesehen!",
+    "Kannst du mir bitte helfen?",
+    "Es ist nicht so einfach, wie es aussieht.",
+    "Am Wochenende fahren wir an die Ostsee.",
+]
+_TRANSLATIONS = [
+    "Я не знаю, что ты имеешь в виду.",
+    "Это зависит от обстоятельств.",
+    "Мы давно не виделись!",
+    "Можешь мне, пожалуйста, помочь?",
+    "Это не так просто, как кажется.",
+    "На выходных мы едем на Балтийское море.",
+]
+
+# Ответы моделей в форматах, которые встречаются на практике
+_LLM_TEMPLATES = [
+    "{translation}",
+    "{translation}\n\nКОНТЕКСТ:\n{phrase} - разговорная фраза, нейтральный стиль.",
+    "**Перевод:** {translation}\n\n**КОНТЕКСТ:**\n- Используется в разговоре.\n- Пример: *{phrase}*\n- Синоним: _ähnlich_",
+    "Перевод: {translation}\nCONTEXT: Informal. Example: {phrase}",
+    "## Перевод\n{translation}\n\n### Контекст\n| Wort | Значение |\n|---|---|\n| kommen | приходить |\n| an | на |",
+    "__{translation}__\n\n**ПРИМЕРЫ**\n1. {phrase}\n2. {phrase}\n+ Редко: в письменной речи",
+    "Translation: {translation}\n\ncontext: {phrase} — used when politely asking for something.",
+]
+
+
+def llm_outputs(count: int = 200) -> List[str]:
+    """Ответы моделей: перевод, разметка markdown, разделители контекста"""
+    result = []
+    for n in range(count):
+        template = _LLM_TEMPLATES[n % len(_LLM_TEMPLATES)]
+        pair = n % len(_PHRASES)
+        result.append(template.format(phrase=_PHRASES[pair], translation=_TRANSLATIONS[pair]))
+    return result
+
+
+def subtitle_snippets(count: int = 200) -> List[str]:
+    """Фрагменты субтитров из буфера: переносы строк внутри фразы и после знаков"""
+    result = []
+    for n in range(count):
+        words = _PHRASES[n % len(_PHRASES)].split()
+        middle = len(words) // 2
+        if n % 3 == 0:
+            result.append(" ".join(words))
+        elif n % 3 == 1:
+            result.append(" ".join(words[:middle]) + "\n" + " ".join(words[middle:]))
+        else:
+            result.append(" ".join(words[:middle]) + "\r\n  " + " ".join(words[middle:]) + "\n" + _PHRASES[0])
+    return result
+
+
+def collector_texts() -> List[str]:
+    """Тексты режима собирателя: длинные субтитры, только цифры/знаки, превышение лимита"""
+    lines = []
+    while sum(len(line) + 1 for line in lines) < 9800:
+        lines.append(_PHRASES[len(lines) % len(_PHRASES)])
+    subtitles = "\n".join(lines)
+    return [
+        subtitles,
+        ("12:34,567 --> 12:35,001 " * 420)[:9990],  # Без букв: проверка проходит весь текст
+        subtitles + "\n" + subtitles,                # Длиннее лимита
+        _PHRASES[1],
+    ]
+
+
+def deck_labels(count: int = 200) -> List[str]:
+    """Подписи колод в выпадающем списке (с количеством карточек и без)"""
+    names = ["Deutsch", "Deutsch::B1::Verben", "YouTube::Serien (Staffel 2)", "Без счетчика", "Deck (abc)"]
+    result = []
+    for n in range(count):
+        name = names[n % len(names)]
+        result.append(f"{name} ({n * 7})" if n % 4 else name)
+    return result
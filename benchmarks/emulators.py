@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Локальные HTTP-эмуляторы AnkiConnect и Ollama для бенчмарков.
+Поддерживают действия и endpoint'ы, которыми пользуется приложение,
+хранят заметки в памяти и умеют добавлять задержку и ошибки:
+
+    with AnkiConnectEmulator(latency=0.005, error_rate=0.01) as anki:
+        anki_api.url = anki.url
+
+latency - базовая задержка ответа (сек), jitter - случайная добавка
+(0..jitter), error_rate - доля запросов, завершающихся ошибкой.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: requests.Session переиспользует соединение
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: Any):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        status, body = self.server.emulator.handle_get(self.path)
+        self._reply(status, body)
+
+    def do_POST(self):
+        status, body = self.server.emulator.handle_post(self.path, self._body())
+        self._reply(status, body)
+
+
+class Emulator:
+    """Основа эмулятора: HTTP-сервер в фоновом потоке на свободном порту"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests: Dict[str, int] = {}   # Запросов по действию / endpoint'у
+        self.errors: Dict[str, int] = {}     # Внедренных ошибок
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "Emulator":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.emulator = self
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, name: str) -> bool:
+        """Учитывает запрос и ждет задержку. True - ответить ошибкой"""
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        if delay:
+            time.sleep(delay)
+        return failed
+
+    def handle_get(self, path: str):
+        return 404, {"error": f"unknown endpoint {path}"}
+
+    def handle_post(self, path: str, body: Dict):
+        return 404, {"error": f"unknown endpoint {path}"}
+
+
+class AnkiConnectEmulator(Emulator):
+    """
+    AnkiConnect (версия 6): version, deckNames, getDeckStats, createDeck,
+    modelNames, modelNamesAndIds, modelFieldNames, createModel, findNotes (поиск по Phrase и
+    note:), notesInfo, addNote, addNotes, storeMediaFile, updateNoteFields,
+    deleteNotes, multi. Заметки и медиа хранятся в памяти.
+    """
+
+    FIELDS = ["Phrase", "Translation", "Context", "Sound"]
+    _PHRASE_RE = re.compile(r'Phrase:"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self, decks: List[str] = None, model_name: str = "YouTube", **kwargs):
+        super().__init__(**kwargs)
+        self.decks = {"Default": 1}
+        for deck in decks or ():
+            self.decks.setdefault(deck, len(self.decks) + 1)
+        self.models = {model_name: list(self.FIELDS)}
+        self.notes: Dict[int, Dict] = {}
+        self.media: Dict[str, int] = {}  # имя файла -> размер
+        self._phrases: Dict[str, int] = {}
+        self._next_id = 1_700_000_000_000
+
+    def handle_post(self, path: str, body: Dict):
+        action = body.get("action", "")
+        if self._count(action):
+            return 200, {"result": None, "error": "emulated failure"}
+        try:
+            result = self._action(action, body.get("params") or {})
+        except Exception as e:
+            return 200, {"result": None, "error": str(e)}
+        return 200, {"result": result, "error": None}
+
+    def _action(self, action: str, params: Dict) -> Any:
+        handler = getattr(self, f"_{action}", None)
+        if handler is None:
+            raise Exception(f"unsupported action: {action}")
+        return handler(params)
+
+    # === Действия ===
+
+    def _version(self, params):
+        return 6
+
+    def _deckNames(self, params):
+        return list(self.decks)
+
+    def _createDeck(self, params):
+        return self.decks.setdefault(params["deck"], len(self.decks) + 1)
+
+    def _getDeckStats(self, params):
+        with self._lock:
+            counts = {}
+            for note in self.notes.values():
+                counts[note["deck"]] = counts.get(note["deck"], 0) + 1
+        return {str(self.decks[name]): {"deck_id": self.decks[name], "name": name,
+                                        "total_in_deck": counts.get(name, 0)}
+                for name in params.get("decks", []) if name in self.decks}
+
+    def _modelNames(self, params):
+        return list(self.models)
+
+    def _modelNamesAndIds(self, params):
+        return {name: 1_600_000_000_000 + n for n, name in enumerate(self.models)}
+
+    def _modelFieldNames(self, params):
+        return self.models.get(params.get("modelName"), [])
+
+    def _createModel(self, params):
+        self.models[params["modelName"]] = list(params["inOrderFields"])
+        return {"name": params["modelName"]}
+
+    def _updateModelStyling(self, params):
+        return None
+
+    def _updateModelTemplates(self, params):
+        return None
+
+    def _findNotes(self, params):
+        query = params.get("query", "")
+        phrases = [re.sub(r'\\(.)', r'\1', value) for value in self._PHRASE_RE.findall(query)]
+        with self._lock:
+            if phrases:
+                return [self._phrases[p] for p in phrases if p in self._phrases]
+            if "note:" in query:
+                return list(self.notes)
+        return []
+
+    def _notesInfo(self, params):
+        with self._lock:
+            return [{"noteId": note_id, "modelName": "YouTube", "tags": [],
+                     "fields": {name: {"value": value, "order": n}
+                                for n, (name, value) in enumerate(self.notes[note_id]["fields"].items())}}
+                    for note_id in params.get("notes", []) if note_id in self.notes]
+
+    def _storeMediaFile(self, params):
+        data = base64.b64decode(params.get("data") or "")
+        self.media[params["filename"]] = len(data)
+        return params["filename"]
+
+    def _addNote(self, params):
+        note = params["note"]
+        fields = dict(note.get("fields", {}))
+        phrase = fields.get("Phrase", "")
+        for audio in note.get("audio") or ():
+            self._storeMediaFile(audio)
+            for field in audio.get("fields", []):
+                fields[field] = fields.get(field, "") + f"[sound:{audio['filename']}]"
+        with self._lock:
+            if phrase in self._phrases and not note.get("options", {}).get("allowDuplicate"):
+                raise Exception("cannot create note because it is a duplicate")
+            self.decks.setdefault(note["deckName"], len(self.decks) + 1)
+            # Как в Anki: ID заметки - время создания в мс
+            self._next_id = max(self._next_id + 1, int(time.time() * 1000))
+            self.notes[self._next_id] = {"deck": note["deckName"], "fields": fields}
+            self._phrases[phrase] = self._next_id
+            return self._next_id
+
+    def _addNotes(self, params):
+        result = []
+        for note in params.get("notes", []):
+            try:
+                result.append(self._addNote({"note": note}))
+            except Exception:
+                result.append(None)
+        return result
+
+    def _updateNoteFields(self, params):
+        note = params["note"]
+        with self._lock:
+            if note["id"] not in self.notes:
+                raise Exception("note was not found")
+            self.notes[note["id"]]["fields"].update(note.get("fields", {}))
+        return None
+
+    def _deleteNotes(self, params):
+        with self._lock:
+            for note_id in params.get("notes", []):
+                note = self.notes.pop(note_id, None)
+                if note:
+                    self._phrases.pop(note["fields"].get("Phrase", ""), None)
+        return None
+
+    def _multi(self, params):
+        results = []
+        for item in params.get("actions", []):
+            try:
+                results.append({"result": self._action(item["action"], item.get("params") or {}), "error": None})
+            except Exception as e:
+                results.append({"result": None, "error": str(e)})
+        return results
+
+
+class OllamaEmulator(Emulator):
+    """
+    Ollama: /api/tags, /api/ps, /api/generate (без стриминга) и /api/embed.
+    Ответ генерации - перевод и, если промпт просит контекст, блок после
+    разделителя; метрики (eval_count, длительности) как у настоящего сервера.
+    """
+
+    def __init__(self, models: List[str] = None, delimiter: str = "КОНТЕКСТ", **kwargs):
+        super().__init__(**kwargs)
+        self.models = models or ["model"]
+        self.delimiter = delimiter
+
+    def handle_get(self, path: str):
+        if path == "/api/tags":
+            self._count("tags")
+            return 200, {"models": [{"name": name} for name in self.models]}
+        if path == "/api/ps":
+            # Модели "всегда загружены"
+            return 200, {"models": [{"name": name, "model": name} for name in self.models]}
+        return super().handle_get(path)
+
+    def handle_post(self, path: str, body: Dict):
+        if path == "/api/generate":
+            start = time.perf_counter()
+            if self._count("generate"):
+                return 500, {"error": "emulated failure"}
+            prompt = body.get("prompt", "")
+            text = f"Перевод: {prompt[-60:].strip()}"
+            if self.delimiter in prompt:
+                text += f"\n{self.delimiter}:\nBeispiel: {prompt[-40:].strip()}"
+            elapsed_ns = int((time.perf_counter() - start) * 1e9)
+            return 200, {
+                "model": body.get("model") or self.models[0], "response": text, "done": True,
+                "total_duration": elapsed_ns, "load_duration": 0,
+                "prompt_eval_count": len(prompt) // 4, "prompt_eval_duration": elapsed_ns // 4,
+                "eval_count": len(text) // 4, "eval_duration": elapsed_ns - elapsed_ns // 4,
+            }
+        if path == "/api/embed":
+            if self._count("embed"):
+                return 500, {"error": "emulated failure"}
+            return 200, {"embeddings": [[float(len(text) % 7), 1.0, 0.5] for text in body.get("input", [])]}
+        return super().handle_post(path, body)
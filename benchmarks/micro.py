@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарки функций, которые выполняются для каждой карточки и
+каждого изменения буфера обмена: разбор ответа модели, очистка markdown,
+форматирование буфера, проверки собирателя, замедление текста для TTS,
+имя колоды без счетчика.
+
+Текущие реализации сравниваются с прежними (до предкомпиляции шаблонов):
+результаты должны совпадать на всем корпусе, а время вызова - укладываться
+в порог THRESHOLDS_US.
+
+    python -m benchmarks.micro                 # таблица + JSON в benchmarks/results/
+    python -m benchmarks.micro --check         # код выхода 1 при регрессии
+    python -m benchmarks.micro --baseline old.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import corpus
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MIN_TIME = 0.2      # Минимальная длительность одного замера, сек
+REPEATS = 5         # Замеров на случай (берется лучший)
+BASELINE_TOLERANCE = 0.25  # Допустимое замедление относительно --baseline
+
+# Порог среднего времени вызова текущей реализации, мкс (с запасом на медленные машины)
+THRESHOLDS_US = {
+    "extract_translation_and_context": 20,
+    "clean_markdown": 10,
+    "parse_response": 50,
+    "format_clipboard_text": 50,
+    "collector_text_check": 600,
+    "process_text_for_speed": 30,
+    "clean_deck_name": 3,
+}
+
+
+# =============================================================================
+# ПРЕЖНИЕ РЕАЛИЗАЦИИ (для сравнения скорости и результатов)
+# =============================================================================
+def legacy_extract_translation_and_context(text: str, delimiter: str = "КОНТЕКСТ"):
+    context_patterns = [delimiter, 'КОНТЕКСТ', 'CONTEXT']
+    unique_patterns = list(set([p for p in context_patterns if p]))
+    escaped_patterns = [re.escape(p) for p in unique_patterns]
+    context_regex = r'[*_]*(' + '|'.join(escaped_patterns) + r')[:*_]*'
+    parts = re.split(context_regex, text, maxsplit=1, flags=re.IGNORECASE)
+    translation_part = parts[0].strip()
+    translation = re.sub(r'^[*_]*[^:\n\r]{2,30}[:*_ \t]*', '', translation_part, count=1).strip()
+    if not translation and translation_part:
+        translation = translation_part
+    context = ""
+    if len(parts) > 2:
+        context = parts[2].strip()
+    elif len(parts) > 1:
+        context = parts[1].strip()
+    return translation, context
+
+
+def legacy_clean_markdown(text: str) -> str:
+    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+    text = re.sub(r'__(.+?)__', r'\1', text)
+    text = re.sub(r'\*(.+?)\*', r'\1', text)
+    text = re.sub(r'_(.+?)_', r'\1', text)
+    text = re.sub(r'^#+\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'^\s*[\*\-\+]\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\|[\s-]+\|', '', text)
+    text = re.sub(r'\|', '', text)
+    return text.strip()
+
+
+def legacy_parse_response(text: str, delimiter: str):
+    translation, context = legacy_extract_translation_and_context(text, delimiter)
+    return legacy_clean_markdown(translation), legacy_clean_markdown(context)
+
+
+def legacy_format_clipboard_text(text):
+    return re.sub(r'(?<![.!?,;:])\s*[\r\n]+\s*', ' ', text)
+
+
+def legacy_collector_text_check(text):
+    word_count = len(text.split())
+    char_count = len(text)
+    has_letters = any(c.isalpha() for c in text)
+    return char_count <= 10000 and has_letters, word_count
+
+
+def legacy_process_text_for_speed(text, speed_level=0):
+    if speed_level == 0:
+        return text
+    processed_text = text
+    if speed_level == 1:
+        processed_text = re.sub(r' ', r'   ', processed_text)
+        processed_text = re.sub(r'([,.!?;:])', r'\1    ', processed_text)
+    elif speed_level >= 2:
+        processed_text = re.sub(r' ', r'      ', processed_text)
+        processed_text = re.sub(r'([,.!?;:])', r'\1       ', processed_text)
+    return processed_text
+
+
+# =============================================================================
+# СЛУЧАИ
+# =============================================================================
+class Case:
+    """Функция, ее входы (кортежи аргументов) и прежняя реализация"""
+
+    def __init__(self, name: str, func: Callable, inputs: List[tuple], legacy: Callable = None,
+                 same_result: Callable = None):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.legacy = legacy
+        # Прежняя реализация может возвращать больше данных - сравнивается проекция
+        self.same_result = same_result or (lambda new, old: new == old)
+
+
+def _llm_inputs() -> List[tuple]:
+    outputs = corpus.llm_outputs()
+    return [(text, "ПРИМЕРЫ" if n % 5 == 4 else "КОНТЕКСТ") for n, text in enumerate(outputs)]
+
+
+def build_cases() -> List[Case]:
+    """Случаи; функции, недоступные на этой платформе, пропускаются"""
+    from api.ai.ollama_provider import ollama_provider
+    from api.anki_api import AnkiAPI
+    from core.workers import format_clipboard_text, is_capturable_text
+
+    provider = ollama_provider
+    llm = _llm_inputs()
+    markdown = [(part,) for text, delimiter in llm
+                for part in provider._extract_translation_and_context(text, delimiter)]
+    clipboard = [(text,) for text in corpus.subtitle_snippets() + corpus.collector_texts()]
+
+    def parse_response(text, delimiter):
+        translation, context = provider._extract_translation_and_context(text, delimiter)
+        return provider._clean_markdown(translation), provider._clean_markdown(context)
+
+    cases = [
+        Case("extract_translation_and_context", provider._extract_translation_and_context, llm,
+             legacy_extract_translation_and_context),
+        Case("clean_markdown", provider._clean_markdown, markdown, legacy_clean_markdown),
+        Case("parse_response", parse_response, llm, legacy_parse_response),
+        Case("format_clipboard_text", format_clipboard_text, clipboard, legacy_format_clipboard_text),
+        Case("collector_text_check", is_capturable_text, [(text,) for text in corpus.collector_texts()],
+             legacy_collector_text_check, same_result=lambda new, old: new == old[0]),
+        Case("clean_deck_name", AnkiAPI.clean_deck_name, [(label,) for label in corpus.deck_labels()]),
+    ]
+    try:
+        # core.audio_utils использует winsound (только Windows)
+        from core.audio_utils import process_text_for_speed
+        speed_inputs = [(text, level) for (text,) in clipboard[:200] for level in (1, 2)]
+        cases.append(Case("process_text_for_speed", process_text_for_speed, speed_inputs,
+                          legacy_process_text_for_speed))
+    except ImportError as e:
+        print(f"⏭ process_text_for_speed пропущен: {e}")
+    return cases
+
+
+# =============================================================================
+# ЗАМЕРЫ
+# =============================================================================
+def time_per_call(func: Callable, inputs: List[tuple]) -> float:
+    """Лучшее среднее время вызова на корпусе, мкс"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in inputs:
+                func(*args)
+        if time.perf_counter() - start >= MIN_TIME / 10 or loops >= 1 << 20:
+            break
+        loops *= 2
+    best = float("inf")
+    for _ in range(REPEATS):
+        rounds = 0
+        start = time.perf_counter()
+        while True:
+            for _ in range(loops):
+                for args in inputs:
+                    func(*args)
+            rounds += loops
+            elapsed = time.perf_counter() - start
+            if elapsed >= MIN_TIME:
+                break
+        best = min(best, elapsed / (rounds * len(inputs)))
+    return best * 1e6
+
+
+def mismatches(case: Case) -> List[str]:
+    """Входы, на которых текущая и прежняя реализации расходятся"""
+    if case.legacy is None:
+        return []
+    return [repr(args)[:80] for args in case.inputs
+            if not case.same_result(case.func(*args), case.legacy(*args))]
+
+
+def run_case(case: Case) -> Dict:
+    result = {"inputs": len(case.inputs), "current_us": round(time_per_call(case.func, case.inputs), 3)}
+    if case.legacy is not None:
+        result["legacy_us"] = round(time_per_call(case.legacy, case.inputs), 3)
+        result["speedup"] = round(result["legacy_us"] / result["current_us"], 2) if result["current_us"] else 0
+        result["mismatches"] = mismatches(case)
+    threshold = THRESHOLDS_US.get(case.name)
+    if threshold is not None:
+        result["threshold_us"] = threshold
+    return result
+
+
+def problems(results: Dict[str, Dict], baseline: Optional[Dict] = None,
+             tolerance: float = BASELINE_TOLERANCE) -> List[str]:
+    """Регрессии: расхождение с прежней реализацией, порог, замедление к baseline"""
+    found = []
+    for name, result in results.items():
+        if result.get("mismatches"):
+            found.append(f"{name}: результат отличается от прежней реализации на {len(result['mismatches'])} входах")
+        if "threshold_us" in result and result["current_us"] > result["threshold_us"]:
+            found.append(f"{name}: {result['current_us']} мкс > порога {result['threshold_us']} мкс")
+        old = (baseline or {}).get("cases", {}).get(name)
+        if old and result["current_us"] > old["current_us"] * (1 + tolerance):
+            found.append(f"{name}: {old['current_us']} -> {result['current_us']} мкс (медленнее baseline)")
+    return found
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки обработки текста")
+    parser.add_argument("--check", action="store_true", help="Код выхода 1 при регрессии")
+    parser.add_argument("--baseline", help="Прошлый результат для сравнения")
+    parser.add_argument("--tolerance", type=float, default=BASELINE_TOLERANCE,
+                        help="Допустимое замедление относительно baseline (доля)")
+    parser.add_argument("--output", help="Файл результата (по умолчанию benchmarks/results/)")
+    parser.add_argument("--only", help="Только случаи, содержащие подстроку")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in build_cases() if not args.only or args.only in case.name]
+    results = {}
+    print(f"{'случай':34} {'сейчас, мкс':>12} {'прежде, мкс':>12} {'ускорение':>10}")
+    for case in cases:
+        result = results[case.name] = run_case(case)
+        legacy = f"{result['legacy_us']:>12}" if "legacy_us" in result else f"{'-':>12}"
+        speedup = f"{result['speedup']:>9}x" if "speedup" in result else f"{'-':>10}"
+        print(f"{case.name:34} {result['current_us']:>12} {legacy} {speedup}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    found = problems(results, baseline, args.tolerance)
+    for line in found:
+        print(f"⚠️ {line}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"micro-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": "micro",
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cases": results,
+            "problems": found,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 {output}")
+    return 1 if args.check and found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Сквозной бенчмарк: пакетная обработка (batch_processing_worker) и
+интерактивное добавление (ask_ai_worker -> озвучка -> add_to_anki_worker)
+против локальных эмуляторов AnkiConnect и Ollama. Сеть, Anki и Ollama не
+нужны; gTTS заменяется локальной озвучкой с настраиваемой задержкой
+(модуль передается воркерам тем же параметром audio_utils_module).
+
+    python -m benchmarks.throughput --phrases 200 --anki-latency 0.005 --ollama-latency 0.05
+
+Результат - JSON (фраз/сек, p50/p95 по этапам, пиковая память, запросы к
+эмуляторам) в benchmarks/results/; --baseline сравнивает с прошлым файлом.
+Данные приложения (задания, история, outbox) пишутся во временную папку.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Dict, List
+
+from api.latency import percentile
+from benchmarks.emulators import AnkiConnectEmulator, OllamaEmulator
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DECK_NAME = "Benchmark"
+
+# Отметки этапов в журнале пакетной обработки: этап начинается с отметки
+# и заканчивается следующей отметкой или итогом фразы
+BATCH_STAGE_MARKS = {"🤖": "generate", "🔊": "audio", "📇": "anki"}
+
+
+def sample_phrases(count: int, offset: int = 0) -> List[str]:
+    """Уникальные фразы разной длины"""
+    words = ["Wetter", "Bahnhof", "Schlüssel", "Frühstück", "Wochenende", "Nachbarn", "Urlaub", "Termin"]
+    return [f"Satz {offset + n}: Wir reden heute über das {words[n % len(words)]}" + " und mehr" * (n % 4)
+            for n in range(count)]
+
+
+class EmulatedTTS:
+    """Озвучка без сети: файл с тишиной заданного размера после задержки (вместо gTTS)"""
+
+    def __init__(self, folder: str, latency: float = 0.0, size: int = 16_000):
+        self.folder = folder
+        self.latency = latency
+        self._data = b"\xff\xfb\x90\x00" + b"\x00" * size
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def generate_audio(self, text, lang=None, speed_level=None, tld=None, debug=True, cache=False):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._counter += 1
+            path = os.path.join(self.folder, f"bench_{self._counter}.mp3")
+        with open(path, "wb") as f:
+            f.write(self._data)
+        return path
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """p50/p95/среднее в миллисекундах"""
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+    }
+
+
+class _Recorder:
+    """Читает очередь воркера в фоне и запоминает время каждого сообщения"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.events = []
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            message, data = self.queue.get()
+            self.events.append((time.perf_counter(), message, data))
+            if message == "batch_done":
+                self.done.set()
+
+    def stages(self) -> Dict[str, List[float]]:
+        """Длительности этапов пакета по отметкам журнала"""
+        result = {name: [] for name in BATCH_STAGE_MARKS.values()}
+        current, started = None, 0.0
+        for moment, message, data in self.events:
+            if message != "batch_log_append" and message != "batch_log" and message != "batch_done":
+                continue
+            if current is not None:
+                result[current].append(moment - started)
+                current = None
+            if message == "batch_log_append" and data in BATCH_STAGE_MARKS:
+                current, started = BATCH_STAGE_MARKS[data], moment
+        return result
+
+    def failures(self) -> int:
+        return sum(1 for _, message, data in self.events
+                   if message == "batch_log_append" and str(data).startswith(("❌", "⚠️")))
+
+
+def _memory(scenario):
+    """Пиковая память сценария: tracemalloc (Python-объекты) и RSS процесса"""
+    def wrapper(*args, **kwargs):
+        tracemalloc.reset_peak()
+        result = scenario(*args, **kwargs)
+        result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        result["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+        return result
+    return wrapper
+
+
+@_memory
+def run_batch(phrases: List[str], tts: EmulatedTTS, with_context: bool, audio: bool) -> Dict:
+    from core.workers import get_current_ai_provider
+    from modules.batch_generator.logic import batch_processing_worker
+
+    recorder = _Recorder()
+    start = time.perf_counter()
+    batch_processing_worker(recorder.queue, phrases, DECK_NAME, audio, with_context,
+                            get_current_ai_provider, tts)
+    recorder.done.wait(30)
+    elapsed = time.perf_counter() - start
+    return {
+        "phrases": len(phrases),
+        "seconds": round(elapsed, 3),
+        "phrases_per_sec": round(len(phrases) / elapsed, 2),
+        "failed": recorder.failures(),
+        "stages": {name: summarize(values) for name, values in recorder.stages().items() if values},
+    }
+
+
+@_memory
+def run_interactive(phrases: List[str], tts: EmulatedTTS, with_context: bool, audio: bool) -> Dict:
+    from core.workers import ask_ai_worker, add_to_anki_worker
+
+    q = queue.Queue()
+    stages = {"generate": [], "audio": [], "anki": []}
+    failed = 0
+    start = time.perf_counter()
+    for phrase in phrases:
+        moment = time.perf_counter()
+        ask_ai_worker(q, phrase, with_context)
+        stages["generate"].append(time.perf_counter() - moment)
+        message, data = q.get()
+        if message != "ollama_ok":
+            failed += 1
+            continue
+        translation, context = data
+        audio_path = None
+        if audio:
+            moment = time.perf_counter()
+            audio_path = tts.generate_audio(phrase)
+            stages["audio"].append(time.perf_counter() - moment)
+        moment = time.perf_counter()
+        add_to_anki_worker(q, phrase, translation, context, DECK_NAME, audio_path)
+        stages["anki"].append(time.perf_counter() - moment)
+        message, _ = q.get()
+        if message not in ("anki_ok", "anki_queued"):
+            failed += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "phrases": len(phrases),
+        "seconds": round(elapsed, 3),
+        "phrases_per_sec": round(len(phrases) / elapsed, 2),
+        "failed": failed,
+        "stages": {name: summarize(values) for name, values in stages.items() if values},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(result: Dict, baseline: Dict) -> List[str]:
+    """Строки сравнения фраз/сек и p95 этапов с прошлым результатом"""
+    lines = []
+    for name, scenario in result["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        change = (scenario["phrases_per_sec"] / old["phrases_per_sec"] - 1) * 100 if old["phrases_per_sec"] else 0
+        lines.append(f"{name}: {old['phrases_per_sec']} -> {scenario['phrases_per_sec']} фраз/сек ({change:+.1f}%)")
+        for stage, stats in scenario["stages"].items():
+            old_stats = old.get("stages", {}).get(stage)
+            if old_stats:
+                lines.append(f"   {stage} p95: {old_stats['p95_ms']} -> {stats['p95_ms']} мс")
+    return lines
+
+
+def _prepare_environment(data_dir: str):
+    """Данные приложения - во временной папке (не в профиле пользователя)"""
+    os.environ["APPDATA"] = data_dir
+    from core.settings_manager import get_base_data_dir
+    if not os.path.abspath(get_base_data_dir()).startswith(os.path.abspath(data_dir)):
+        raise SystemExit("❌ Портативная установка (user_files рядом с программой): "
+                         "бенчмарк записал бы данные в нее. Запустите из чистой копии.")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Пропускная способность пакета и интерактивного добавления")
+    parser.add_argument("--phrases", type=int, default=100, help="Фраз в пакете")
+    parser.add_argument("--interactive", type=int, default=30, help="Фраз в интерактивном сценарии (0 - пропустить)")
+    parser.add_argument("--anki-latency", type=float, default=0.002, help="Задержка AnkiConnect, сек")
+    parser.add_argument("--ollama-latency", type=float, default=0.02, help="Задержка генерации, сек")
+    parser.add_argument("--tts-latency", type=float, default=0.01, help="Задержка озвучки, сек")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержкам, сек")
+    parser.add_argument("--anki-errors", type=float, default=0.0, help="Доля ошибок AnkiConnect (0..1)")
+    parser.add_argument("--ollama-errors", type=float, default=0.0, help="Доля ошибок Ollama (0..1)")
+    parser.add_argument("--no-context", action="store_true", help="Только перевод, без контекста")
+    parser.add_argument("--no-audio", action="store_true", help="Без озвучки")
+    parser.add_argument("--verbose", action="store_true", help="Показывать журнал приложения")
+    parser.add_argument("--output", help="Файл результата (по умолчанию benchmarks/results/)")
+    parser.add_argument("--baseline", help="Прошлый результат для сравнения")
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="lerne-bench-")
+    _prepare_environment(data_dir)
+    tracemalloc.start()
+
+    from api.anki_api import anki_api
+    from api.ai.ollama_provider import ollama_provider
+    from core.app_state import app_state
+    from modules.batch_generator import logic
+
+    anki = AnkiConnectEmulator(decks=[DECK_NAME], latency=args.anki_latency, jitter=args.jitter,
+                               error_rate=args.anki_errors).start()
+    ollama = OllamaEmulator(models=[app_state.ollama_model], delimiter=app_state.context_delimiter,
+                            latency=args.ollama_latency, jitter=args.jitter, error_rate=args.ollama_errors).start()
+    anki_api.url = anki.url
+    ollama_provider.api_url = ollama.url
+    app_state.ai_provider = "ollama"
+    app_state.ai_fallback_providers = ""
+    app_state.model_routing_enabled = False
+    app_state.tm_enabled = False       # Каждая фраза - настоящая генерация
+    app_state.semantic_dedupe = False
+    logic.PHRASE_DELAY = 0             # Пауза между фразами бережет gTTS; здесь она бы измеряла sleep
+
+    with_context, audio = not args.no_context, not args.no_audio
+    tts = EmulatedTTS(data_dir, args.tts_latency)
+    result = {
+        "benchmark": "throughput",
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "verbose")},
+        "scenarios": {},
+    }
+    # Журнал в файл пишется как обычно; в консоль - только с --verbose
+    console = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    try:
+        print(f"📦 Пакет: {args.phrases} фраз, интерактивно: {args.interactive}...")
+        with console:
+            anki_api.setup_model()
+            result["scenarios"]["batch"] = run_batch(sample_phrases(args.phrases), tts, with_context, audio)
+            if args.interactive:
+                result["scenarios"]["interactive"] = run_interactive(
+                    sample_phrases(args.interactive, offset=args.phrases), tts, with_context, audio)
+    finally:
+        anki.stop()
+        ollama.stop()
+    result["requests"] = {"anki": anki.requests, "ollama": ollama.requests}
+    result["injected_errors"] = {"anki": anki.errors, "ollama": ollama.errors}
+
+    for name, scenario in result["scenarios"].items():
+        stages = ", ".join(f"{stage} p50 {stats['p50_ms']} / p95 {stats['p95_ms']} мс"
+                           for stage, stats in scenario["stages"].items())
+        print(f"📊 {name}: {scenario['phrases_per_sec']} фраз/сек, ошибок {scenario['failed']}, "
+              f"пик {scenario['peak_traced_mb']} МБ; {stages}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"throughput-{time.strftime('%Y%m%d-%H%M%S')}"
+                                           f"{'-' + result['commit'] if result['commit'] else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"💾 {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            for line in compare(result, json.load(f)):
+                print(line)
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Локальное зеркало заметок Anki (модель YouTube).
+ID, поля, колода и время изменения заметок хранятся в SQLite в папке
+пользователя. Первый запуск - полная загрузка, дальше - только заметки,
+измененные с прошлой синхронизации (findNotes edited:N + notesModTime,
+notesInfo/cardsInfo порциями только для изменившихся). Удаленные заметки
+находятся сверкой списка ID раз в несколько минут.
+
+Индексы дубликатов и другие читатели получают изменения через
+слушателей и не обращаются к AnkiConnect сами.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from api.anki_api import anki_api, is_connection_error
+from core.logger import debug_log
+
+
+MIRROR_DB_NAME = "anki_mirror.sqlite3"
+DAY = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    note_id INTEGER PRIMARY KEY,
+    phrase TEXT NOT NULL,
+    translation TEXT NOT NULL DEFAULT '',
+    context TEXT NOT NULL DEFAULT '',
+    deck TEXT NOT NULL DEFAULT '',
+    mod INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_notes_deck ON notes(deck);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+# Слушатель: (заметки [(note_id, phrase)], удаленные ID, full)
+# full=True - передан полный список заметок (пересобрать индекс целиком)
+MirrorListener = Callable[[List[Tuple[int, str]], List[int], bool], None]
+
+
+class AnkiMirror:
+    """Зеркало заметок одной модели Anki с фоновой синхронизацией"""
+
+    SYNC_INTERVAL = 60.0             # Инкрементальная синхронизация, сек
+    DELETION_CHECK_INTERVAL = 600.0  # Сверка полного списка ID, сек
+
+    def __init__(self, base_dir: str = None, api=None, model_name: str = None):
+        self._base_dir = base_dir
+        self._api = api or anki_api
+        self._model_name = model_name
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[MirrorListener] = []
+        self.last_error: Optional[str] = None
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name or self._api.model_name
+
+    # === Хранилище ===
+
+    def _dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+        return self._base_dir
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self._dir(), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self._dir(), MIRROR_DB_NAME),
+                                   timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _meta(self, key: str, default: float = 0.0) -> float:
+        with self._lock:
+            row = self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, db: sqlite3.Connection, key: str, value: float):
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # === Чтение ===
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def phrases(self) -> List[Tuple[int, str]]:
+        """Все заметки зеркала: [(note_id, phrase)]"""
+        with self._lock:
+            return self._db().execute("SELECT note_id, phrase FROM notes").fetchall()
+
+    def get(self, note_id: int) -> Optional[Dict[str, object]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT note_id, phrase, translation, context, deck, mod FROM notes WHERE note_id = ?",
+                (note_id,)).fetchone()
+        if not row:
+            return None
+        return dict(zip(("note_id", "phrase", "translation", "context", "deck", "mod"), row))
+
+    def deck_counts(self) -> Dict[str, int]:
+        """Количество заметок модели по колодам"""
+        with self._lock:
+            return dict(self._db().execute("SELECT deck, COUNT(*) FROM notes GROUP BY deck").fetchall())
+
+    @property
+    def synced_at(self) -> float:
+        return self._meta("last_sync")
+
+    def _ids(self) -> Set[int]:
+        with self._lock:
+            return {row[0] for row in self._db().execute("SELECT note_id FROM notes")}
+
+    def _mods(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._db().execute("SELECT note_id, mod FROM notes").fetchall())
+
+    # === Слушатели ===
+
+    def add_listener(self, listener: MirrorListener):
+        self._listeners.append(listener)
+
+    def _notify(self, upserted: List[Tuple[int, str]], deleted: List[int], full: bool = False):
+        if not upserted and not deleted and not full:
+            return
+        for listener in list(self._listeners):
+            try:
+                listener(upserted, deleted, full)
+            except Exception as e:
+                debug_log(f"⚠️ Зеркало Anki: ошибка слушателя: {e}")
+
+    # === Локальные изменения (карточки, добавленные/удаленные приложением) ===
+
+    def note_added(self, note_id: int, phrase: str, translation: str = "", context: str = "", deck: str = ""):
+        """Записывает добавленную приложением заметку, не дожидаясь синхронизации"""
+        if not note_id:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO notes (note_id, phrase, translation, context, deck, mod) "
+                       "VALUES (?, ?, ?, ?, ?, ?)",
+                       (note_id, phrase, translation, context, self._api.clean_deck_name(deck), int(time.time())))
+            db.commit()
+        self._notify([(note_id, phrase)], [])
+
+    def notes_deleted(self, note_ids: List[int]):
+        """Убирает удаленные приложением заметки"""
+        if not note_ids:
+            return
+        with self._lock:
+            db = self._db()
+            db.executemany("DELETE FROM notes WHERE note_id = ?", [(note_id,) for note_id in note_ids])
+            db.commit()
+        self._notify([], list(note_ids))
+
+    # === Синхронизация ===
+
+    def _changed_since(self, since: float) -> List[int]:
+        """ID заметок, измененных после since: edited:N дает кандидатов, notesModTime - точный отбор"""
+        days = max(1, math.ceil((time.time() - since) / DAY) + 1)
+        candidates = self._api.find_notes_by_query(f'"note:{self.model_name}" edited:{days}')
+        if not candidates:
+            return []
+        try:
+            mods = self._api.notes_mod_time(candidates)
+        except Exception as e:
+            if is_connection_error(e):
+                raise
+            return candidates  # Старый AnkiConnect без notesModTime: берем всех кандидатов
+        known = self._mods()
+        return [note_id for note_id in candidates if mods.get(note_id) != known.get(note_id)]
+
+    def _pull(self, note_ids: List[int]) -> List[Tuple[int, str, str, str, str, int]]:
+        """Поля заметок (notesInfo) и колода первой карточки (cardsInfo), порциями"""
+        notes = self._api.notes_info(note_ids)
+        first_cards = [note["cards"][0] for note in notes if note.get("cards")]
+        decks = {card.get("note"): card.get("deckName", "") for card in self._api.cards_info(first_cards)}
+        field = self._api.note_field
+        rows = []
+        for note in notes:
+            note_id = note.get("noteId")
+            if not note_id:
+                continue
+            rows.append((note_id, field(note, "Phrase"), field(note, "Translation"), field(note, "Context"),
+                         decks.get(note_id, ""), note.get("mod", 0)))
+        return rows
+
+    def sync(self) -> Tuple[int, int]:
+        """
+        Одна синхронизация: полная при первом запуске, дальше - инкрементальная.
+
+        Returns:
+            (обновлено заметок, удалено заметок)
+
+        Raises:
+            Exception: ANKI_CONNECT_ERROR / ANKI_TIMEOUT_ERROR и ошибки AnkiConnect
+        """
+        with self._sync_lock:
+            started = time.time()
+            full = not self._meta("full_synced")
+            last_sync = self._meta("last_sync")
+            check_all = full or started - self._meta("deletion_check") >= self.DELETION_CHECK_INTERVAL
+
+            changed = [] if full else self._changed_since(last_sync)
+            deleted: List[int] = []
+            if check_all:
+                all_ids = set(self._api.find_notes_by_query(f'"note:{self.model_name}"'))
+                local_ids = self._ids()
+                deleted = sorted(local_ids - all_ids)
+                if full:
+                    changed = sorted(all_ids)
+                else:
+                    # Новые заметки со старым временем изменения (например, импорт колоды)
+                    changed = sorted(set(changed) | (all_ids - local_ids))
+
+            rows = self._pull(changed) if changed else []
+            with self._lock:
+                db = self._db()
+                db.executemany("INSERT OR REPLACE INTO notes (note_id, phrase, translation, context, deck, mod) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                db.executemany("DELETE FROM notes WHERE note_id = ?", [(note_id,) for note_id in deleted])
+                self._set_meta(db, "last_sync", started)
+                self._set_meta(db, "full_synced", 1)
+                if check_all:
+                    self._set_meta(db, "deletion_check", started)
+                db.commit()
+
+        self.last_error = None
+        if full:
+            debug_log(f"🪞 Зеркало Anki: полная загрузка, {len(rows)} заметок ({time.time() - started:.1f}с)")
+            self._notify(self.phrases(), [], full=True)
+        else:
+            if rows or deleted:
+                debug_log(f"🪞 Зеркало Anki: обновлено {len(rows)}, удалено {len(deleted)}")
+            self._notify([(row[0], row[1]) for row in rows], deleted)
+        return len(rows), len(deleted)
+
+    def _run(self):
+        # Сохраненное зеркало доступно сразу, еще до ответа Anki
+        if self._meta("full_synced"):
+            self._notify(self.phrases(), [], full=True)
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                if str(e) != self.last_error:
+                    debug_log(f"📡 Зеркало Anki: синхронизация не удалась ({e})")
+                self.last_error = str(e)
+            self._wake.wait(self.SYNC_INTERVAL)
+            self._wake.clear()
+
+    def start(self):
+        """Запускает фоновую синхронизацию (один раз за процесс)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="anki-mirror", daemon=True)
+            self._thread.start()
+
+    def request_sync(self):
+        """Синхронизировать, не дожидаясь интервала"""
+        self._wake.set()
+
+
+# Глобальное зеркало заметок
+anki_mirror = AnkiMirror()
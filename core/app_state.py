@@ -4,7 +4,7 @@
 Заменяет глобальные переменные на централизованный dataclass.
 """
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import queue
 
 
@@ -31,6 +31,11 @@ class AppState:
     translate_prompt: str = ""
     context_prompt: str = ""
     context_delimiter: str = "КОНТЕКСТ"
+    ai_fallback_providers: str = ""  # Резервные провайдеры через запятую (по приоритету)
+    ai_hedging: bool = False  # Запасной запрос, если основной провайдер медлит
+    model_routing_enabled: bool = False  # Выбор модели по длине фразы и контексту
+    model_routing_rules: List[Dict[str, Any]] = field(default_factory=list)
+    prompt_preset: str = ""  # Имя выбранного пресета промптов (для истории карточек)
     
     # TTS настройки
     tts: TTSSettings = field(default_factory=TTSSettings)
@@ -44,10 +49,22 @@ class AppState:
     clipboard_running: bool = True
     force_replace_flag: bool = False
     check_duplicates: bool = True  # Проверять дубликаты в Anki
+    duplicate_similarity: int = 0  # Порог сходства для почти-дубликатов, % (0 - только точные)
+    semantic_dedupe: bool = False  # Пакет: пропускать фразы, совпадающие с заметками по смыслу
+    embedding_model: str = "nomic-embed-text"
+    semantic_similarity: int = 92  # Порог косинусного сходства, %
+    tm_enabled: bool = True  # Память переводов: повторное использование прошлых генераций
+    tm_fuzzy_reuse: bool = False  # Брать из памяти перевод похожей (не той же) фразы
+    tm_reuse_similarity: int = 97  # Сходство фраз, %, при котором перевод берется из памяти (tm_fuzzy_reuse)
+    tm_example_similarity: int = 60  # Сходство, %, при котором фраза идет в промпт примером
+    tm_examples: int = 3
     
     # Буфер обмена
     last_clipboard: str = ""
     
+    # Последняя генерация в главном окне: фраза, модель, время (для истории карточек)
+    last_generation: Dict[str, Any] = field(default_factory=dict)
+    
     # Очереди для межпоточной коммуникации
     clipboard_queue: queue.Queue = field(default_factory=queue.Queue)
     results_queue: queue.Queue = field(default_factory=queue.Queue)
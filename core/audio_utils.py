@@ -123,6 +123,9 @@ def play_sound(sound_type="success"):
 
     threading.Thread(target=_play, daemon=True).start()
 
+_PUNCTUATION_RE = re.compile(r'([,.!?;:])')
+
+
 def process_text_for_speed(text, speed_level=0):
     if speed_level == 0:
         return text
@@ -132,26 +135,34 @@ def process_text_for_speed(text, speed_level=0):
     
     if speed_level == 1: # Медленно (0.8x-like)
         # Увеличиваем паузы между словами (больше пробелов)
-        processed_text = re.sub(r' ', r'   ', processed_text)
+        processed_text = processed_text.replace(' ', '   ')
         # Увеличиваем паузы после знаков препинания
-        processed_text = re.sub(r'([,.!?;:])', r'\1    ', processed_text)
+        processed_text = _PUNCTUATION_RE.sub(r'\1    ', processed_text)
     
     elif speed_level >= 2: # Очень медленно (0.5x-like)
         # Еще больше пробелов
-        processed_text = re.sub(r' ', r'      ', processed_text)
+        processed_text = processed_text.replace(' ', '      ')
         # Много пробелов после знаков препинания
-        processed_text = re.sub(r'([,.!?;:])', r'\1       ', processed_text)
+        processed_text = _PUNCTUATION_RE.sub(r'\1       ', processed_text)
         
     return processed_text
 
-def generate_unique_filename(text, lang, speed_level, tld):
-    """Генерирует уникальное имя файла"""
-    file_data = f"{text}_{lang}_{speed_level}_{tld}_{time.time()}"
+def generate_unique_filename(text, lang, speed_level, tld, unique=True):
+    """
+    Генерирует имя файла. unique=False - имя зависит только от текста и
+    настроек: повторная озвучка берется из кэша.
+    """
+    file_data = f"{text}_{lang}_{speed_level}_{tld}"
+    if unique:
+        file_data += f"_{time.time()}"
     file_hash = hashlib.md5(file_data.encode('utf-8')).hexdigest()
     return f"anki_audio_{file_hash}.mp3"
 
-def generate_audio(text, lang=None, speed_level=None, tld=None, debug=True):
-    """Генерирует аудиофайл"""
+def generate_audio(text, lang=None, speed_level=None, tld=None, debug=True, cache=False):
+    """
+    Генерирует аудиофайл.
+    cache=True - файл с тем же текстом и настройками переиспользуется.
+    """
     lang = lang or TTS_LANG
     speed_level = speed_level if speed_level is not None else TTS_SPEED_LEVEL
     tld = tld or TTS_TLD
@@ -176,13 +187,21 @@ def generate_audio(text, lang=None, speed_level=None, tld=None, debug=True):
     # Обрабатываем текст в зависимости от уровня скорости
     processed_text = process_text_for_speed(text, speed_level)
     
-    filename = generate_unique_filename(processed_text, lang, speed_level, tld)
+    filename = generate_unique_filename(processed_text, lang, speed_level, tld, unique=not cache)
     filepath = os.path.join(audio_folder, filename)
+    if cache and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+        return filepath
     
     try:
         from gtts import gTTS  # Lazy import
         tts = gTTS(text=processed_text, lang=lang, slow=gtts_slow, tld=tld)
-        tts.save(filepath)
+        if cache:
+            # Через временный файл: оборванная запись не попадет в кэш
+            part_path = f"{filepath}.{threading.get_ident()}.part"
+            tts.save(part_path)
+            os.replace(part_path, filepath)
+        else:
+            tts.save(filepath)
         return filepath if os.path.exists(filepath) else None
     except Exception as e:
         if debug: print(f"❌ Ошибка TTS: {e}")
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш списка колод с количеством карточек.
+Список колод (deckNames) живет TTL секунд; количество карточек
+запрашивается getDeckStats порциями и только для колод, которые видны:
+сначала для выбранной, затем в фоне для строк выпадающего списка, а для
+результатов поиска - по мере ввода. После добавления карточки счетчик колоды
+увеличивается сразу, без запроса к Anki. Подписи "Имя (N)" и порядок
+колод пересчитываются только при изменениях, имя по подписи находится
+словарем, а поиск по мере ввода идет по индексу core.deck_index.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Union
+
+from api.anki_api import anki_api, is_connection_error, DECK_STATS_CHUNK
+from core.deck_index import DeckIndex, SEARCH_LIMIT
+from core.logger import debug_log
+
+
+DROPDOWN_LIMIT = 200  # Больше строк выпадающий список отрисовывает заметно долго
+
+
+def dropdown_values(labels: List[str], current: str = "") -> List[str]:
+    """
+    Строки для выпадающего списка колод. При очень большом дереве - только
+    колоды верхнего уровня и текущая, остальные находятся поиском по вводу.
+    """
+    if len(labels) <= DROPDOWN_LIMIT:
+        return labels
+    values = [label for label in labels if "::" not in label][:DROPDOWN_LIMIT]
+    if current and current not in values:
+        values.insert(0, current)
+    return values
+
+
+class DeckCatalog:
+    """Список колод и счетчики карточек с отложенным обновлением"""
+
+    TTL = 300.0  # Сколько считать список колод и счетчики свежими, сек
+
+    def __init__(self, api=None):
+        self._api = api or anki_api
+        self._lock = threading.RLock()
+        self._names: List[str] = []               # Отсортированные имена колод
+        self._counts: Dict[str, int] = {}
+        self._counted_at: Dict[str, float] = {}
+        self._labels: List[str] = []              # Подписи в порядке _names
+        self._by_label: Dict[str, str] = {}       # Подпись -> имя колоды
+        self._index = DeckIndex()
+        self._pending: Dict[str, None] = {}      # Колоды из поиска, ждущие счетчика (по порядку)
+        self._counting = False                   # Фоновый подсчет для поиска уже идет
+        self.loaded_at = 0.0
+
+    # === Чтение ===
+
+    def labels(self) -> List[str]:
+        """Подписи для списка колод: 'Имя (N)' или 'Имя', пока счетчик не получен"""
+        with self._lock:
+            return list(self._labels)
+
+    def label(self, deck: str) -> str:
+        """Подпись колоды по ее имени (с подписью или без)"""
+        name = self.name_of(deck)
+        with self._lock:
+            count = self._counts.get(name)
+        return f"{name} ({count})" if count is not None else name
+
+    def name_of(self, label: str) -> str:
+        """Имя колоды по подписи из списка (без регулярного выражения для известных подписей)"""
+        with self._lock:
+            name = self._by_label.get(label)
+        return name if name is not None else self._api.clean_deck_name(label)
+
+    def has_deck(self, name: str) -> bool:
+        with self._lock:
+            return name in self._by_label
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[str]:
+        """
+        Подписи колод, подходящих под ввод (лучшие limit). Недостающие
+        счетчики найденных колод запрашиваются в фоне и появятся в подписях
+        при следующем вводе.
+        """
+        names = self._index.search(query, limit)
+        self._count_in_background(names)
+        return [self.label(name) for name in names]
+
+    def shown_decks(self, current: str = "") -> List[str]:
+        """Колоды, которые попадают в выпадающий список (тот же отбор, что dropdown_values)"""
+        current = self.name_of(current) if current else ""
+        with self._lock:
+            names = list(self._names)
+            known = current in self._by_label
+        return dropdown_values(names, current if known else "")
+
+    @property
+    def is_fresh(self) -> bool:
+        return bool(self._names) and time.time() - self.loaded_at < self.TTL
+
+    def _rebuild_labels(self):
+        self._labels = [f"{name} ({self._counts[name]})" if name in self._counts else name
+                        for name in self._names]
+        self._by_label = dict(zip(self._labels, self._names))
+        self._by_label.update((name, name) for name in self._names)
+
+    def _set_names(self, names: List[str]):
+        self._names = names
+        self._index.rebuild(names)
+
+    # === Обновление ===
+
+    def load_names(self, force: bool = False) -> bool:
+        """
+        Загружает список колод, если он устарел.
+
+        Returns:
+            True если список изменился
+
+        Raises:
+            Exception: ANKI_CONNECT_ERROR и ошибки AnkiConnect
+        """
+        if not force and self.is_fresh:
+            return False
+        names = sorted(self._api.deck_names())
+        with self._lock:
+            self.loaded_at = time.time()
+            if names == self._names:
+                return False
+            self._set_names(names)
+            alive = set(names)
+            self._counts = {name: count for name, count in self._counts.items() if name in alive}
+            self._rebuild_labels()
+        return True
+
+    def stale_decks(self, max_age: float = None, names: List[str] = None) -> List[str]:
+        """Колоды (все или из names) без счетчика или со счетчиком старше max_age"""
+        limit = time.time() - (self.TTL if max_age is None else max_age)
+        with self._lock:
+            return [name for name in (self._names if names is None else names)
+                    if self._counted_at.get(name, 0) < limit]
+
+    def update_counts(self, decks: List[str]):
+        """
+        Запрашивает количество карточек для колод (getDeckStats порциями).
+        Счетчики, полученные до ошибки, сохраняются.
+        """
+        for start in range(0, len(decks), DECK_STATS_CHUNK):
+            chunk = decks[start:start + DECK_STATS_CHUNK]
+            counts = self._api.deck_stats(chunk)
+            now = time.time()
+            with self._lock:
+                for name in chunk:
+                    if name in counts:
+                        self._counts[name] = counts[name]
+                        self._counted_at[name] = now
+                self._rebuild_labels()
+
+    def refresh(self, selected: str = None, force: bool = False) -> Union[List[str], str]:
+        """
+        Список колод для выпадающего списка: из кэша, если он свежий.
+        Счетчик выбранной колоды запрашивается сразу, остальные - fill_counts().
+
+        Returns:
+            Подписи колод или "ANKI_CONNECT_ERROR"
+        """
+        try:
+            self.load_names(force)
+            name = self.name_of(selected or "")
+            if name in self._names and (force or name in self.stale_decks()):
+                self.update_counts([name])
+        except Exception as e:
+            if is_connection_error(e):
+                return "ANKI_CONNECT_ERROR"
+            debug_log(f"⚠️ Колоды: {e}")
+        return self.labels()
+
+    def fill_counts(self, on_update: Callable[[List[str]], None] = None, force: bool = False,
+                    current: str = ""):
+        """
+        Досчитывает устаревшие счетчики колод выпадающего списка (вызывать
+        в фоне); on_update - после обновления. Остальные колоды считаются,
+        когда попадают в результаты поиска.
+        """
+        decks = self.stale_decks(0 if force else None, self.shown_decks(current))
+        if not decks:
+            return
+        try:
+            self.update_counts(decks)
+        except Exception as e:
+            debug_log(f"⚠️ Колоды: счетчики не обновлены ({e})")
+            return
+        if on_update:
+            on_update(self.labels())
+
+    def _count_in_background(self, names: List[str]):
+        """Ставит колоды без свежего счетчика в очередь фонового подсчета"""
+        stale = self.stale_decks(names=names)
+        with self._lock:
+            self._pending.update((name, None) for name in stale if name in self._by_label)
+            if not self._pending or self._counting:
+                return
+            self._counting = True
+        threading.Thread(target=self._count_pending, daemon=True).start()
+
+    def _count_pending(self):
+        """Фоновый подсчет колод из поиска порциями getDeckStats"""
+        while True:
+            with self._lock:
+                decks = list(self._pending)[:DECK_STATS_CHUNK]
+                if not decks:
+                    self._counting = False
+                    return
+            try:
+                self.update_counts(decks)
+            except Exception as e:
+                debug_log(f"⚠️ Колоды: счетчики найденных колод не обновлены ({e})")
+                with self._lock:
+                    self._pending.clear()
+                    self._counting = False
+                return
+            with self._lock:
+                for name in decks:
+                    self._pending.pop(name, None)
+
+    # === Локальные изменения ===
+
+    def note_added(self, deck: str, cards: int = 1):
+        """Карточка добавлена: счетчик колоды растет без запроса к Anki"""
+        name = self.name_of(deck)
+        with self._lock:
+            if name not in self._names:
+                self._set_names(sorted(self._names + [name]))
+            if name in self._counts:
+                self._counts[name] += cards
+            self._rebuild_labels()
+
+    def deck_added(self, deck: str):
+        """Новая пустая колода (создана приложением)"""
+        name = deck.strip()
+        with self._lock:
+            if name not in self._names:
+                self._set_names(sorted(self._names + [name]))
+            self._counts[name] = 0
+            self._counted_at[name] = time.time()
+            self._rebuild_labels()
+
+
+# Глобальный каталог колод
+deck_catalog = DeckCatalog()
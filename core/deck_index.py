@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск колод по мере ввода.
+Имена колод разбираются один раз при изменении списка: уровни иерархии
+("A::B::C") и слова в них хранятся в нижнем регистре. Запрос сравнивается
+с началами слов по порядку ("ger verb" -> "German::Verbs"), полный путь
+по префиксу и, если совпадений мало, нечетко - по подпоследовательности
+символов ("grmvrb"). Возвращаются только лучшие N колод, поэтому
+выпадающий список не строится из тысяч строк.
+"""
+import bisect
+import heapq
+import re
+import threading
+from typing import FrozenSet, List, NamedTuple, Tuple
+
+SEARCH_LIMIT = 30
+# Кандидатов на проверку в одном уровне совпадения: при очень частых словах
+# ("1 2 3") дальние колоды не просматриваются - они все равно ниже в списке
+SCAN_LIMIT = 1000
+
+_WORD_SPLIT_RE = re.compile(r"[\s_\-.]+")
+_QUERY_SPLIT_RE = re.compile(r"::|\s+")
+
+# Уровни совпадения (меньше - выше в списке)
+TIER_PATH_PREFIX = 0   # Полный путь начинается с запроса
+TIER_LEAF = 1          # Слова запроса по порядку, последнее - в названии самой колоды
+TIER_WORDS = 2         # Слова запроса - начала слов пути по порядку
+TIER_SUBSTRING = 3     # Все слова запроса встречаются в пути
+TIER_FUZZY = 4         # Символы запроса встречаются по порядку
+
+
+class _Deck(NamedTuple):
+    name: str
+    lower: str                          # Полный путь в нижнем регистре
+    words: Tuple[Tuple[int, str], ...]  # (номер уровня, слово) по порядку
+    depth: int
+
+
+def _parse(name: str) -> _Deck:
+    lower = name.casefold()
+    segments = lower.split("::")
+    words = tuple((level, word) for level, segment in enumerate(segments)
+                  for word in _WORD_SPLIT_RE.split(segment) if word)
+    return _Deck(name, lower, words, len(segments) - 1)
+
+
+def _words_tier(tokens: List[str], deck: _Deck) -> int:
+    """TIER_LEAF / TIER_WORDS, если каждое слово запроса - начало слова пути (по порядку), иначе -1"""
+    i = 0
+    level = 0
+    for level, word in deck.words:
+        if word.startswith(tokens[i]):
+            i += 1
+            if i == len(tokens):
+                break
+    else:
+        return -1
+    return TIER_LEAF if level == deck.depth else TIER_WORDS
+
+
+class _Blob:
+    """Строки всех колод одной склейкой: вхождения ищутся str.find, а не перебором списка"""
+
+    def __init__(self, parts: List[str]):
+        self.text = "\n" + "\n".join(parts)
+        self.starts = []
+        offset = 1
+        for part in parts:
+            self.starts.append(offset)
+            offset += len(part) + 1
+
+    def decks(self, needle: str):
+        """Номера колод, содержащих needle, по порядку (каждая колода - один раз)"""
+        text, starts = self.text, self.starts
+        shift = len(needle) - 1  # По последнему символу: needle может начинаться с "\n" перед колодой
+        pos = text.find(needle)
+        while pos >= 0:
+            index = bisect.bisect_right(starts, pos + shift) - 1
+            yield index
+            if index + 1 >= len(starts):
+                return
+            pos = text.find(needle, starts[index + 1] - 1)
+
+
+class DeckIndex:
+    """
+    Индекс имен колод для поиска по мере ввода.
+    Колоды заранее упорядочены так, как их нужно выдавать (уровень, длина,
+    имя), и склеены в строки: путь целиком, все слова, слова самой колоды.
+    Каждый уровень совпадения - поиск str.find по своей склейке, и он
+    останавливается, как только набрано limit колод.
+    """
+
+    def __init__(self, names: List[str] = None):
+        self._lock = threading.Lock()
+        self._decks: List[_Deck] = []
+        self._chars: List[FrozenSet[str]] = []
+        self._paths = self._words = self._leaves = _Blob([])
+        if names:
+            self.rebuild(names)
+
+    def __len__(self):
+        return len(self._decks)
+
+    def rebuild(self, names: List[str]):
+        """Разбирает список колод заново (вызывается при изменении списка)"""
+        decks = sorted((_parse(name) for name in names), key=lambda deck: (deck.depth, len(deck.lower), deck.lower))
+        # \x01 отмечает начало слова: "\x01verb" находит только слова, начинающиеся с "verb"
+        words = _Blob(["\x01" + "\x01".join(word for _, word in deck.words) for deck in decks])
+        leaves = _Blob(["\x01" + "\x01".join(word for level, word in deck.words if level == deck.depth)
+                        for deck in decks])
+        with self._lock:
+            self._decks = decks
+            self._chars = [frozenset(deck.lower) for deck in decks]
+            self._paths = _Blob([deck.lower for deck in decks])
+            self._words = words
+            self._leaves = leaves
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[str]:
+        """
+        Лучшие limit колод для запроса. Пустой запрос - колоды верхнего
+        уровня по алфавиту.
+        """
+        with self._lock:
+            decks, chars = self._decks, self._chars
+            paths, words, leaves = self._paths, self._words, self._leaves
+        tokens = [token for token in _QUERY_SPLIT_RE.split(query.casefold()) if token]
+        if not tokens:
+            top = [deck.name for deck in decks if deck.depth == 0]
+            return sorted(top, key=str.casefold)[:limit]
+
+        # Ведущее слово - самое редкое: меньше кандидатов на проверку
+        counts = [paths.text.count(token) for token in tokens]
+        key = tokens[counts.index(min(counts))]
+        others = [token for token in tokens if token is not key]
+        found: List[int] = []
+        seen = set()
+
+        def has_all(deck):
+            return all(token in deck.lower for token in others)
+
+        def collect(indexes, accept):
+            for scanned, index in enumerate(indexes):
+                if len(found) >= limit or scanned >= SCAN_LIMIT:
+                    return
+                if index not in seen and accept(decks[index]):
+                    seen.add(index)
+                    found.append(index)
+
+        if min(counts):
+            collect(paths.decks("\n" + "::".join(tokens)), lambda deck: True)
+            collect(leaves.decks("\x01" + key), lambda deck: has_all(deck) and _words_tier(tokens, deck) == TIER_LEAF)
+            collect(words.decks("\x01" + key), lambda deck: has_all(deck) and _words_tier(tokens, deck) >= 0)
+            collect(paths.decks(key), has_all)
+        if len(found) < limit:
+            found += self._fuzzy("".join(tokens), seen, limit - len(found), decks, chars)
+        return [decks[index].name for index in found]
+
+    @staticmethod
+    def _fuzzy(text: str, skip, limit: int, decks: List[_Deck], chars: List[FrozenSet[str]]) -> List[int]:
+        """Колоды, где символы запроса идут по порядку; плотные совпадения выше"""
+        needed = frozenset(text)
+        pattern = re.compile(".*?".join(re.escape(char) for char in text))
+        found = []
+        for index, deck_chars in enumerate(chars):
+            if index in skip or not needed <= deck_chars:
+                continue
+            match = pattern.search(decks[index].lower)
+            if match:
+                found.append((match.end() - match.start(), index))
+        return [index for _, index in heapq.nsmallest(limit, found)]
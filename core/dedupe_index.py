@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс дубликатов по существующим заметкам.
+Фразы хранятся в нормализованном виде (регистр, пунктуация, пробелы,
+<br> и HTML не учитываются), поэтому "Ich gehe nach Hause." и
+"ich gehe nach hause" - одна карточка. Дополнительно ищутся почти
+совпадающие фразы по сходству символьных триграмм (коэффициент Дайса).
+Запросы выполняются локально, без обращения к AnkiConnect; индекс
+заполняется из зеркала заметок (core.anki_mirror).
+"""
+import math
+import re
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+
+_HTML_RE = re.compile(r"<[^>]+>|&(?:#\d+|\w+);")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+NGRAM = 3
+
+
+def normalize_phrase(text: str) -> str:
+    """Нормализованная форма фразы: регистр, пунктуация, пробелы и HTML не важны"""
+    if "<" in text or "&" in text:
+        text = _HTML_RE.sub(" ", text)
+    return _NON_WORD_RE.sub(" ", text.casefold()).strip()
+
+
+def _ngrams(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+
+
+class DuplicateIndex:
+    """
+    Индекс: нормализованная фраза -> ID заметок, плюс обратный индекс
+    триграмм для поиска похожих фраз.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._notes: Dict[str, Set[int]] = {}       # ключ -> ID заметок
+        self._note_keys: Dict[int, str] = {}        # ID заметки -> ключ
+        self._grams: Dict[str, Set[str]] = {}       # триграмма -> ключи
+        self._key_grams: Dict[str, Set[str]] = {}   # ключ -> триграммы
+        self.ready = False
+        self.loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._note_keys)
+
+    # === Изменение ===
+
+    def add(self, note_id: int, phrase: str):
+        """Добавляет (или обновляет) заметку"""
+        key = normalize_phrase(phrase)
+        if not key:
+            return
+        with self._lock:
+            if self._note_keys.get(note_id) == key:
+                return
+            self.remove(note_id)
+            self._note_keys[note_id] = key
+            ids = self._notes.get(key)
+            if ids is None:
+                ids = self._notes[key] = set()
+                grams = _ngrams(key)
+                self._key_grams[key] = grams
+                for gram in grams:
+                    self._grams.setdefault(gram, set()).add(key)
+            ids.add(note_id)
+
+    def remove(self, note_id: int):
+        """Удаляет заметку из индекса"""
+        with self._lock:
+            key = self._note_keys.pop(note_id, None)
+            if key is None:
+                return
+            ids = self._notes.get(key)
+            if ids is not None:
+                ids.discard(note_id)
+                if not ids:
+                    del self._notes[key]
+                    for gram in self._key_grams.pop(key, ()):
+                        keys = self._grams.get(gram)
+                        if keys is not None:
+                            keys.discard(key)
+                            if not keys:
+                                del self._grams[gram]
+
+    def replace_all(self, notes: List[Tuple[int, str]]):
+        """Полностью пересобирает индекс из пар (note_id, phrase)"""
+        fresh = DuplicateIndex()
+        for note_id, phrase in notes:
+            fresh.add(note_id, phrase)
+        with self._lock:
+            self._notes, self._note_keys = fresh._notes, fresh._note_keys
+            self._grams, self._key_grams = fresh._grams, fresh._key_grams
+            self.ready = True
+            self.loaded_at = time.time()
+
+    # === Поиск ===
+
+    def find_exact(self, phrase: str) -> List[int]:
+        """ID заметок с той же нормализованной фразой"""
+        with self._lock:
+            return sorted(self._notes.get(normalize_phrase(phrase), ()))
+
+    def find_similar(self, phrase: str, threshold: float, limit: int = 5,
+                     max_candidates: int = 0) -> List[Tuple[str, float, List[int]]]:
+        """
+        Похожие фразы со сходством >= threshold (0..1).
+        Кандидаты берутся только по самым редким триграммам запроса
+        (prefix filtering): фраза со сходством >= threshold обязана
+        содержать хотя бы одну из них. max_candidates ограничивает число
+        проверяемых кандидатов (приближенный поиск для низких порогов).
+
+        Returns:
+            Список (нормализованная фраза, сходство, ID заметок), лучшие первыми
+        """
+        key = normalize_phrase(phrase)
+        if not key or threshold <= 0:
+            return []
+        query = _ngrams(key)
+        size = len(query)
+        with self._lock:
+            ordered = sorted(query, key=lambda gram: len(self._grams.get(gram, ())))
+            must_share = math.ceil(threshold * size / (2 - threshold))
+            prefix = ordered[:max(1, size - must_share + 1)]
+            candidates = set()
+            for gram in prefix:
+                candidates.update(self._grams.get(gram, ()))
+                if max_candidates and len(candidates) >= max_candidates:
+                    break
+
+            matches = []
+            for candidate in candidates:
+                grams = self._key_grams[candidate]
+                score = 2 * len(query & grams) / (size + len(grams))
+                if score >= threshold:
+                    matches.append((candidate, score, sorted(self._notes[candidate])))
+        matches.sort(key=lambda match: -match[1])
+        return matches[:limit]
+
+    def lookup(self, phrase: str, threshold: float = 0.0) -> List[int]:
+        """ID заметок-дубликатов: точное совпадение, иначе похожие (если threshold > 0)"""
+        exact = self.find_exact(phrase)
+        if exact or threshold <= 0:
+            return exact
+        ids: List[int] = []
+        for _, _, note_ids in self.find_similar(phrase, threshold):
+            ids.extend(note_ids)
+        return ids
+
+
+# Глобальный индекс дубликатов
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная история созданных карточек.
+Каждая отправленная в Anki карточка (фраза, перевод, контекст, модель,
+промпт, хэш аудио, колода, ID заметки, время генерации) сохраняется в
+SQLite с полнотекстовым индексом FTS5 - прошлый перевод находится за
+миллисекунды и добавляется снова без обращения к модели.
+Запись идет пакетами в фоновом потоке и не блокирует интерфейс.
+"""
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from core.logger import debug_log
+
+
+HISTORY_DB_NAME = "history.sqlite3"
+FLUSH_BATCH = 200      # Записей в одной транзакции
+FLUSH_DELAY = 0.5      # Сколько ждать следующих записей перед транзакцией, сек
+SEARCH_LIMIT = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    phrase TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    context TEXT NOT NULL DEFAULT '',
+    deck TEXT NOT NULL DEFAULT '',
+    note_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'added',
+    model TEXT NOT NULL DEFAULT '',
+    preset TEXT NOT NULL DEFAULT '',
+    audio_hash TEXT,
+    generation_seconds REAL,
+    audio_seconds REAL,
+    source TEXT NOT NULL DEFAULT 'single'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+    phrase, translation, context,
+    content='cards', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS cards_ai AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts(rowid, phrase, translation, context)
+    VALUES (new.id, new.phrase, new.translation, new.context);
+END;
+CREATE TRIGGER IF NOT EXISTS cards_ad AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts(cards_fts, rowid, phrase, translation, context)
+    VALUES ('delete', old.id, old.phrase, old.translation, old.context);
+END;
+"""
+
+_COLUMNS = ("created", "phrase", "translation", "context", "deck", "note_id", "status",
+            "model", "preset", "audio_hash", "generation_seconds", "audio_seconds", "source")
+_INSERT_SQL = (f"INSERT INTO cards ({', '.join(_COLUMNS)}) "
+               f"VALUES ({', '.join('?' * len(_COLUMNS))})")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def file_hash(path: Optional[str]) -> Optional[str]:
+    """SHA-1 аудиофайла (None, если файла нет)"""
+    if not path or not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_match_query(text: str) -> str:
+    """
+    Поисковая строка -> запрос FTS5: все слова (как префиксы) должны встретиться.
+    Одна буква ищется как целое слово: префикс из одной буквы совпадает
+    с большей частью истории и для него нет префиксного индекса.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    return " ".join(f'"{token}"*' if len(token) > 1 else f'"{token}"' for token in tokens)
+
+
+class HistoryStore:
+    """История карточек: чтение - из потока интерфейса, запись - через фоновый поток"""
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    # === Хранилище ===
+
+    def _dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+        return self._base_dir
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self._dir(), exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self._dir(), HISTORY_DB_NAME),
+                               timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _db(self) -> sqlite3.Connection:
+        """Соединение для чтения (WAL: чтение не ждет фоновую запись)"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    # === Запись ===
+
+    def record(self, phrase: str, translation: str, context: str = "", deck: str = "",
+               note_id: int = None, status: str = "added", model: str = "", preset: str = "",
+               audio_hash: str = None, generation_seconds: float = None,
+               audio_seconds: float = None, source: str = "single"):
+        """Ставит карточку в очередь на запись (не блокирует)"""
+        self._queue.put({
+            "created": time.time(), "phrase": phrase, "translation": translation,
+            "context": context or "", "deck": deck or "", "note_id": note_id, "status": status,
+            "model": model or "", "preset": preset or "", "audio_hash": audio_hash,
+            "generation_seconds": generation_seconds, "audio_seconds": audio_seconds, "source": source,
+        })
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                    self._writer.start()
+
+    def _run(self):
+        """Фоновая запись: собирает записи за FLUSH_DELAY и пишет одной транзакцией"""
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + FLUSH_DELAY
+            while len(batch) < FLUSH_BATCH:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(_INSERT_SQL, [tuple(card[c] for c in _COLUMNS) for card in batch])
+            except sqlite3.Error as e:
+                debug_log(f"⚠️ История: {len(batch)} записей не сохранено: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Ждет записи всех поставленных в очередь карточек"""
+        if self._writer is not None:
+            self._queue.join()
+
+    # === Чтение ===
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Поиск по фразе, переводу и контексту по мере ввода (недописанное
+        слово ищется как префикс). Пустой запрос - последние карточки.
+        Новые карточки первыми.
+        """
+        match = build_match_query(text)
+        with self._lock:
+            db = self._db()
+            if not match:
+                rows = db.execute("SELECT * FROM cards ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT cards.* FROM cards JOIN ("
+                    "  SELECT rowid FROM cards_fts WHERE cards_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+                    ") AS found ON cards.id = found.rowid ORDER BY cards.id DESC",
+                    (match, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM cards WHERE id = ?", (entry_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+
+# Глобальная история карточек
+history_store = HistoryStore()
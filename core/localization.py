@@ -104,6 +104,35 @@ TRANSLATIONS = {
         "no_api_key": "Нет ключа",
         "enter_api_key_warning": "Введите API ключ",
         "select_or_enter_manually": "💡 Выберите из списка или введите вручную. Нажмите ★ чтобы сохранить в пресеты.",
+        "fallback_providers_label": "Резервные:",
+        "hedging_label": "Запасной запрос при задержке",
+        "model_routing_label": "Выбирать модель по длине фразы",
+        "stats": "Статистика AI",
+        "stats_tooltip": "Задержки и скорость генерации по моделям",
+        "stats_empty": "Пока нет данных: сгенерируйте хотя бы один перевод.",
+        "stats_col_model": "Провайдер / модель",
+        "stats_col_requests": "запр",
+        "stats_col_errors": "ошиб",
+        "stats_col_queue": "очер95",
+        "stats_col_load": "загр",
+        "stats_col_speed": "ток/с",
+        "stats_reset": "Сбросить",
+        "outbox_queued": "📥 Anki недоступен, в очереди: {count}",
+        "outbox_pending": "📥 В очереди Anki: {count}",
+        "outbox_delivered": "📤 Доставлено: {count}",
+        "outbox_failed": "⚠️ Отклонено: {count}",
+        "outbox_tooltip": "Карточки, сохраненные пока Anki был недоступен. Отправляются автоматически.",
+        "history": "История карточек",
+        "history_tooltip": "Поиск по всем созданным карточкам",
+        "history_search": "Поиск по фразе, переводу или контексту...",
+        "history_empty": "Ничего не найдено",
+        "history_open": "Открыть",
+        "history_readd": "Добавить снова",
+        "history_count": "Найдено: {count} ({ms:.0f} мс)",
+        "traces": "Последние карточки",
+        "traces_tooltip": "Где тратится время от перехвата до карточки в Anki",
+        "traces_empty": "Пока нет данных: добавьте хотя бы одну карточку.",
+        "model_routing_tooltip": 'Правила JSON, напр.: [{"max_words": 3, "model": "gemma3:1b"}, {"min_words": 12, "context": true, "model": "gemma3:4b"}]',
     },
     "en": {
         "app_title": "Anki German Helper",
@@ -205,6 +234,35 @@ TRANSLATIONS = {
         "no_api_key": "No key",
         "enter_api_key_warning": "Enter API key",
         "select_or_enter_manually": "💡 Select from list or enter manually. Click ★ to save to presets.",
+        "fallback_providers_label": "Fallback:",
+        "hedging_label": "Hedge slow requests",
+        "model_routing_label": "Pick model by phrase length",
+        "stats": "AI Statistics",
+        "stats_tooltip": "Latency and generation speed per model",
+        "stats_empty": "No data yet: generate at least one translation.",
+        "stats_col_model": "Provider / model",
+        "stats_col_requests": "reqs",
+        "stats_col_errors": "errs",
+        "stats_col_queue": "queue95",
+        "stats_col_load": "load",
+        "stats_col_speed": "tok/s",
+        "stats_reset": "Reset",
+        "outbox_queued": "📥 Anki unavailable, queued: {count}",
+        "outbox_pending": "📥 Queued for Anki: {count}",
+        "outbox_delivered": "📤 Delivered: {count}",
+        "outbox_failed": "⚠️ Rejected: {count}",
+        "outbox_tooltip": "Cards saved while Anki was unavailable. They are sent automatically.",
+        "history": "Card history",
+        "history_tooltip": "Search all cards you have created",
+        "history_search": "Search phrase, translation or context...",
+        "history_empty": "Nothing found",
+        "history_open": "Open",
+        "history_readd": "Add again",
+        "history_count": "Found: {count} ({ms:.0f} ms)",
+        "traces": "Recent cards",
+        "traces_tooltip": "Where time goes from capture to the card in Anki",
+        "traces_empty": "No data yet: add at least one card.",
+        "model_routing_tooltip": 'JSON rules, e.g.: [{"max_words": 3, "model": "gemma3:1b"}, {"min_words": 12, "context": true, "model": "gemma3:4b"}]',
     }
 }
 
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Очередь исходящих заметок Anki (write-ahead outbox).
+Если AnkiConnect недоступен, готовая карточка (перевод, контекст, аудио)
+сохраняется в SQLite в папке пользователя, а фоновый отправщик доставляет
+ее пакетами, когда Anki снова доступен. Генерация не ждет Anki.
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.anki_api import anki_api, format_field, is_connection_error
+from core.anki_mirror import anki_mirror
+from core.deck_catalog import deck_catalog
+from core.logger import debug_log
+
+
+OUTBOX_DB_NAME = "anki_outbox.sqlite3"
+OUTBOX_AUDIO_DIR = "outbox_audio"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    phrase TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    context TEXT NOT NULL,
+    deck TEXT NOT NULL,
+    audio_path TEXT,
+    allow_duplicate INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, id);
+"""
+
+
+class AnkiOutbox:
+    """
+    Журнал заметок, ожидающих доставки в Anki.
+
+    Статусы записей: pending - ждет отправки, failed - Anki отклонил заметку
+    (например, дубликат). Доставленные записи удаляются из журнала.
+    sent_at - время отправки, на которую Anki не ответил (ANKI_TIMEOUT_ERROR):
+    addNote/multi не идемпотентны, поэтому перед повтором проверяется, не
+    добавлена ли заметка.
+    """
+
+    BATCH_SIZE = 25
+    MIN_BACKOFF = 2.0
+    MAX_BACKOFF = 120.0
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()  # Одна отправка за раз (фон и submit)
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Dict[str, int]], None]] = []
+        self.delivered = 0  # Доставлено за сессию
+
+    # === Хранилище ===
+
+    def _dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+        return self._base_dir
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self._dir(), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self._dir(), OUTBOX_DB_NAME),
+                                   timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            if "sent_at" not in columns:
+                conn.execute("ALTER TABLE outbox ADD COLUMN sent_at REAL")
+            self._conn = conn
+        return self._conn
+
+    def _keep_audio(self, audio_path: str) -> Optional[str]:
+        """Переносит временный MP3 в папку очереди, чтобы он пережил перезапуск"""
+        if not audio_path or not os.path.exists(audio_path):
+            return None
+        audio_dir = os.path.join(self._dir(), OUTBOX_AUDIO_DIR)
+        os.makedirs(audio_dir, exist_ok=True)
+        target = os.path.join(audio_dir, f"{int(time.time() * 1000)}_{os.path.basename(audio_path)}")
+        try:
+            shutil.move(audio_path, target)
+            return target
+        except OSError as e:
+            debug_log(f"⚠️ Outbox: не удалось сохранить аудио: {e}")
+            return None
+
+    def enqueue(self, phrase: str, translation: str, context: str, deck_name: str,
+                audio_path: str = None, allow_duplicate: bool = False, sent_at: float = None) -> int:
+        """Сохраняет карточку в журнал. Возвращает ID записи."""
+        kept_audio = self._keep_audio(audio_path)
+        with self._lock:
+            db = self._db()
+            cursor = db.execute(
+                "INSERT INTO outbox (created, phrase, translation, context, deck, audio_path, allow_duplicate, sent_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), phrase, translation, context, deck_name, kept_audio, int(allow_duplicate), sent_at))
+            db.commit()
+            entry_id = cursor.lastrowid
+        debug_log(f"📥 Outbox: карточка '{phrase[:30]}' сохранена (#{entry_id})")
+        self._notify()
+        self._wake.set()
+        return entry_id
+
+    def counts(self) -> Dict[str, int]:
+        """Количество записей по статусам + доставленные за сессию"""
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = {"pending": 0, "failed": 0}
+        counts.update(dict(rows))
+        counts["delivered"] = self.delivered
+        return counts
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def retry_failed(self):
+        """Возвращает отклоненные записи в очередь"""
+        with self._lock:
+            db = self._db()
+            db.execute("UPDATE outbox SET status = 'pending', last_error = NULL WHERE status = 'failed'")
+            db.commit()
+        self._notify()
+        self._wake.set()
+
+    # === Отправка ===
+
+    def submit(self, phrase: str, translation: str, context: str, deck_name: str,
+               audio_path: str = None, allow_duplicate: bool = False) -> Tuple[str, int]:
+        """
+        Добавляет карточку в Anki или, если Anki недоступен, в очередь.
+        Если в очереди есть записи, сначала отправляются они (сохраняется
+        порядок); Anki недоступен - карточка встает за ними без попытки
+        соединения. Ошибки Anki (дубликат) передаются вызывающему.
+
+        Returns:
+            ("added", note_id) или ("queued", entry_id)
+
+        Raises:
+            Exception: Ошибка Anki, не связанная с соединением (например, дубликат)
+        """
+        if self.pending_count():
+            try:
+                self.flush()
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                debug_log(f"📡 Anki недоступен ({e}), карточка отложена")
+                return "queued", self.enqueue(phrase, translation, context, deck_name, audio_path, allow_duplicate)
+        sent_at = time.time()
+        try:
+            note_id = anki_api.add_note(phrase, translation, context, deck_name, audio_path, allow_duplicate)
+            anki_mirror.note_added(note_id, phrase, translation, context, deck_name)
+            deck_catalog.note_added(deck_name)
+            return "added", note_id
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            debug_log(f"📡 Anki недоступен ({e}), карточка отложена")
+            # Таймаут: заметка могла быть добавлена - перед повтором проверяется
+            timed_out = str(e) == "ANKI_TIMEOUT_ERROR"
+            return "queued", self.enqueue(phrase, translation, context, deck_name, audio_path,
+                                          allow_duplicate, sent_at if timed_out else None)
+
+    @staticmethod
+    def _already_added(phrase: str, translation: str, sent_at: float) -> Optional[int]:
+        """
+        ID заметки, которую Anki добавил по отправке без ответа (та же фраза и
+        перевод, создана не раньше отправки). Ошибки соединения не скрываются.
+        """
+        note_ids = [note_id for note_id in anki_api.find_notes_by_query(anki_api.phrase_query(phrase))
+                    if note_id >= int((sent_at - 1) * 1000)]  # ID заметки - время создания, мс
+        if not note_ids:
+            return None
+        for note in anki_api.notes_info(note_ids):
+            if (anki_api.note_field(note, "Phrase") == format_field(phrase)
+                    and anki_api.note_field(note, "Translation") == format_field(translation)):
+                return note["noteId"]
+        return None
+
+    def flush(self) -> int:
+        """
+        Доставляет ожидающие записи пакетами по BATCH_SIZE.
+
+        Returns:
+            Количество доставленных заметок
+
+        Raises:
+            Exception: ANKI_CONNECT_ERROR / ANKI_TIMEOUT_ERROR - Anki недоступен
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        delivered_total = 0
+        while True:
+            with self._lock:
+                rows = self._db().execute(
+                    "SELECT id, phrase, translation, context, deck, audio_path, allow_duplicate, sent_at "
+                    "FROM outbox WHERE status = 'pending' ORDER BY id LIMIT ?", (self.BATCH_SIZE,)).fetchall()
+            if not rows:
+                return delivered_total
+
+            # Записи, отправленные без ответа: возможно, уже в Anki
+            found, to_send = [], []
+            for row in rows:
+                note_id = self._already_added(row[1], row[2], row[7]) if row[7] is not None else None
+                if note_id:
+                    debug_log(f"📤 Outbox: запись #{row[0]} уже добавлена в Anki, повтор не нужен")
+                    found.append((row, note_id))
+                else:
+                    to_send.append(row)
+            if found:
+                delivered_total += self._complete(found)
+            if not to_send:
+                continue
+
+            notes = [anki_api.build_note(phrase, translation, context, deck, audio, bool(allow_dup))
+                     for _, phrase, translation, context, deck, audio, allow_dup, _ in to_send]
+            sent_at = time.time()
+            try:
+                results = anki_api.add_notes(notes)
+            except Exception as e:
+                timed_out = str(e) == "ANKI_TIMEOUT_ERROR"
+                with self._lock:
+                    db = self._db()
+                    db.executemany("UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                                   "sent_at = COALESCE(sent_at, ?) WHERE id = ?",
+                                   [(str(e), sent_at if timed_out else None, row[0]) for row in to_send])
+                    db.commit()
+                raise
+
+            delivered, rejected = [], []
+            for row, (note_id, error) in zip(to_send, results):
+                if error or not note_id:
+                    rejected.append((str(error or "unknown error"), row[0]))
+                else:
+                    delivered.append((row, note_id))
+            delivered_total += self._complete(delivered, rejected)
+
+    def _complete(self, delivered: List[Tuple[tuple, int]], rejected: List[Tuple[str, int]] = ()) -> int:
+        """
+        Завершает доставку: заметки - в зеркало и счетчики колод, записи и
+        их аудио удаляются; отклоненные записи помечаются failed.
+        Возвращает количество доставленных.
+        """
+        for row, note_id in delivered:
+            anki_mirror.note_added(note_id, *row[1:5])
+            deck_catalog.note_added(row[4])
+
+        with self._lock:
+            db = self._db()
+            db.executemany("DELETE FROM outbox WHERE id = ?", [(row[0],) for row, _ in delivered])
+            db.executemany("UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? "
+                           "WHERE id = ?", rejected)
+            db.commit()
+
+        for row, _ in delivered:
+            audio = row[5]
+            if audio and os.path.exists(audio):
+                try:
+                    os.remove(audio)
+                except OSError:
+                    pass
+        for error, entry_id in rejected:
+            debug_log(f"⚠️ Outbox: Anki отклонил запись #{entry_id}: {error}")
+
+        self.delivered += len(delivered)
+        debug_log(f"📤 Outbox: доставлено {len(delivered)}, отклонено {len(rejected)}")
+        self._notify()
+        return len(delivered)
+
+    def _run(self):
+        """Фоновый отправщик: ждет записей, при недоступности Anki - экспоненциальная пауза"""
+        backoff = self.MIN_BACKOFF
+        while True:
+            if not self.pending_count():
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self.flush()
+                backoff = self.MIN_BACKOFF
+            except Exception as e:
+                debug_log(f"📡 Outbox: Anki недоступен ({e}), повтор через {backoff:.0f}с")
+                self._wake.wait(backoff)
+                self._wake.clear()
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+    def start(self, listener: Callable[[Dict[str, int]], None] = None):
+        """Запускает фоновый отправщик (один раз за процесс)"""
+        if listener:
+            self._listeners.append(listener)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="anki-outbox", daemon=True)
+            self._thread.start()
+        self._notify()
+
+    def _notify(self):
+        if not self._listeners:
+            return
+        counts = self.counts()
+        for listener in list(self._listeners):
+            try:
+                listener(counts)
+            except Exception as e:
+                debug_log(f"⚠️ Outbox listener error: {e}")
+
+
+# Глобальный экземпляр очереди
+anki_outbox = AnkiOutbox()
@@ -6,6 +6,7 @@ import tkinter as tk
 from tkinter import messagebox
 import queue
 import threading
+import time
 import os
 
 from core.app_state import app_state
@@ -13,10 +14,24 @@ from core.settings_manager import load_settings, DEFAULT_DECK_NAME
 from core import audio_utils
 from api.anki_api import anki_api
 from core.workers import add_to_anki_worker, format_clipboard_text
+from core.anki_mirror import anki_mirror
+from core.deck_catalog import deck_catalog, dropdown_values
 from core.localization import localization_manager
+from core.profiling import profiler
+from core.tracing import tracer, trace_of
 # NOTE: update_processing_indicator импортируется внутри функций чтобы избежать циклического импорта
 
+# Сообщения, которыми заканчивается путь карточки -> статус трассы
+TRACE_FINAL_STATUS = {
+    "anki_ok": "added",
+    "anki_queued": "queued",
+    "anki_error": "anki_error",
+    "audio_error": "audio_error",
+    "ollama_error": "generation_error",
+}
 
+
+@profiler.tk_handler("clipboard_queue")
 def process_clipboard_queue(root):
     """Обрабатывает очередь буфера обмена"""
     from core.ui_callbacks import update_processing_indicator
@@ -26,6 +41,10 @@ def process_clipboard_queue(root):
     
     try:
         new_text = app_state.clipboard_queue.get_nowait()
+        profiler.label("text")
+        trace_id = trace_of(new_text)
+        tracer.dequeue(trace_id, "clipboard")
+        render_start = time.perf_counter()
         print(f"📥 Обработка текста из очереди: {len(new_text)} символов")
         
         widgets = app_state.main_window_components["widgets"]
@@ -34,7 +53,9 @@ def process_clipboard_queue(root):
         
         widgets["german_text"].configure(text_color=("gray10", "gray90"))
         widgets["german_text"].delete("1.0", tk.END)
-        widgets["german_text"].insert("1.0", format_clipboard_text(new_text))
+        phrase = format_clipboard_text(new_text)
+        widgets["german_text"].insert("1.0", phrase)
+        tracer.activate(trace_id, phrase.strip())
         
         widgets["translation_text"].configure(text_color=("gray10", "gray90"))
         widgets["translation_text"].delete("1.0", tk.END)
@@ -80,6 +101,7 @@ def process_clipboard_queue(root):
                         print(f"📋 Собиратель: текст добавлен в пакет ({len(formatted_new_text)} символов)")
                 except Exception as e:
                     print(f"Ошибка добавления в пакет: {e}")
+        tracer.add_span(trace_id, "ui:capture", render_start)
 
         auto_gen_enabled = app_state.get_checkbox_value("auto_generate_var", default=False)
         if auto_gen_enabled:
@@ -100,12 +122,21 @@ def process_clipboard_queue(root):
             root.after(50, process_clipboard_queue, root)
 
 
+@profiler.tk_handler("results_queue")
 def process_results_queue(root):
     """Обрабатывает очередь результатов"""
     from core.ui_callbacks import update_processing_indicator
     
+    trace_id, trace_status = None, None
     try:
-        message, data = app_state.results_queue.get_nowait()
+        item = app_state.results_queue.get_nowait()
+        message, data = item[0], item[1]
+        profiler.label(message)
+        # Сообщения карточки несут ID трассы третьим элементом
+        trace_id = item[2] if len(item) > 2 else None
+        tracer.dequeue(trace_id, "results")
+        trace_status = TRACE_FINAL_STATUS.get(message)
+        render_start = time.perf_counter()
         widgets = app_state.main_window_components["widgets"]
         tvars = app_state.main_window_components["vars"]
         
@@ -129,6 +160,7 @@ def process_results_queue(root):
             auto_add_var = tvars.get("auto_add_to_anki_var")
             if auto_add_var and auto_add_var.get():
                 print("🤖 Авто-добавление в Anki...")
+                tracer.enqueue(trace_id, "tk")
                 root.after(100, app_state.main_window_components.get("on_yes_action_func", lambda: None))
                 
         elif message == "ollama_error":
@@ -149,7 +181,7 @@ def process_results_queue(root):
             update_processing_indicator("📤 Добавление...", animate=False)
             
             raw_deck_name = tvars["deck_var"].get().strip() or DEFAULT_DECK_NAME
-            deck_name = anki_api.clean_deck_name(raw_deck_name)
+            deck_name = deck_catalog.name_of(raw_deck_name)
             
             threading.Thread(target=add_to_anki_worker, args=(
                 app_state.results_queue,
@@ -158,10 +190,11 @@ def process_results_queue(root):
                 widgets["context_widget"].get("1.0", tk.END).strip(),
                 deck_name,
                 audio_path, False, app_state.force_replace_flag
-            ), daemon=True).start()
+            ), kwargs={"trace_id": trace_id}, daemon=True).start()
             
         elif message == "anki_ok":
             if data:
+                _update_deck_counts(widgets, tvars)
                 app_state.force_replace_flag = False
                 audio_utils.play_sound("success")
                 widgets["add_btn"].configure(
@@ -177,6 +210,23 @@ def process_results_queue(root):
                 root.after(1500, app_state.main_window_components["on_action_complete"])
             root.after(2000, lambda: update_processing_indicator("", animate=False))
 
+        elif message == "anki_queued":
+            # Anki недоступен: карточка сохранена в очереди и будет доставлена позже
+            app_state.force_replace_flag = False
+            audio_utils.play_sound("success")
+            update_processing_indicator(localization_manager.get_text("outbox_queued", count=data), animate=False)
+            if "add_btn" in widgets:
+                widgets["add_btn"].configure(
+                    state="normal",
+                    text="✅ " + localization_manager.get_text("add_to_anki"),
+                    fg_color="#2CC985", hover_color="#26AD72", text_color="white"
+                )
+            root.after(1500, app_state.main_window_components["on_action_complete"])
+            root.after(3000, lambda: update_processing_indicator("", animate=False))
+
+        elif message == "outbox_status":
+            _handle_outbox_status(widgets, data)
+
         elif message == "batch_log":
             _handle_batch_log(widgets, data)
         elif message == "batch_log_append":
@@ -228,9 +278,12 @@ def process_results_queue(root):
                 
                 def delete_and_add_worker():
                     if anki_api.delete_notes(existing_ids):
-                        add_to_anki_worker(app_state.results_queue, phrase, translation, context, deck_name, audio_path, confirm_delete=True)
+                        anki_mirror.notes_deleted(existing_ids)
+                        add_to_anki_worker(app_state.results_queue, phrase, translation, context, deck_name, audio_path,
+                                           confirm_delete=True, trace_id=trace_id)
                     else:
-                        app_state.results_queue.put(("anki_error", "Не удалось удалить старую версию карточки."))
+                        tracer.post(app_state.results_queue, "anki_error", "Не удалось удалить старую версию карточки.",
+                                    trace_id)
                 
                 threading.Thread(target=delete_and_add_worker, daemon=True).start()
             else:
@@ -239,6 +292,7 @@ def process_results_queue(root):
                         os.remove(audio_path)
                     except OSError:
                         pass
+                trace_status = "cancelled"
                 update_processing_indicator("Отменено", animate=False)
                 root.after(2000, lambda: update_processing_indicator("", animate=False))
                 
@@ -265,17 +319,23 @@ def process_results_queue(root):
                 combo.configure(values=["AnkiConnect недоступен"], state="disabled")
                 var.set("AnkiConnect недоступен")
             elif data:
-                combo.configure(state="normal", values=data)
+                combo.configure(state="normal", values=dropdown_values(data, deck_catalog.label(var.get())))
+                # Текущий выбор сохраняется (повторные списки приходят с досчитанными счетчиками)
+                current = deck_catalog.name_of(var.get())
                 settings = load_settings(update_app_state=False)
                 last_deck = settings.get("LAST_DECK", "")
                 
                 found = False
-                if last_deck:
+                for wanted in (current, last_deck):
+                    if not wanted:
+                        continue
                     for deck in data:
-                        if anki_api.clean_deck_name(deck) == last_deck:
+                        if deck_catalog.name_of(deck) == wanted:
                             var.set(deck)
                             found = True
                             break
+                    if found:
+                        break
                 
                 if not found and data:
                     var.set(data[0])
@@ -290,6 +350,10 @@ def process_results_queue(root):
         import traceback
         traceback.print_exc()
     finally:
+        if trace_id:
+            tracer.add_span(trace_id, f"ui:{message}", render_start)
+            if trace_status:
+                tracer.finish(trace_id, trace_status)
         if root and root.winfo_exists():
             root.after(50, process_results_queue, root)
 
@@ -298,6 +362,35 @@ def process_results_queue(root):
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ ОБРАБОТКИ СООБЩЕНИЙ
 # =====================================================================================
 
+def _update_deck_counts(widgets, tvars):
+    """Обновляет подписи колод после добавления карточек (счетчики из кэша колод)"""
+    combo = widgets.get("deck_combo")
+    labels = deck_catalog.labels()
+    if not combo or not labels or "deck_var" not in tvars:
+        return
+    current = tvars["deck_var"].get()
+    combo.configure(values=dropdown_values(labels, deck_catalog.label(current)))
+    if deck_catalog.has_deck(current):
+        tvars["deck_var"].set(deck_catalog.label(current))
+
+
+def _handle_outbox_status(widgets, counts):
+    """Показывает состояние очереди Anki (ожидают / доставлено / отклонено)"""
+    if counts.get("delivered"):
+        _update_deck_counts(widgets, app_state.main_window_components.get("vars", {}))
+    label = widgets.get("outbox_label")
+    if not label:
+        return
+    parts = []
+    if counts.get("pending"):
+        parts.append(localization_manager.get_text("outbox_pending", count=counts["pending"]))
+    if counts.get("delivered"):
+        parts.append(localization_manager.get_text("outbox_delivered", count=counts["delivered"]))
+    if counts.get("failed"):
+        parts.append(localization_manager.get_text("outbox_failed", count=counts["failed"]))
+    label.configure(text="  ".join(parts))
+
+
 def _handle_batch_log(widgets, data):
     """Добавляет новую строку в лог пакетной обработки."""
     if "batch_log" in widgets:
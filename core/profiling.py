@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+Режим профилирования: где тратится время - в потоке интерфейса,
+AnkiConnect, модели или озвучке.
+
+Включается переменной окружения LERNE_PROFILE=1 или настройкой PROFILING
+(LERNE_PROFILE_MEMORY=1 / PROFILING_MEMORY - еще и tracemalloc). В режиме:
+- воркеры (@profiler.worker) и обработчики очередей Tk (@profiler.tk_handler)
+  замеряют длительность вызовов;
+- сэмплирующий профилировщик раз в SAMPLE_INTERVAL снимает стеки всех
+  потоков (cProfile не подходит: воркеры работают одновременно, а
+  clipboard_worker - всю сессию); стеки воркеров помечаются их именем;
+- пульс mainloop (root.after) измеряет, насколько Tk опаздывает, и для
+  зависаний дольше STALL_THRESHOLD запоминает стек главного потока.
+Отчет сессии пишется при выходе в user_files/profiles: текст, JSON и
+свернутые стеки (.folded - для flamegraph.pl / speedscope).
+Без режима обертки только проверяют флаг.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from api.latency import percentile
+from core.logger import debug_log
+
+
+PROFILE_ENV = "LERNE_PROFILE"
+PROFILE_MEMORY_ENV = "LERNE_PROFILE_MEMORY"
+PROFILES_DIR = "profiles"
+
+SAMPLE_INTERVAL = 0.01    # Период сэмплирования стеков, сек
+MAX_STACK_DEPTH = 48
+HEARTBEAT_MS = 50         # Пульс mainloop
+STALL_THRESHOLD = 0.1     # Tk не отвечал дольше - зависание
+MAX_STALLS = 200
+TIMINGS_WINDOW = 5000     # Замеров на имя (для перцентилей)
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+MAX_REPORTS = 20          # Старые отчеты удаляются
+
+# Куда относится стек (по самому глубокому совпавшему файлу)
+STACK_CATEGORIES = (
+    ("anki_api.py", "AnkiConnect"),
+    ("ollama_provider.py", "LLM"),
+    ("openrouter_provider.py", "LLM"),
+    ("routing_provider.py", "LLM"),
+    ("gtts", "TTS"),
+    ("audio_utils.py", "TTS"),
+    ("tkinter", "Tk"),
+    ("customtkinter", "Tk"),
+)
+
+_Frame = Tuple[str, str, int]  # (файл, функция, строка)
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class _Timings:
+    """Длительности вызовов одного воркера или обработчика"""
+
+    def __init__(self):
+        self.values = deque(maxlen=TIMINGS_WINDOW)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float, ok: bool = True):
+        self.values.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> Dict:
+        values = list(self.values)
+        return {
+            "calls": self.count, "errors": self.errors, "total_s": round(self.total, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+class SessionProfiler:
+    """Профилировщик сессии (глобальный profiler)"""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self._lock = threading.Lock()
+        self._timings: Dict[str, _Timings] = {}
+        self._workers: Dict[int, str] = {}       # thread id -> имя воркера
+        self._stacks: Counter = Counter()        # (группа, стек) -> сэмплов
+        self._samples = 0
+        self._main_stacks = deque(maxlen=int(2.0 / SAMPLE_INTERVAL))  # (время, стек) главного потока
+        self._stalls: List[Dict] = []
+        self._tk_label: Optional[str] = None
+        self._slow_handler: Tuple[float, str] = (0.0, "")  # (время окончания, имя) последнего долгого
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._base_dir: Optional[str] = None
+
+    # === Включение ===
+
+    def configure(self, settings: Dict = None):
+        """Включает режим по переменной окружения или настройкам (один раз за сессию)"""
+        settings = settings or {}
+        enabled = _env_flag(PROFILE_ENV) or bool(settings.get("PROFILING"))
+        memory = _env_flag(PROFILE_MEMORY_ENV) or bool(settings.get("PROFILING_MEMORY"))
+        if (enabled or memory) and not self.enabled:
+            self.start(memory=memory)
+
+    def start(self, memory: bool = False):
+        self._started = time.time()
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._sampler.start()
+        self.enabled = True
+        atexit.register(self.stop)
+        debug_log(f"🔬 Профилирование включено{' (с tracemalloc)' if memory else ''}")
+
+    def stop(self) -> Optional[str]:
+        """Останавливает профилирование и пишет отчет. Возвращает путь к отчету"""
+        if not self.enabled:
+            return None
+        self.enabled = False
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+        try:
+            path = self.write_report()
+            debug_log(f"🔬 Отчет профилирования: {path}")
+            return path
+        except Exception as e:
+            debug_log(f"⚠️ Отчет профилирования не записан: {e}")
+            return None
+        finally:
+            if self.memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    # === Обертки ===
+
+    def _record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            timings = self._timings.get(name)
+            if timings is None:
+                timings = self._timings[name] = _Timings()
+            timings.add(seconds, ok)
+
+    def worker(self, name: str) -> Callable:
+        """Декоратор точки входа воркера: длительность вызова и пометка стеков потока"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                thread_id = threading.get_ident()
+                previous = self._workers.get(thread_id)
+                self._workers[thread_id] = name
+                start = time.perf_counter()
+                ok = False
+                try:
+                    result = func(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    self._record(f"worker:{name}", time.perf_counter() - start, ok)
+                    if previous is None:
+                        self._workers.pop(thread_id, None)
+                    else:
+                        self._workers[thread_id] = previous
+            return wrapper
+        return decorator
+
+    def tk_handler(self, name: str) -> Callable:
+        """
+        Декоратор обработчика в потоке Tk: сколько он держит mainloop.
+        Учитываются вызовы, отметившие работу через label(), и все долгие вызовы
+        (пустые опросы очереди раз в 50 мс не засоряют статистику).
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                self._tk_label = None
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    end = time.perf_counter()
+                    label = self._tk_label
+                    if label or end - start >= STALL_THRESHOLD:
+                        key = f"tk:{name}:{label}" if label else f"tk:{name}"
+                        self._record(key, end - start)
+                        if end - start >= STALL_THRESHOLD:
+                            self._slow_handler = (end, key)
+            return wrapper
+        return decorator
+
+    def label(self, text: str):
+        """Уточняет, что обрабатывает текущий обработчик Tk (тип сообщения очереди)"""
+        if self.enabled:
+            self._tk_label = str(text)
+
+    def watch_mainloop(self, root):
+        """Пульс mainloop: опоздание root.after = время, когда Tk не обрабатывал события"""
+        if not self.enabled:
+            return
+        expected = [time.perf_counter() + HEARTBEAT_MS / 1000]
+
+        def beat():
+            if not self.enabled:
+                return
+            now = time.perf_counter()
+            lag = max(0.0, now - expected[0])
+            self._record("tk:mainloop_lag", lag)
+            if lag >= STALL_THRESHOLD:
+                self._stall(now - lag - HEARTBEAT_MS / 1000, now, lag)
+            expected[0] = now + HEARTBEAT_MS / 1000
+            try:
+                root.after(HEARTBEAT_MS, beat)
+            except Exception:
+                pass
+
+        root.after(HEARTBEAT_MS, beat)
+
+    def _stall(self, since: float, until: float, lag: float):
+        """Запоминает зависание и самый частый стек главного потока за это время"""
+        with self._lock:
+            stacks = Counter(stack for moment, stack in self._main_stacks if since <= moment <= until)
+            if len(self._stalls) >= MAX_STALLS:
+                return
+            stack = stacks.most_common(1)[0][0] if stacks else ()
+            ended, handler = self._slow_handler
+            self._stalls.append({
+                "at": round(time.time() - self._started - lag, 2),
+                "lag_ms": round(lag * 1000, 1),
+                "handler": handler if since <= ended <= until else None,
+                "stack": [f"{func} ({file}:{line})" for file, func, line in stack[-12:]],
+            })
+
+    # === Сэмплирование ===
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        main = threading.main_thread().ident
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self._lock:
+                self._samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own:
+                        continue
+                    stack = self._stack(frame)
+                    if thread_id == main:
+                        group = "Tk mainloop"
+                        self._main_stacks.append((now, stack))
+                    else:
+                        group = self._workers.get(thread_id) or names.get(thread_id, str(thread_id))
+                    self._stacks[(group, stack)] += 1
+            del frames
+
+    @staticmethod
+    def _stack(frame) -> Tuple[_Frame, ...]:
+        """Стек от внешнего вызова к внутреннему"""
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((os.path.basename(code.co_filename), code.co_name, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    @staticmethod
+    def _category(stack: Tuple[_Frame, ...], paths: Dict[str, str]) -> str:
+        for file, _, _ in reversed(stack):
+            for marker, category in STACK_CATEGORIES:
+                if marker in paths.get(file, file):
+                    return category
+        return "прочее"
+
+    # === Отчет ===
+
+    def _reports_dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files", PROFILES_DIR)
+        os.makedirs(self._base_dir, exist_ok=True)
+        return self._base_dir
+
+    def summary(self) -> Dict:
+        """Данные отчета: замеры, зависания, стеки по потокам, память"""
+        with self._lock:
+            timings = {name: t.summary() for name, t in sorted(self._timings.items())}
+            stacks = Counter(self._stacks)
+            stalls = list(self._stalls)
+            samples = self._samples
+
+        # Пути модулей для категорий (gtts и tkinter - по пакету, а не по имени файла)
+        paths = {}
+        for module in list(sys.modules.values()):
+            filename = getattr(module, "__file__", None)
+            if filename:
+                paths.setdefault(os.path.basename(filename), filename)
+
+        groups: Dict[str, Dict] = {}
+        for (group, stack), count in stacks.items():
+            info = groups.setdefault(group, {"samples": 0, "categories": Counter(),
+                                             "self": Counter(), "cumulative": Counter()})
+            info["samples"] += count
+            info["categories"][self._category(stack, paths)] += count
+            if stack:
+                file, func, line = stack[-1]
+                info["self"][f"{func} ({file}:{line})"] += count
+            for name in {f"{func} ({file})" for file, func, _ in stack}:
+                info["cumulative"][name] += count
+
+        threads = {}
+        for group, info in sorted(groups.items(), key=lambda item: -item[1]["samples"]):
+            total = info["samples"]
+            threads[group] = {
+                "samples": total,
+                "seconds": round(total * SAMPLE_INTERVAL, 2),
+                "categories": {name: round(count / total * 100, 1)
+                               for name, count in info["categories"].most_common()},
+                "top_self": [[name, count] for name, count in info["self"].most_common(TOP_FUNCTIONS)],
+                "top_cumulative": [[name, count] for name, count in info["cumulative"].most_common(TOP_FUNCTIONS)],
+            }
+
+        result = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+            "duration_s": round(time.time() - self._started, 1),
+            "sample_interval_ms": SAMPLE_INTERVAL * 1000,
+            "samples": samples,
+            "timings": timings,
+            "stalls": stalls,
+            "threads": threads,
+        }
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+            result["memory"] = {
+                "current_mb": round(current / 2 ** 20, 2),
+                "peak_mb": round(peak / 2 ** 20, 2),
+                "top": [[str(stat.traceback[0]), round(stat.size / 1024, 1), stat.count] for stat in top],
+            }
+        return result
+
+    @staticmethod
+    def format_text(data: Dict) -> str:
+        lines = [
+            f"Профиль сессии {data['started']}, {data['duration_s']} с, "
+            f"{data['samples']} сэмплов по {data['sample_interval_ms']:.0f} мс",
+            "",
+            "== Вызовы (воркеры и обработчики Tk) ==",
+            f"{'имя':48} {'вызовов':>8} {'ошибок':>7} {'всего, с':>9} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9}",
+        ]
+        for name, t in data["timings"].items():
+            lines.append(f"{name:48} {t['calls']:>8} {t['errors']:>7} {t['total_s']:>9} "
+                         f"{t['p50_ms']:>9} {t['p95_ms']:>9} {t['max_ms']:>9}")
+        lines += ["", f"== Зависания Tk (> {STALL_THRESHOLD * 1000:.0f} мс): {len(data['stalls'])} =="]
+        for stall in data["stalls"][:20]:
+            lines.append(f"+{stall['at']} с: {stall['lag_ms']} мс, обработчик: {stall['handler'] or '-'}")
+            lines += [f"    {frame}" for frame in stall["stack"][-6:]]
+        lines += ["", "== Потоки: где время (доля сэмплов) =="]
+        for group, info in data["threads"].items():
+            categories = ", ".join(f"{name} {share}%" for name, share in info["categories"].items())
+            lines.append(f"{group}: {info['seconds']} с - {categories}")
+            for name, count in info["top_self"][:8]:
+                lines.append(f"    {count:>6}  {name}")
+        if "memory" in data:
+            memory = data["memory"]
+            lines += ["", f"== Память (tracemalloc): сейчас {memory['current_mb']} МБ, пик {memory['peak_mb']} МБ =="]
+            lines += [f"    {size:>10} КБ {count:>8}  {where}" for where, size, count in memory["top"]]
+        return "\n".join(lines) + "\n"
+
+    def _folded(self) -> str:
+        """Свернутые стеки: 'поток;функция (файл);... количество'"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = []
+        for (group, stack), count in stacks:
+            frames = [group.replace(";", ",")] + [f"{func} ({file})" for file, func, _ in stack]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(sorted(lines)) + "\n"
+
+    def write_report(self) -> str:
+        """Пишет отчет сессии (.txt, .json, .folded) и возвращает путь к тексту"""
+        folder = self._reports_dir()
+        base = os.path.join(folder, f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started))}")
+        data = self.summary()
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.write(self._folded())
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.format_text(data))
+        self._cleanup(folder)
+        return base + ".txt"
+
+    @staticmethod
+    def _cleanup(folder: str):
+        reports = sorted(name[:-4] for name in os.listdir(folder) if name.startswith("profile-") and name.endswith(".txt"))
+        for base in reports[:-MAX_REPORTS]:
+            for ext in (".txt", ".json", ".folded"):
+                try:
+                    os.remove(os.path.join(folder, base + ext))
+                except OSError:
+                    pass
+
+
+# Глобальный профилировщик
+profiler = SessionProfiler()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Семантический индекс заметок (почти-дубликаты по смыслу).
+Фразы существующих заметок переводятся в эмбеддинги через провайдера
+(Ollama /api/embed) и хранятся матрицей NumPy в папке пользователя.
+Проверка пачки новых фраз - один запрос эмбеддингов и одно матричное
+умножение с нормированными векторами (косинусное сходство).
+Индекс обновляется по мере добавления карточек; при запуске
+досчитываются только заметки, которых в нем еще нет.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.logger import debug_log
+
+
+SEMANTIC_INDEX_NAME = "semantic_index.npz"
+EMBED_BATCH = 32      # Фраз в одном запросе эмбеддингов
+SAVE_INTERVAL = 30.0  # Не чаще, сек: файл индекса перезаписывается целиком
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+
+def _normalized(vectors) -> np.ndarray:
+    """Векторы float32 единичной длины (скалярное произведение = косинус)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SemanticIndex:
+    """
+    Матрица эмбеддингов заметок + массив их ID.
+    Индекс привязан к модели эмбеддингов: при смене модели он пересчитывается.
+    """
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._lock = threading.RLock()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.model: Optional[str] = None
+        self._embed: Optional[Embedder] = None
+        self._pending: Dict[int, str] = {}  # Новые заметки, ждущие эмбеддинга
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def ready(self) -> bool:
+        return self._embed is not None and len(self._ids) > 0
+
+    # === Хранилище ===
+
+    def _path(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+        return os.path.join(self._base_dir, SEMANTIC_INDEX_NAME)
+
+    def load(self, model: str) -> int:
+        """Читает индекс с диска. Индекс другой модели отбрасывается."""
+        with self._lock:
+            self.model = model
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+            path = self._path()
+            if not os.path.exists(path):
+                return 0
+            try:
+                with np.load(path) as data:
+                    if str(data["model"]) != model:
+                        debug_log(f"🧠 Семантический индекс построен моделью {data['model']}, пересчет")
+                        return 0
+                    self._ids = data["ids"].astype(np.int64)
+                    self._vectors = data["vectors"].astype(np.float32)
+            except Exception as e:
+                debug_log(f"⚠️ Семантический индекс поврежден, пересчет: {e}")
+            return len(self._ids)
+
+    def save(self):
+        """Записывает индекс (float16 - вдвое меньше файл, точности хватает)"""
+        with self._lock:
+            ids, vectors, model = self._ids.copy(), self._vectors.astype(np.float16), self.model or ""
+            self._dirty = False
+            self._saved_at = time.time()
+        path = self._path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        try:
+            np.savez(tmp_path, ids=ids, vectors=vectors, model=np.array(model))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            debug_log(f"⚠️ Семантический индекс не сохранен: {e}")
+
+    # === Изменение ===
+
+    def add(self, note_ids: Sequence[int], vectors):
+        """Добавляет (или заменяет) векторы заметок"""
+        if not len(note_ids):
+            return
+        matrix = _normalized(vectors)
+        with self._lock:
+            if len(self._ids) and self._vectors.shape[1] != matrix.shape[1]:
+                debug_log("⚠️ Размерность эмбеддингов изменилась, индекс сброшен")
+                self._ids = np.zeros(0, dtype=np.int64)
+            keep = ~np.isin(self._ids, note_ids)
+            if not len(self._ids):
+                self._ids, self._vectors = np.asarray(note_ids, dtype=np.int64), matrix
+            else:
+                self._ids = np.concatenate([self._ids[keep], np.asarray(note_ids, dtype=np.int64)])
+                self._vectors = np.vstack([self._vectors[keep], matrix])
+            self._dirty = True
+
+    def remove(self, note_ids: Iterable[int]):
+        note_ids = list(note_ids)
+        with self._lock:
+            for note_id in note_ids:
+                self._pending.pop(note_id, None)
+            keep = ~np.isin(self._ids, note_ids)
+            if not keep.all():
+                self._ids, self._vectors = self._ids[keep], self._vectors[keep]
+                self._dirty = True
+
+    def _embed_batches(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH):
+            vectors.extend(self._embed(texts[i:i + EMBED_BATCH]))
+        return _normalized(vectors)
+
+    def sync(self, notes: List[Tuple[int, str]], embed: Embedder, model: str) -> int:
+        """
+        Приводит индекс в соответствие с коллекцией: удаленные заметки
+        убираются, новые - досчитываются пакетами. Вызывать в фоне.
+
+        Returns:
+            Количество досчитанных эмбеддингов
+        """
+        self._embed = embed
+        if self.model != model:
+            self.load(model)
+        with self._lock:
+            alive = {note_id for note_id, _ in notes}
+            stale = [int(note_id) for note_id in self._ids if int(note_id) not in alive]
+            known = set(int(note_id) for note_id in self._ids)
+        if stale:
+            self.remove(stale)
+        missing = [(note_id, phrase) for note_id, phrase in notes if note_id not in known and phrase.strip()]
+        if missing:
+            debug_log(f"🧠 Семантический индекс: эмбеддинги для {len(missing)} заметок...")
+        done = 0
+        try:
+            for i in range(0, len(missing), EMBED_BATCH * 10):
+                part = missing[i:i + EMBED_BATCH * 10]
+                self.add([note_id for note_id, _ in part], self._embed_batches([p for _, p in part]))
+                done += len(part)
+        except Exception as e:
+            debug_log(f"⚠️ Семантический индекс: эмбеддинги недоступны ({e}), готово {done}/{len(missing)}")
+        if self._dirty:
+            self.save()
+        debug_log(f"🧠 Семантический индекс: {len(self)} заметок")
+        self._start_worker()
+        return done
+
+    # === Новые карточки ===
+
+    def note_added(self, note_id: int, phrase: str):
+        """Ставит новую заметку в очередь на эмбеддинг (фоновый поток)"""
+        if self._embed is None or not note_id or not phrase.strip():
+            return
+        with self._lock:
+            self._pending[note_id] = phrase
+        self._wake.set()
+
+    def _start_worker(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="semantic-index", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(SAVE_INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if pending:
+                try:
+                    self.add(list(pending), self._embed_batches(list(pending.values())))
+                except Exception as e:
+                    debug_log(f"⚠️ Семантический индекс: эмбеддинг не получен ({e})")
+                    with self._lock:
+                        pending.update(self._pending)
+                        self._pending = pending
+                    time.sleep(SAVE_INTERVAL)
+                    continue
+            if self._dirty and time.time() - self._saved_at >= SAVE_INTERVAL:
+                self.save()
+
+    # === Поиск ===
+
+    def search(self, vectors, threshold: float) -> List[Optional[Tuple[int, float]]]:
+        """Для каждого вектора - ближайшая заметка (ID, сходство), если сходство >= threshold"""
+        queries = _normalized(vectors)
+        with self._lock:
+            if not len(self._ids):
+                return [None] * len(queries)
+            scores = queries @ self._vectors.T
+            ids = self._ids
+        best = scores.argmax(axis=1)
+        return [(int(ids[j]), float(scores[i, j])) if scores[i, j] >= threshold else None
+                for i, j in enumerate(best)]
+
+    def find_duplicates(self, phrases: List[str], threshold: float) -> List[Optional[Tuple[int, float]]]:
+        """
+        Семантические дубликаты фраз (эмбеддинги считаются одним пакетом).
+
+        Raises:
+            Exception: Ошибка провайдера эмбеддингов
+        """
+        if not phrases or not self.ready:
+            return [None] * len(phrases)
+        return self.search(self._embed_batches(list(phrases)), threshold)
+
+
+# Глобальный семантический индекс
+semantic_index = SemanticIndex()
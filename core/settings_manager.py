@@ -12,6 +12,9 @@ from typing import Dict, Any
 DEFAULT_DECK_NAME = "Местоиминия"
 DEFAULT_OLLAMA_MODEL = "gemma3:1b"
 
+# Настройки, которые хранятся в файле как JSON
+JSON_SETTINGS_KEYS = {"AI_PRESETS", "MODEL_ROUTING_RULES"}
+
 DEFAULT_TRANSLATE_PROMPT = (
     'Переведи следующий немецкий текст на русский язык качественно:\n\n'
     '"{phrase}"\n\n'
@@ -115,9 +118,30 @@ def get_default_settings() -> Dict[str, Any]:
         "OPENROUTER_API_KEY": "",
         "OPENROUTER_MODEL": "openai/gpt-4o-mini",
         "GOOGLE_API_KEY": "",
+        "AI_FALLBACK_PROVIDERS": "",
+        "AI_HEDGING": False,
+        "MODEL_ROUTING_ENABLED": False,
+        "MODEL_ROUTING_RULES": [],
+        "BATCH_CLEAN_MODE": "local",
+        "DUPLICATE_SIMILARITY": 0,
+        "SEMANTIC_DEDUPE": False,
+        "EMBEDDING_MODEL": "nomic-embed-text",
+        "SEMANTIC_SIMILARITY": 92,
+        "TRANSLATION_MEMORY": True,
+        # Похожая фраза может значить противоположное ("nicht") - по умолчанию
+        # из памяти берется только та же фраза (с пунктуацией и регистром)
+        "TM_FUZZY_REUSE": False,
+        "TM_REUSE_SIMILARITY": 97,
+        "TM_EXAMPLE_SIMILARITY": 60,
+        "TM_EXAMPLES": 3,
         "LAST_SETTINGS_TAB": "Озвучка",
         "AI_PRESETS": [],
-        "UI_LANGUAGE": "ru"
+        "UI_LANGUAGE": "ru",
+        # Диагностика: отчет профилирования в user_files/profiles (core.profiling)
+        "PROFILING": False,
+        "PROFILING_MEMORY": False,
+        # Трассы карточек (перехват -> Anki) в user_files/traces (core.tracing)
+        "TRACING": True
     }
 
 
@@ -149,7 +173,7 @@ def load_settings(update_app_state: bool = True) -> Dict[str, Any]:
                              settings[k] = v.lower() == "true"
                         elif k in settings and isinstance(settings[k], int):
                              settings[k] = int(v) if v.isdigit() else settings[k]
-                        elif k == "AI_PRESETS":
+                        elif k in JSON_SETTINGS_KEYS:
                              try:
                                  settings[k] = json.loads(v)
                              except Exception:
@@ -184,6 +208,19 @@ def load_settings(update_app_state: bool = True) -> Dict[str, Any]:
         app_state.openrouter_api_key = settings.get("OPENROUTER_API_KEY", "")
         app_state.openrouter_model = settings.get("OPENROUTER_MODEL", "openai/gpt-4o-mini")
         app_state.google_api_key = settings.get("GOOGLE_API_KEY", "")
+        app_state.ai_fallback_providers = settings.get("AI_FALLBACK_PROVIDERS", "")
+        app_state.ai_hedging = settings.get("AI_HEDGING", False)
+        app_state.model_routing_enabled = settings.get("MODEL_ROUTING_ENABLED", False)
+        app_state.model_routing_rules = settings.get("MODEL_ROUTING_RULES", [])
+        app_state.duplicate_similarity = settings.get("DUPLICATE_SIMILARITY", 0)
+        app_state.semantic_dedupe = settings.get("SEMANTIC_DEDUPE", False)
+        app_state.embedding_model = settings.get("EMBEDDING_MODEL", "nomic-embed-text")
+        app_state.semantic_similarity = settings.get("SEMANTIC_SIMILARITY", 92)
+        app_state.tm_enabled = settings.get("TRANSLATION_MEMORY", True)
+        app_state.tm_fuzzy_reuse = settings.get("TM_FUZZY_REUSE", False)
+        app_state.tm_reuse_similarity = settings.get("TM_REUSE_SIMILARITY", 97)
+        app_state.tm_example_similarity = settings.get("TM_EXAMPLE_SIMILARITY", 60)
+        app_state.tm_examples = settings.get("TM_EXAMPLES", 3)
         
         # Localization
         from core.localization import localization_manager
@@ -211,7 +248,7 @@ def save_settings(settings: Dict[str, Any]) -> bool:
                     value = v
                     if isinstance(v, bool):
                         value = str(v).lower()
-                    elif k == "AI_PRESETS":
+                    elif k in JSON_SETTINGS_KEYS:
                         value = json.dumps(v, ensure_ascii=False)
                     
                     f.write(f"{k}={value}\n")
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Объединение одинаковых одновременных запросов (single-flight).
+Если вызов с тем же ключом уже выполняется, новые вызовы не запускают
+его повторно, а ждут и получают тот же результат (или ту же ошибку).
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """Выполняющийся вызов и его результат"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Группа вызовов, объединяемых по ключу"""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0  # Сколько вызовов получили чужой результат
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполняет fn(*args, **kwargs) или присоединяется к уже идущему вызову.
+
+        Args:
+            key: Ключ запроса (одинаковый ключ = одинаковый результат)
+            fn: Функция, выполняющая реальный запрос
+
+        Returns:
+            Результат fn (общий для всех ожидающих)
+
+        Raises:
+            Exception: Ошибка fn пробрасывается всем ожидающим
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Количество выполняющихся сейчас уникальных вызовов"""
+        with self._lock:
+            return len(self._calls)
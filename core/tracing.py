@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Трассировка карточки от перехвата буфера обмена до добавления в Anki.
+
+Карточка переходит между потоками: clipboard_worker -> process_clipboard_queue
+-> проверка дубликатов -> ask_ai_worker -> process_results_queue -> озвучка ->
+add_to_anki_worker. При перехвате создается трасса; ее ID едет вместе с текстом
+(TracedText) и третьим элементом сообщений results_queue. Этапы пишут
+интервалы (span): ожидание в очереди (queue:*), проверка дубликатов,
+генерация, озвучка, запись в Anki (anki:*), обработка в интерфейсе (ui:*),
+диалоги (dialog:*). Завершенные трассы дописываются в
+user_files/traces/traces-YYYYMMDD.jsonl и остаются в памяти для окна
+последних карточек (ui.trace_window).
+
+    python -m core.tracing [файл.jsonl ...]    # таблица и сводка по этапам
+"""
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from api.latency import percentile
+from core.logger import debug_log
+
+
+TRACES_DIR = "traces"
+RECENT_TRACES = 50        # Трасс в памяти (для окна)
+TRACE_TIMEOUT = 600       # Незавершенная трасса старше - "abandoned", сек
+MAX_TRACE_FILES = 14      # Файлов JSONL (по дням)
+PHRASE_PREVIEW = 80
+
+# Этапы до генерации: трасса только с ними не экспортируется (текст не дошел до карточки)
+CAPTURE_STAGES = ("queue:clipboard", "ui:capture")
+
+# Группы этапов в таблице: префикс имени span (до ":") -> заголовок
+STAGE_COLUMNS = (
+    ("queue", "очереди"),
+    ("duplicate_check", "дубли"),
+    ("generation", "генер."),
+    ("tts", "TTS"),
+    ("anki", "Anki"),
+    ("ui", "UI"),
+    ("dialog", "диалог"),
+)
+
+
+class TracedText(str):
+    """Текст из буфера обмена с ID трассы (для остального кода - обычная строка)"""
+    trace_id: Optional[str] = None
+
+
+def trace_of(value) -> Optional[str]:
+    """ID трассы текста из очереди буфера (None - не трассируется)"""
+    return getattr(value, "trace_id", None)
+
+
+def stage_of(span_name: str) -> str:
+    return span_name.split(":", 1)[0]
+
+
+class Trace:
+    """Трасса одной карточки: интервалы этапов относительно начала"""
+
+    def __init__(self, trace_id: str, phrase: str, source: str):
+        self.id = trace_id
+        self.phrase = phrase
+        self.source = source
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.waits: Dict[str, float] = {}  # очередь -> время постановки
+
+    def add(self, name: str, start: float, end: float, attrs: Dict):
+        span = {
+            "name": name,
+            "start_ms": round((start - self.origin) * 1000, 1),
+            "ms": round((end - start) * 1000, 1),
+            "thread": threading.current_thread().name,
+        }
+        span.update(attrs)
+        self.spans.append(span)
+
+    def in_pipeline(self) -> bool:
+        """Текст дошел дальше перехвата (генерация, озвучка, Anki)"""
+        return any(span["name"] not in CAPTURE_STAGES for span in self.spans)
+
+    def to_dict(self, status: str) -> Dict:
+        return {
+            "trace_id": self.id,
+            "phrase": self.phrase[:PHRASE_PREVIEW],
+            "source": self.source,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "status": status,
+            "total_ms": round((time.perf_counter() - self.origin) * 1000, 1),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+
+
+class CardTracer:
+    """Трассировщик карточек (глобальный tracer). Методы с trace_id=None ничего не делают"""
+
+    def __init__(self, base_dir: str = None):
+        self.enabled = True
+        self.current: Optional[str] = None  # Трасса карточки в главном окне
+        self._lock = threading.Lock()
+        self._active: Dict[str, Trace] = {}
+        self._recent = deque(maxlen=RECENT_TRACES)
+        self._base_dir = base_dir
+
+    def configure(self, settings: Dict = None):
+        self.enabled = bool((settings or {}).get("TRACING", True))
+
+    # === Жизненный цикл ===
+
+    def begin(self, phrase: str, source: str = "clipboard") -> Optional[str]:
+        """Новая трасса; None, если трассировка выключена"""
+        if not self.enabled:
+            return None
+        trace_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._expire()
+            self._active[trace_id] = Trace(trace_id, phrase, source)
+        return trace_id
+
+    def tag(self, text: str) -> str:
+        """Текст буфера с новой трассой (ожидание в очереди буфера уже идет)"""
+        trace_id = self.begin(text)
+        if trace_id is None:
+            return text
+        traced = TracedText(text)
+        traced.trace_id = trace_id
+        self.enqueue(trace_id, "clipboard")
+        return traced
+
+    def activate(self, trace_id: Optional[str], phrase: str = None):
+        """Карточка трассы показана в главном окне"""
+        with self._lock:
+            previous = self._active.get(self.current)
+            # Перехваченный и сразу замененный текст - не карточка
+            if previous is not None and previous.id != trace_id and not previous.in_pipeline():
+                del self._active[previous.id]
+            trace = self._active.get(trace_id)
+            if trace is not None and phrase is not None:
+                trace.phrase = phrase
+            self.current = trace_id
+
+    def current_for(self, phrase: str, source: str = "manual") -> Optional[str]:
+        """Трасса фразы из главного окна: текущая, если фраза та же, иначе новая"""
+        with self._lock:
+            trace = self._active.get(self.current)
+            if trace is not None and trace.phrase == phrase:
+                return trace.id
+        trace_id = self.begin(phrase, source)
+        self.activate(trace_id)
+        return trace_id
+
+    def finish(self, trace_id: Optional[str], status: str):
+        """Завершает трассу и дописывает ее в JSONL"""
+        with self._lock:
+            trace = self._active.pop(trace_id, None) if trace_id else None
+            if trace is None:
+                return
+            record = trace.to_dict(status)
+            self._recent.append(record)
+        self._export(record)
+
+    def _expire(self):
+        """Закрывает брошенные трассы (вызывается под блокировкой)"""
+        now = time.perf_counter()
+        for trace in [t for t in self._active.values() if now - t.origin > TRACE_TIMEOUT]:
+            del self._active[trace.id]
+            if trace.in_pipeline():
+                record = trace.to_dict("abandoned")
+                self._recent.append(record)
+                threading.Thread(target=self._export, args=(record,), daemon=True).start()
+
+    # === Интервалы ===
+
+    def add_span(self, trace_id: Optional[str], name: str, start: float, end: float = None, **attrs):
+        """Интервал этапа (время - time.perf_counter)"""
+        if not trace_id:
+            return
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            trace = self._active.get(trace_id)
+            if trace is not None:
+                trace.add(name, start, end, attrs)
+
+    @contextmanager
+    def span(self, trace_id: Optional[str], name: str, **attrs) -> Iterator[Dict]:
+        """Интервал вокруг блока; в возвращаемый словарь можно дописать атрибуты"""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except Exception:
+            attrs["error"] = True
+            raise
+        finally:
+            self.add_span(trace_id, name, start, **attrs)
+
+    def enqueue(self, trace_id: Optional[str], queue_name: str):
+        """Карточка поставлена в очередь (сообщение, root.after)"""
+        if not trace_id:
+            return
+        with self._lock:
+            trace = self._active.get(trace_id)
+            if trace is not None:
+                trace.waits[queue_name] = time.perf_counter()
+
+    def dequeue(self, trace_id: Optional[str], queue_name: str):
+        """Карточка взята из очереди: интервал queue:<имя>"""
+        if not trace_id:
+            return
+        with self._lock:
+            trace = self._active.get(trace_id)
+            start = trace.waits.pop(queue_name, None) if trace is not None else None
+        if start is not None:
+            self.add_span(trace_id, f"queue:{queue_name}", start)
+
+    def post(self, q, message: str, data, trace_id: Optional[str] = None):
+        """Сообщение в results_queue; с трассой - (message, data, trace_id)"""
+        if trace_id:
+            self.enqueue(trace_id, "results")
+            q.put((message, data, trace_id))
+        else:
+            q.put((message, data))
+
+    def recent(self, count: int = RECENT_TRACES) -> List[Dict]:
+        """Последние завершенные трассы (новые первыми)"""
+        with self._lock:
+            return list(self._recent)[-count:][::-1]
+
+    # === Экспорт ===
+
+    def _traces_dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files", TRACES_DIR)
+        os.makedirs(self._base_dir, exist_ok=True)
+        return self._base_dir
+
+    def _export(self, record: Dict):
+        try:
+            folder = self._traces_dir()
+            path = os.path.join(folder, f"traces-{record['started'][:10].replace('-', '')}.jsonl")
+            is_new = not os.path.exists(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if is_new:
+                for old in sorted(glob.glob(os.path.join(folder, "traces-*.jsonl")))[:-MAX_TRACE_FILES]:
+                    os.remove(old)
+        except Exception as e:
+            debug_log(f"⚠️ Трасса не записана: {e}")
+
+
+# =============================================================================
+# СВОДКА
+# =============================================================================
+def stage_totals(record: Dict) -> Dict[str, float]:
+    """Время по группам этапов (мс) и неучтенное время ("other")"""
+    totals = {stage: 0.0 for stage, _ in STAGE_COLUMNS}
+    for span in record["spans"]:
+        stage = stage_of(span["name"])
+        totals[stage] = totals.get(stage, 0.0) + span["ms"]
+    totals["other"] = max(0.0, record["total_ms"] - sum(totals.values()))
+    return totals
+
+
+def format_traces_table(records: List[Dict]) -> str:
+    """Последние карточки: время этапов и итог, внизу p50/p95 по этапам"""
+    if not records:
+        return ""
+    columns = list(STAGE_COLUMNS) + [("other", "прочее")]
+    header = f"{'время':<9}{'фраза':<28}{'статус':<11}{'итого':>8}" + "".join(f"{title:>9}" for _, title in columns)
+    lines = [header, "-" * len(header)]
+    per_stage = {stage: [] for stage, _ in columns}
+    totals = []
+    for record in records:
+        stages = stage_totals(record)
+        phrase = record["phrase"].replace("\n", " ")
+        if len(phrase) > 27:
+            phrase = phrase[:26] + "…"
+        lines.append(
+            f"{record['started'][11:19]:<9}{phrase:<28}{record['status'][:10]:<11}{record['total_ms'] / 1000:>7.2f}s"
+            + "".join(f"{stages.get(stage, 0.0) / 1000:>8.2f}s" for stage, _ in columns)
+        )
+        totals.append(record["total_ms"])
+        for stage, _ in columns:
+            per_stage[stage].append(stages.get(stage, 0.0))
+    lines.append("-" * len(header))
+    for p in (50, 95):
+        lines.append(
+            f"{'':<9}{f'p{p} ({len(records)} карт.)':<28}{'':<11}{percentile(totals, p) / 1000:>7.2f}s"
+            + "".join(f"{percentile(per_stage[stage], p) / 1000:>8.2f}s" for stage, _ in columns)
+        )
+    return "\n".join(lines)
+
+
+def format_trace_detail(record: Dict) -> str:
+    """Интервалы одной трассы по порядку (с потоком)"""
+    lines = [f"{record['trace_id']}  {record['status']}  {record['total_ms'] / 1000:.2f}s  {record['phrase']}"]
+    for span in record["spans"]:
+        lines.append(f"  +{span['start_ms'] / 1000:>7.3f}s {span['ms']:>9.1f} мс  {span['name']:<22}{span['thread']}")
+    return "\n".join(lines)
+
+
+def load_traces(paths: List[str]) -> List[Dict]:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def main(argv: List[str] = None) -> int:
+    paths = list(argv if argv is not None else sys.argv[1:])
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(tracer._traces_dir(), "traces-*.jsonl")))[-1:]
+    records = load_traces(paths)
+    if not records:
+        print("Трасс нет")
+        return 1
+    print(format_traces_table(records[::-1][:RECENT_TRACES]))
+    print()
+    print(format_trace_detail(records[-1]))
+    return 0
+
+
+# Глобальный трассировщик
+tracer = CardTracer()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Память переводов (translation memory).
+Все результаты генерации (фраза, перевод, контекст) сохраняются в SQLite
+в папке пользователя. Для новой фразы ищутся похожие прошлые фразы по
+триграммному индексу (тот же, что у индекса дубликатов):
+- та же фраза (с учетом пунктуации и регистра) с тем же промптом и той
+  же моделью - результат берется из памяти, без обращения к модели; почти совпадающая -
+  только если порог reuse_threshold ниже 1.0 (TM_FUZZY_REUSE);
+- просто похожие фразы передаются в промпт как примеры перевода.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from core.dedupe_index import DuplicateIndex, normalize_phrase
+from core.logger import debug_log
+
+
+TM_DB_NAME = "translation_memory.sqlite3"
+EXAMPLES_HEADER = "Примеры переводов похожих фраз (для согласованности):"
+EXAMPLE_CANDIDATES = 500  # Примеры ищутся приближенно: низкий порог дает слишком много кандидатов
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    with_context INTEGER NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    phrase TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    context TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (key, with_context, prompt_hash, model)
+);
+"""
+
+# Таблица без колонки model: записи переносятся с пустой моделью
+# (остаются примерами, но из памяти больше не берутся)
+_MIGRATE_MODEL = """
+ALTER TABLE memory RENAME TO memory_old;
+%s
+INSERT INTO memory (id, key, with_context, prompt_hash, model, phrase, translation, context, created)
+    SELECT id, key, with_context, prompt_hash, '', phrase, translation, context, created FROM memory_old;
+DROP TABLE memory_old;
+""" % _SCHEMA
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class MemoryMatch:
+    """Результат поиска: готовый перевод (если можно взять из памяти) и примеры"""
+    reuse: Optional[Tuple[str, str]] = None           # (перевод, контекст)
+    score: float = 0.0
+    examples: List[Tuple[str, str]] = field(default_factory=list)  # (фраза, перевод)
+
+
+def same_phrase(a: str, b: str) -> bool:
+    """Фразы совпадают с точностью до пробелов ("Er kommt?" и "Er kommt." - разные)"""
+    return a.split() == b.split()
+
+
+def with_examples(prompt: str, examples: List[Tuple[str, str]]) -> str:
+    """Шаблон промпта с примерами в начале (фигурные скобки экранируются для format)"""
+    if not examples:
+        return prompt
+    lines = [EXAMPLES_HEADER] + [f"- {phrase} → {translation}" for phrase, translation in examples]
+    block = "\n".join(lines).replace("{", "{{").replace("}", "}}")
+    return f"{block}\n\n{prompt}"
+
+
+class TranslationMemory:
+    """Хранилище прошлых генераций + индекс похожих фраз в памяти"""
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._index = DuplicateIndex()
+        self._loader: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._index.ready
+
+    def __len__(self):
+        return len(self._index)
+
+    # === Хранилище ===
+
+    def _dir(self) -> str:
+        if self._base_dir is None:
+            from core.settings_manager import get_base_data_dir
+            self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+        return self._base_dir
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self._dir(), exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self._dir(), TM_DB_NAME),
+                                   timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(memory)")}
+            if "model" not in columns:
+                conn.executescript(_MIGRATE_MODEL)
+            self._conn = conn
+        return self._conn
+
+    def load(self):
+        """Строит индекс похожих фраз по всей памяти"""
+        start = time.time()
+        with self._lock:
+            rows = self._db().execute("SELECT id, phrase FROM memory").fetchall()
+        self._index.replace_all(rows)
+        debug_log(f"📚 Память переводов: {len(rows)} записей ({time.time() - start:.1f}с)")
+
+    def start(self):
+        """Загружает индекс в фоне (до загрузки работают только точные совпадения)"""
+        if self._loader is None:
+            self._loader = threading.Thread(target=self.load, name="translation-memory", daemon=True)
+            self._loader.start()
+
+    def record(self, phrase: str, with_context: bool, prompt: str, model: str,
+               translation: str, context: str = ""):
+        """
+        Сохраняет результат генерации (повтор той же фразы с тем же промптом
+        и моделью обновляет запись)
+        """
+        key = normalize_phrase(phrase)
+        if not key or not translation:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO memory (key, with_context, prompt_hash, model, phrase, translation, context, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key, with_context, prompt_hash, model) DO UPDATE SET "
+                "phrase = excluded.phrase, translation = excluded.translation, "
+                "context = excluded.context, created = excluded.created",
+                (key, int(with_context), prompt_hash(prompt), model or "", phrase, translation, context or "",
+                 time.time()))
+            entry_id = db.execute(
+                "SELECT id FROM memory WHERE key = ? AND with_context = ? AND prompt_hash = ? AND model = ?",
+                (key, int(with_context), prompt_hash(prompt), model or "")).fetchone()[0]
+            db.commit()
+        self._index.add(entry_id, phrase)
+
+    # === Поиск ===
+
+    def _rows(self, ids: List[int]):
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            return self._db().execute(
+                f"SELECT id, key, with_context, prompt_hash, model, phrase, translation, context "
+                f"FROM memory WHERE id IN ({placeholders})", ids).fetchall()
+
+    def match(self, phrase: str, with_context: bool, prompt: str, model: str,
+              reuse_threshold: float = 1.0, example_threshold: float = 0.6,
+              max_examples: int = 3) -> MemoryMatch:
+        """
+        Ищет прошлые генерации для фразы.
+        Результат берется из памяти, если запись сделана тем же промптом и
+        той же моделью в том же режиме (с контекстом / без) для той же фразы
+        (reuse_threshold=1.0) или для фразы со сходством >= reuse_threshold.
+        """
+        result = MemoryMatch()
+        key = normalize_phrase(phrase)
+        if not key:
+            return result
+        if self._index.ready:
+            similar = self._index.find_similar(phrase, reuse_threshold, limit=3)
+            if max_examples and example_threshold < reuse_threshold:
+                similar += self._index.find_similar(phrase, example_threshold, limit=max_examples + 3,
+                                                    max_candidates=EXAMPLE_CANDIDATES)
+        else:
+            with self._lock:
+                ids = [row[0] for row in self._db().execute("SELECT id FROM memory WHERE key = ?", (key,))]
+            similar = [(key, 1.0, ids)] if ids else []
+        if not similar:
+            return result
+
+        scores = {}
+        for _, score, ids in similar:
+            for entry_id in ids:
+                scores[entry_id] = score
+        rows = sorted(self._rows(list(scores)), key=lambda row: -scores[row[0]])
+        wanted_hash = prompt_hash(prompt)
+        for entry_id, _, row_context, row_hash, row_model, row_phrase, translation, context in rows:
+            score = scores[entry_id]
+            reusable = same_phrase(row_phrase, phrase) if reuse_threshold >= 1.0 else score >= reuse_threshold
+            if (result.reuse is None and reusable
+                    and bool(row_context) == bool(with_context) and row_hash == wanted_hash
+                    and row_model == (model or "")):
+                result.reuse, result.score = (translation, context), score
+            # Прежний перевод той же фразы - не пример (иначе модель его повторит)
+            elif (score >= example_threshold and len(result.examples) < max_examples
+                  and not same_phrase(row_phrase, phrase)
+                  and all(row_phrase != p for p, _ in result.examples)):
+                result.examples.append((row_phrase, translation))
+        return result
+
+
+# Глобальная память переводов
+translation_memory = TranslationMemory()
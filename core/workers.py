@@ -7,12 +7,26 @@ import threading
 import time
 import os
 import re
+import hashlib
 
 from core.app_state import app_state
 from core.logger import debug_log
+from core.profiling import profiler
+from core.tracing import tracer
+from core.single_flight import SingleFlight
+from core.outbox import anki_outbox
+from core.dedupe_index import duplicate_index
+from core.semantic_index import semantic_index
+from core.anki_mirror import anki_mirror
+from core.translation_memory import translation_memory, with_examples
+from core.history import history_store, file_hash
+from core.deck_catalog import deck_catalog
+from core.settings_manager import load_settings
 from api.anki_api import anki_api
 from api.ai.ollama_provider import ollama_provider
 from api.ai.openrouter_provider import OpenRouterProvider
+from api.ai.routing_provider import RoutingProvider, ProviderRoute
+from api.ai.model_router import model_router
 
 
 # =============================================================================
@@ -22,16 +36,53 @@ _cached_provider = None
 _cached_settings_hash = None
 
 
+def _build_provider(provider_type):
+    """Создает провайдер по типу (без маршрутизации)"""
+    if provider_type == "openrouter":
+        return OpenRouterProvider(
+            api_key=app_state.openrouter_api_key,
+            model=app_state.openrouter_model
+        )
+    # google: Placeholder
+    return ollama_provider
+
+
+def _default_model(provider_type):
+    """Модель по умолчанию для резервного провайдера"""
+    if provider_type == "openrouter":
+        return app_state.openrouter_model
+    if provider_type == "ollama":
+        return app_state.ollama_model
+    return None
+
+
+def _fallback_types(primary_type):
+    """Список резервных провайдеров из настроек (без основного и дубликатов)"""
+    result = []
+    for name in app_state.ai_fallback_providers.split(","):
+        name = name.strip().lower()
+        if not name or name == primary_type or name in result:
+            continue
+        if name == "openrouter" and not app_state.openrouter_api_key:
+            continue
+        result.append(name)
+    return result
+
+
 def get_current_ai_provider():
     """Возвращает настроенный инстанс AI провайдера (с кэшированием)"""
     global _cached_provider, _cached_settings_hash
     
     provider_type = app_state.ai_provider
+    fallbacks = _fallback_types(provider_type)
     
     current_settings = {
         "type": provider_type,
         "key": app_state.openrouter_api_key if provider_type == "openrouter" else app_state.google_api_key,
-        "model": app_state.openrouter_model if provider_type == "openrouter" else None
+        "model": app_state.openrouter_model if provider_type == "openrouter" else None,
+        "fallbacks": fallbacks,
+        "fallback_models": [_default_model(name) for name in fallbacks],
+        "hedging": app_state.ai_hedging
     }
     
     settings_hash = str(current_settings)
@@ -39,26 +90,114 @@ def get_current_ai_provider():
     if _cached_provider and _cached_settings_hash == settings_hash:
         return _cached_provider
     
-    new_provider = None
-    if provider_type == "openrouter":
-        new_provider = OpenRouterProvider(
-            api_key=app_state.openrouter_api_key,
-            model=app_state.openrouter_model
-        )
-    elif provider_type == "google":
-        new_provider = ollama_provider  # Placeholder
-    else:
-        new_provider = ollama_provider
+    new_provider = _build_provider(provider_type)
+    if fallbacks:
+        routes = [ProviderRoute(new_provider, _default_model(provider_type))]
+        routes += [ProviderRoute(_build_provider(name), _default_model(name)) for name in fallbacks]
+        new_provider = RoutingProvider(routes, hedging=app_state.ai_hedging)
         
     _cached_provider = new_provider
     _cached_settings_hash = settings_hash
     return new_provider
 
 
+# =============================================================================
+# GENERATION (SINGLE-FLIGHT)
+# =============================================================================
+# Автогенерация, Ctrl+Enter и собиратель могут запросить одну и ту же фразу
+# почти одновременно - такие запросы выполняются одним вызовом провайдера.
+generation_flight = SingleFlight("generation")
+
+
+def _prompt_signature(with_context):
+    """Промпт режима генерации (для контекста - вместе с разделителем)"""
+    if with_context:
+        return f"{app_state.context_prompt}\x00{app_state.context_delimiter}"
+    return app_state.translate_prompt
+
+
+def _generation_key(provider, model, phrase, with_context):
+    """Ключ генерации: (провайдер, модель, хэш промпта, фраза)"""
+    prompt_hash = hashlib.sha1(_prompt_signature(with_context).encode("utf-8")).hexdigest()
+    return (provider.name, model, prompt_hash, phrase, bool(with_context))
+
+
+def _effective_model(provider, model):
+    """Модель запроса: явная или модель провайдера по умолчанию (у маршрутизатора - основного)"""
+    target = getattr(provider, "primary", provider)
+    return model or getattr(target, "model", None) or getattr(target, "default_model", None)
+
+
+def generate_translation(provider, phrase, with_context, model=None, use_memory=True):
+    """
+    Генерирует перевод (и контекст) фразы текущими промптами.
+    При включенной маршрутизации модель выбирается по правилам из настроек.
+    Одинаковые одновременные запросы объединяются в один вызов.
+    Та же фраза из памяти переводов (той же моделью) возвращается без генерации,
+    похожие фразы передаются модели как примеры (use_memory=False - всегда
+    генерировать заново).
+
+    Returns:
+        Tuple[перевод, контекст]
+    """
+    if app_state.model_routing_enabled:
+        model = model_router.select(
+            app_state.model_routing_rules, provider.name, phrase, with_context, model
+        )
+    
+    signature = _prompt_signature(with_context)
+    # Перевод из памяти - только если он сделан той же моделью
+    label = model_label(provider, _effective_model(provider, model))
+    examples = []
+    if use_memory and app_state.tm_enabled:
+        match = translation_memory.match(
+            phrase, with_context, signature, label,
+            app_state.tm_reuse_similarity / 100 if app_state.tm_fuzzy_reuse else 1.0,
+            app_state.tm_example_similarity / 100,
+            app_state.tm_examples
+        )
+        if match.reuse:
+            debug_log(f"📚 Перевод из памяти ({match.score:.2f}): '{phrase[:40]}'")
+            return match.reuse
+        examples = match.examples
+    
+    def _call():
+        start = time.time()
+        try:
+            result = _translate()
+        except Exception:
+            model_router.record(model, time.time() - start, ok=False)
+            raise
+        model_router.record(model, time.time() - start, ok=True)
+        if app_state.tm_enabled:
+            try:
+                translation_memory.record(phrase, with_context, signature, label, *result)
+            except Exception as e:
+                debug_log(f"⚠️ Память переводов: запись не сохранена: {e}")
+        return result
+    
+    def _translate():
+        if with_context:
+            return provider.translate_with_context(
+                phrase, with_examples(app_state.context_prompt, examples), model,
+                delimiter=app_state.context_delimiter
+            )
+        return provider.translate(phrase, with_examples(app_state.translate_prompt, examples), model)
+
+    key = _generation_key(provider, model, phrase, with_context)
+    return generation_flight.do(key, _call)
+
+
 # =============================================================================
 # AI WORKER
 # =============================================================================
-def ask_ai_worker(q, phrase, with_context):
+def model_label(provider, model):
+    """Провайдер и модель одной строкой: 'Ollama:gemma3:1b'"""
+    return f"{provider.name}:{model}" if model else provider.name
+
+
+@profiler.worker("ask_ai_worker")
+def ask_ai_worker(q, phrase, with_context, trace_id=None):
     """Воркер для генерации перевода через выбранный AI"""
     try:
         provider = get_current_ai_provider()
@@ -73,19 +212,19 @@ def ask_ai_worker(q, phrase, with_context):
             if not model:
                 model = app_state.ollama_model
 
-        if with_context:
-            translation, context = provider.translate_with_context(
-                phrase, app_state.context_prompt, model,
-                delimiter=app_state.context_delimiter
-            )
-        else:
-            translation, context = provider.translate(
-                phrase, app_state.translate_prompt, model
+        # Замена дубликата - всегда новая генерация, не из памяти переводов
+        start = time.time()
+        with tracer.span(trace_id, "generation", model=model_label(provider, model), context=bool(with_context)):
+            translation, context = generate_translation(
+                provider, phrase, with_context, model, use_memory=not app_state.force_replace_flag
             )
+        app_state.last_generation = {
+            "phrase": phrase, "model": model_label(provider, model), "seconds": time.time() - start
+        }
         
-        q.put(("ollama_ok", (translation, context)))
+        tracer.post(q, "ollama_ok", (translation, context), trace_id)
     except Exception as e:
-        q.put(("ollama_error", e))
+        tracer.post(q, "ollama_error", e, trace_id)
 
 
 def get_ollama_models():
@@ -99,16 +238,57 @@ def get_ollama_models():
 # =============================================================================
 # ANKI WORKER
 # =============================================================================
+def find_duplicate_notes(phrase):
+    """
+    ID заметок-дубликатов фразы (для предупреждения). Индекс находит и
+    фразы, отличающиеся регистром, пунктуацией или почти совпадающие -
+    удалять их нельзя: для замены используется anki_api.find_exact_notes.
+    Пока локальный индекс не загружен, выполняется поиск через AnkiConnect.
+    """
+    if duplicate_index.ready:
+        return duplicate_index.lookup(phrase, app_state.duplicate_similarity / 100)
+    return anki_api.find_notes(phrase)
+
+
+def get_embedding_provider():
+    """Провайдер эмбеддингов: текущий, если умеет, иначе локальный Ollama"""
+    provider = get_current_ai_provider()
+    return provider if provider.supports_embeddings else ollama_provider
+
+
+def apply_mirror_changes(upserted, deleted, full):
+    """Переносит изменения зеркала заметок Anki в индексы дубликатов"""
+    if full:
+        duplicate_index.replace_all(upserted)
+        if app_state.semantic_dedupe:
+            provider = get_embedding_provider()
+            # Досчет эмбеддингов может занять минуты - не задерживаем синхронизацию
+            threading.Thread(target=semantic_index.sync, args=(
+                upserted, lambda texts: provider.embed(texts, app_state.embedding_model),
+                app_state.embedding_model
+            ), daemon=True).start()
+        return
+    for note_id, phrase in upserted:
+        duplicate_index.add(note_id, phrase)
+        semantic_index.note_added(note_id, phrase)
+    for note_id in deleted:
+        duplicate_index.remove(note_id)
+    semantic_index.remove(deleted)
+
+
+@profiler.worker("add_to_anki_worker")
 def add_to_anki_worker(q, phrase, translation, context, deck_name, audio_path, 
-                       confirm_delete=False, force_replace=False):
+                       confirm_delete=False, force_replace=False, trace_id=None):
     """Воркер для добавления в Anki"""
     
     try:
         if force_replace:
-            existing_ids = anki_api.find_notes(phrase)
-            if existing_ids:
-                debug_log(f"🔄 Force replace: удаление {len(existing_ids)} старых заметок.")
-                anki_api.delete_notes(existing_ids)
+            with tracer.span(trace_id, "anki:delete"):
+                existing_ids = anki_api.find_exact_notes(phrase)
+                if existing_ids:
+                    debug_log(f"🔄 Force replace: удаление {len(existing_ids)} старых заметок.")
+                    if anki_api.delete_notes(existing_ids):
+                        anki_mirror.notes_deleted(existing_ids)
         
         # Ensure absolute path
         if audio_path and not os.path.isabs(audio_path):
@@ -120,7 +300,21 @@ def add_to_anki_worker(q, phrase, translation, context, deck_name, audio_path,
         if audio_path and os.path.exists(audio_path):
             debug_log(f"   audio file size: {os.path.getsize(audio_path)} bytes")
         
-        anki_api.add_note(phrase, translation, context, deck_name, audio_path)
+        audio_hash = file_hash(audio_path)
+        with tracer.span(trace_id, "anki:write") as span:
+            status, ref = anki_outbox.submit(phrase, translation, context, deck_name, audio_path)
+            span["status"] = status
+        generation = app_state.last_generation if app_state.last_generation.get("phrase") == phrase else {}
+        history_store.record(
+            phrase, translation, context, deck_name,
+            note_id=ref if status == "added" else None, status=status,
+            model=generation.get("model", ""), preset=app_state.prompt_preset,
+            audio_hash=audio_hash, generation_seconds=generation.get("seconds")
+        )
+        if status == "queued":
+            # Anki недоступен: карточка и аудио сохранены в очереди
+            tracer.post(q, "anki_queued", anki_outbox.pending_count(), trace_id)
+            return
         debug_log("✅ Нота успешно добавлена в Anki.")
         
         if audio_path and os.path.exists(audio_path):
@@ -130,14 +324,16 @@ def add_to_anki_worker(q, phrase, translation, context, deck_name, audio_path,
             except OSError:
                 pass
         
-        q.put(("anki_ok", True))
+        tracer.post(q, "anki_ok", True, trace_id)
     except Exception as e:
         debug_log(f"❌ Ошибка добавления в Anki: {e}")
         err_msg = str(e).lower()
         if "duplicate" in err_msg and not confirm_delete and not force_replace:
-            existing_ids = anki_api.find_notes(phrase)
+            # Удаляется только та же фраза, не похожие
+            existing_ids = anki_api.find_exact_notes(phrase)
             if existing_ids:
-                q.put(("anki_duplicate", (phrase, translation, context, deck_name, audio_path, existing_ids)))
+                tracer.post(q, "anki_duplicate", (phrase, translation, context, deck_name, audio_path, existing_ids),
+                            trace_id)
                 return
         
         if audio_path and os.path.exists(audio_path):
@@ -145,7 +341,7 @@ def add_to_anki_worker(q, phrase, translation, context, deck_name, audio_path,
                 os.remove(audio_path)
             except OSError:
                 pass
-        q.put(("anki_error", str(e)))
+        tracer.post(q, "anki_error", str(e), trace_id)
 
 
 def load_background_data_worker(q):
@@ -162,11 +358,15 @@ def load_background_data_worker(q):
         q.put(("models_error", e))
     
     try:
-        decks = anki_api.get_deck_names()
+        # Сначала список и счетчик последней колоды, остальные счетчики - следом
+        decks = deck_catalog.refresh(selected=load_settings(update_app_state=False).get("LAST_DECK", ""))
         if decks == "ANKI_CONNECT_ERROR":
             q.put(("decks_error", decks))
         else:
             q.put(("decks_ok", decks))
+            # Anki доступен: зеркало заметок синхронизируется сразу
+            anki_mirror.request_sync()
+            deck_catalog.fill_counts(lambda labels: q.put(("decks_ok", labels)))
     except Exception as e:
         q.put(("decks_error", e))
 
@@ -174,11 +374,24 @@ def load_background_data_worker(q):
 # =============================================================================
 # CLIPBOARD WORKER
 # =============================================================================
+# Перенос строки не после знака препинания - склеивается в пробел (субтитры)
+_CLIPBOARD_BREAK_RE = re.compile(r'(?<![.!?,;:])\s*[\r\n]+\s*')
+CLIPBOARD_MAX_CHARS = 10000  # Лимит режима собирателя
+
+
 def format_clipboard_text(text):
     """Форматирует текст из буфера обмена"""
-    return re.sub(r'(?<![.!?,;:])\s*[\r\n]+\s*', ' ', text)
+    if '\n' not in text and '\r' not in text:
+        return text
+    return _CLIPBOARD_BREAK_RE.sub(' ', text)
+
+
+def is_capturable_text(text):
+    """Текст буфера подходит для перехвата: не длиннее лимита и с буквами"""
+    return len(text) <= CLIPBOARD_MAX_CHARS and any(c.isalpha() for c in text)
 
 
+@profiler.worker("clipboard_worker")
 def clipboard_worker(q):
     """Воркер для мониторинга буфера обмена"""
     import pyperclip
@@ -216,19 +429,17 @@ def clipboard_worker(q):
                 continue
             
             if current != app_state.last_clipboard and current.strip():
-                word_count = len(current.split())
                 char_count = len(current)
-                has_letters = any(c.isalpha() for c in current)
                 
-                print(f"📋 Буфер изменился: слов={word_count}, символов={char_count}, текст: {current[:50]}...")
+                print(f"📋 Буфер изменился: символов={char_count}, текст: {current[:50]}...")
                 
                 # Увеличиваем лимит до 10000 символов для режима собирателя
-                if char_count <= 10000 and has_letters:
+                if is_capturable_text(current):
                     print(f"✅ Текст перехвачен, помещаем в очередь")
-                    q.put(current)
+                    q.put(tracer.tag(current))
                     app_state.last_clipboard = current
                 else:
-                    if char_count > 10000:
+                    if char_count > CLIPBOARD_MAX_CHARS:
                         print(f"⚠️ Текст слишком длинный ({char_count} симв.), игнорируем")
                     app_state.last_clipboard = current
             
@@ -18,11 +18,17 @@ import shutil
 from core.app_state import app_state
 from core.settings_manager import load_settings, save_settings, get_user_dir, get_data_dir, get_resource_path, DEFAULT_DECK_NAME
 from core.prompts_manager import prompts_manager, update_active_prompts, rename_prompt_preset
-from core.workers import ask_ai_worker, get_ollama_models, add_to_anki_worker, load_background_data_worker, clipboard_worker, get_current_ai_provider
+from core.workers import ask_ai_worker, get_ollama_models, add_to_anki_worker, load_background_data_worker, clipboard_worker, get_current_ai_provider, find_duplicate_notes, apply_mirror_changes
 from core.processing import process_clipboard_queue, process_results_queue
 from core.ui_callbacks import update_auto_generate_flag, update_pause_monitoring_flag, update_processing_indicator
 from core import audio_utils
 from api.anki_api import anki_api
+from core.outbox import anki_outbox
+from core.anki_mirror import anki_mirror
+from core.deck_catalog import deck_catalog
+from core.translation_memory import translation_memory
+from core.profiling import profiler
+from core.tracing import tracer
 from api.ai.ollama_provider import ollama_provider
 from ui.main_window import build_main_window
 from ui.settings_window import open_settings_window, apply_font_settings
@@ -108,6 +114,8 @@ def main():
 
     # Загрузка настроек
     settings = load_settings()
+    profiler.configure(settings)
+    tracer.configure(settings)
     
     # Обновляем audio_utils
     audio_utils.update_tts_settings(
@@ -126,9 +134,15 @@ def main():
     dependencies.update_pause_monitoring_flag = update_pause_monitoring_flag
     dependencies.stop_generation = app_state.stop_generation
     dependencies.get_ollama_models = get_ollama_models
-    dependencies.get_deck_names = anki_api.get_deck_names
+    dependencies.get_deck_names = deck_catalog.refresh
+    dependencies.fill_deck_counts = deck_catalog.fill_counts
+    dependencies.deck_added = deck_catalog.deck_added
+    dependencies.deck_labels = deck_catalog.labels
+    dependencies.deck_label = deck_catalog.label
+    dependencies.search_decks = deck_catalog.search
+    dependencies.has_deck = deck_catalog.has_deck
     dependencies.create_deck = anki_api.create_deck
-    dependencies.clean_deck_name = anki_api.clean_deck_name
+    dependencies.clean_deck_name = deck_catalog.name_of
     dependencies.open_settings_window = lambda parent, deps, **kwargs: open_settings_window(parent, deps, settings, **kwargs)
     dependencies.threading = threading
     dependencies.DEFAULT_DECK_NAME = DEFAULT_DECK_NAME
@@ -139,14 +153,18 @@ def main():
     
     # Пакетная обработка
     def start_batch_processing(text):
-        if not text.strip():
-            return
-        
-        phrase_list = [line.strip() for line in text.split('\n') if line.strip()]
-        if not phrase_list:
-            return
+        # text - содержимое поля ввода или файловый источник (BatchSource)
+        if isinstance(text, str):
+            if not text.strip():
+                return
             
-        deck_name = anki_api.clean_deck_name(app_state.main_window_components["vars"]["deck_var"].get())
+            phrase_list = [line.strip() for line in text.split('\n') if line.strip()]
+            if not phrase_list:
+                return
+        else:
+            phrase_list = text
+            
+        deck_name = deck_catalog.name_of(app_state.main_window_components["vars"]["deck_var"].get())
         audio_enabled = app_state.main_window_components["vars"]["audio_enabled_var"].get()
         context_enabled = app_state.main_window_components["vars"]["context_var"].get()
         
@@ -169,8 +187,19 @@ def main():
     def stop_batch_processing():
         app_state.batch_running = False
 
+    def resume_batch_processing(job_id):
+        # Параметры (колода, озвучка, контекст) берутся из сохраненного задания
+        thread = threading.Thread(
+            target=batch_processing_worker,
+            args=(app_state.results_queue, None, None, None, None, get_current_ai_provider, audio_utils),
+            kwargs={"job_id": job_id},
+            daemon=True
+        )
+        thread.start()
+
     dependencies.start_batch_processing = start_batch_processing
     dependencies.stop_batch_processing = stop_batch_processing
+    dependencies.resume_batch_processing = resume_batch_processing
     
     # Generate action wrapper
     def generate_action_wrapper():
@@ -219,17 +248,24 @@ def main():
             except Exception:
                 pass
         update_timer()
+        trace_id = tracer.current_for(phrase)
         
         def _pre_generation_worker():
             app_state.force_replace_flag = False
-            existing_ids = anki_api.find_notes(phrase)
+            with tracer.span(trace_id, "duplicate_check") as span:
+                existing_ids = find_duplicate_notes(phrase)
+                span["found"] = len(existing_ids or [])
             
             def _continue_generation_on_main():
+                tracer.dequeue(trace_id, "tk")
                 if existing_ids:
                     audio_utils.play_sound("notify")
-                    if messagebox.askyesno("Дубликат", "Такая карточка уже есть в Anki.\nСгенерировать новую версию для замены?", parent=root):
+                    with tracer.span(trace_id, "dialog:duplicate"):
+                        replace = messagebox.askyesno("Дубликат", "Такая карточка уже есть в Anki.\nСгенерировать новую версию для замены?", parent=root)
+                    if replace:
                         app_state.force_replace_flag = True
                     else:
+                        tracer.finish(trace_id, "cancelled")
                         app_state.generation_running = False
                         widgets["generate_btn"].configure(text=localization_manager.get_text("generate"), state="normal", fg_color="#2CC985", hover_color="#26AD72", text_color="white")
                         return
@@ -239,8 +275,9 @@ def main():
                 with_context = app_state.get_checkbox_value("context_var", default=False)
                 print(f"🔄 Генерация: phrase={len(phrase)} chars, контекст={'☑ ВКЛ' if with_context else '☐ ВЫКЛ'}")
                 
-                threading.Thread(target=ask_ai_worker, args=(app_state.results_queue, phrase, with_context), daemon=True).start()
+                threading.Thread(target=ask_ai_worker, args=(app_state.results_queue, phrase, with_context, trace_id), daemon=True).start()
 
+            tracer.enqueue(trace_id, "tk")
             root.after(0, _continue_generation_on_main)
 
         threading.Thread(target=_pre_generation_worker, daemon=True).start()
@@ -257,23 +294,26 @@ def main():
         app_state.main_window_components["widgets"]["add_btn"].configure(state="disabled", text="⏳ Озвучка...")
         
         audio_enabled = app_state.main_window_components.get("vars", {}).get("audio_enabled_var", tk.BooleanVar(value=True)).get()
+        trace_id = tracer.current_for(text)
+        tracer.dequeue(trace_id, "tk")
         
         def _async_audio_gen():
             try:
-                if audio_enabled:
-                    audio_path = audio_utils.generate_audio(
-                        text, 
-                        app_state.tts.lang, 
-                        app_state.tts.speed_level, 
-                        app_state.tts.tld
-                    )
-                else:
-                    audio_path = None
+                with tracer.span(trace_id, "tts", enabled=audio_enabled):
+                    if audio_enabled:
+                        audio_path = audio_utils.generate_audio(
+                            text, 
+                            app_state.tts.lang, 
+                            app_state.tts.speed_level, 
+                            app_state.tts.tld
+                        )
+                    else:
+                        audio_path = None
                 
-                app_state.results_queue.put(("audio_ok", audio_path))
+                tracer.post(app_state.results_queue, "audio_ok", audio_path, trace_id)
             except Exception as e:
                 print(f"❌ Critical error in audio generation: {e}")
-                app_state.results_queue.put(("audio_error", str(e)))
+                tracer.post(app_state.results_queue, "audio_error", str(e), trace_id)
 
         threading.Thread(target=_async_audio_gen, daemon=True).start()
         
@@ -298,12 +338,18 @@ def main():
     
     # Запускаем потоки
     threading.Thread(target=clipboard_worker, args=(app_state.clipboard_queue,), daemon=True).start()
+    anki_outbox.start(lambda counts: app_state.results_queue.put(("outbox_status", counts)))
+    anki_mirror.add_listener(apply_mirror_changes)
+    anki_mirror.start()
+    translation_memory.start()
     
     # Запускаем обработку очередей
     root.after(100, process_clipboard_queue, root)
     root.after(100, process_results_queue, root)
+    profiler.watch_mainloop(root)
     
     root.mainloop()
+    profiler.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Очистка большого текста через ИИ по частям.
+Текст делится на фрагменты по границам абзацев с перекрытием, фрагменты
+очищаются параллельно (не больше, чем выдерживает провайдер), результаты
+склеиваются по порядку, повторы на стыках фрагментов удаляются.
+Время очистки зависит от параллельности, а не от длины контекста.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+from core.logger import debug_log
+from modules.batch_generator.segmenter import normalize_key, split_sentences
+
+
+CHUNK_CHARS = 2000       # Размер фрагмента: укладывается в контекст маленьких моделей
+OVERLAP_PARAGRAPHS = 1   # Сколько абзацев предыдущего фрагмента повторяется в следующем
+SEAM_WINDOW = 12         # Сколько последних строк проверяется на повтор при склейке
+
+
+class CleaningCancelled(Exception):
+    """Очистка отменена пользователем"""
+
+
+def _paragraphs(text: str, max_chars: int) -> List[str]:
+    """
+    Абзацы текста. Слишком длинный абзац делится по строкам,
+    слишком длинная строка - по предложениям.
+    """
+    paragraphs = []
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            paragraphs.append(block)
+            continue
+        units = []
+        for line in block.split("\n"):
+            units.extend(split_sentences(line) if len(line) > max_chars else [line])
+        part = ""
+        for unit in units:
+            if part and len(part) + len(unit) + 1 > max_chars:
+                paragraphs.append(part)
+                part = ""
+            part = f"{part}\n{unit}" if part else unit
+        if part:
+            paragraphs.append(part)
+    return paragraphs
+
+
+def split_chunks(text: str, max_chars: int = CHUNK_CHARS, overlap: int = OVERLAP_PARAGRAPHS) -> List[str]:
+    """
+    Делит текст на фрагменты по границам абзацев.
+    Каждый следующий фрагмент начинается с последних overlap абзацев
+    предыдущего, чтобы ИИ видел предложения на стыке целиком, - если с ними
+    фрагмент не превышает max_chars (иначе перекрытие отбрасывается).
+    """
+    paragraphs = _paragraphs(text, max_chars)
+    if not paragraphs:
+        return []
+
+    def fits(parts: List[str], paragraph: str) -> bool:
+        return sum(len(p) + 2 for p in parts) + len(paragraph) <= max_chars
+
+    chunks = []
+    current: List[str] = []
+    for paragraph in paragraphs:
+        if current and not fits(current, paragraph):
+            chunks.append("\n\n".join(current))
+            current = current[-overlap:] if overlap else []
+            while current and not fits(current, paragraph):
+                current = current[1:]
+        current.append(paragraph)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def stitch(results: List[List[str]], window: int = SEAM_WINDOW) -> List[str]:
+    """Склеивает строки фрагментов по порядку, удаляя повторы на стыках"""
+    lines: List[str] = []
+    for chunk_lines in results:
+        recent = {normalize_key(line) for line in lines[-window:]}
+        for line in chunk_lines:
+            if normalize_key(line) in recent:
+                continue
+            lines.append(line)
+    return lines
+
+
+class ChunkedCleaner:
+    """Параллельная очистка фрагментов текста через AI провайдера"""
+
+    def __init__(self, provider, model: Optional[str], prompt: str,
+                 concurrency: Optional[int] = None, max_chars: int = CHUNK_CHARS):
+        self.provider = provider
+        self.model = model
+        self.prompt = prompt
+        self.concurrency = max(1, concurrency or getattr(provider, "max_concurrency", 1))
+        self.max_chars = max_chars
+
+    def _clean_one(self, chunk: str) -> List[str]:
+        cleaned = self.provider.generate(f"{self.prompt}\n\n{chunk}", model=self.model)
+        return [line.strip() for line in cleaned.splitlines() if line.strip()]
+
+    def clean_chunks(self, chunks: List[str],
+                     on_progress: Callable[[int, int], None] = None,
+                     cancel_event: threading.Event = None) -> List[List[str]]:
+        """
+        Очищает фрагменты параллельно.
+
+        Returns:
+            Строки результата для каждого фрагмента (в исходном порядке)
+
+        Raises:
+            CleaningCancelled: Если выставлен cancel_event
+            Exception: Ошибка провайдера (первая из возникших)
+        """
+        results: List[Optional[List[str]]] = [None] * len(chunks)
+        done = 0
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cleaner")
+        try:
+            futures = {executor.submit(self._clean_one, chunk): i for i, chunk in enumerate(chunks)}
+            pending = set(futures)
+            while pending:
+                # Короткое ожидание: отмена срабатывает, не дожидаясь ответа модели
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CleaningCancelled()
+                for future in finished:
+                    results[futures[future]] = future.result()
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(chunks))
+        finally:
+            # Невыполненные фрагменты отменяются (при ошибке или отмене)
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def clean(self, text: str, on_progress: Callable[[int, int], None] = None,
+              cancel_event: threading.Event = None) -> List[str]:
+        """Очищает весь текст: фрагменты -> параллельная очистка -> склейка"""
+        chunks = split_chunks(text, self.max_chars)
+        debug_log(f"🧹 Очистка: {len(text)} символов, фрагментов: {len(chunks)}, потоков: {self.concurrency}")
+        return stitch(self.clean_chunks(chunks, on_progress, cancel_event))
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Задания пакетной обработки с сохранением прогресса на диск.
+Каждый запуск - задание с ID, параметрами и состоянием каждой фразы.
+Состояние сохраняется после каждого шага, поэтому после закрытия
+программы, сбоя или остановки задание можно продолжить: выполненные
+фразы пропускаются, повторяются только незавершенные и ошибочные.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+JOBS_DB_NAME = "batch_jobs.sqlite3"
+
+# Состояния фразы
+ITEM_PENDING = "pending"        # Еще не обрабатывалась
+ITEM_GENERATED = "generated"    # Перевод и контекст получены
+ITEM_AUDIO = "audio"            # Озвучка готова
+ITEM_ADDED = "added"            # Заметка добавлена (note_id)
+ITEM_QUEUED = "queued"          # Anki недоступен, заметка в очереди доставки
+ITEM_SKIPPED = "skipped"        # Дубликат
+ITEM_FAILED = "failed"          # Ошибка (error)
+
+# Фразы в этих состояниях при продолжении задания не обрабатываются
+DONE_STATES = (ITEM_ADDED, ITEM_QUEUED, ITEM_SKIPPED)
+
+# Состояния задания
+JOB_RUNNING = "running"
+JOB_STOPPED = "stopped"
+JOB_DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    status TEXT NOT NULL,
+    deck TEXT NOT NULL,
+    audio_enabled INTEGER NOT NULL,
+    context_enabled INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    phrase TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    translation TEXT,
+    context TEXT,
+    audio_path TEXT,
+    note_id INTEGER,
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_job_items_state ON job_items(job_id, state);
+"""
+
+
+class JobStore:
+    """Хранилище заданий пакетной обработки (SQLite в user_files)"""
+
+    INSERT_CHUNK = 500
+    PAGE_SIZE = 200
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self._base_dir is None:
+                from core.settings_manager import get_base_data_dir
+                self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+            os.makedirs(self._base_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self._base_dir, JOBS_DB_NAME),
+                                   timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def create_job(self, phrases: Iterable[str], deck_name: str, audio_enabled: bool,
+                   context_enabled: bool, source: Dict = None) -> str:
+        """
+        Создает задание. phrases может быть генератором (файловый источник):
+        фразы записываются порциями, без загрузки всего списка в память.
+        Возвращает ID задания.
+        """
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        now = time.time()
+        total = 0
+        with self._lock:
+            db = self._db()
+            try:
+                db.execute(
+                    "INSERT INTO jobs (id, created, updated, status, deck, audio_enabled, context_enabled, total, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                    (job_id, now, now, JOB_RUNNING, deck_name, int(audio_enabled), int(context_enabled),
+                     json.dumps(source, ensure_ascii=False) if source else None))
+                chunk = []
+                for phrase in phrases:
+                    chunk.append((job_id, total, phrase))
+                    total += 1
+                    if len(chunk) >= self.INSERT_CHUNK:
+                        db.executemany("INSERT INTO job_items (job_id, idx, phrase) VALUES (?, ?, ?)", chunk)
+                        chunk = []
+                if chunk:
+                    db.executemany("INSERT INTO job_items (job_id, idx, phrase) VALUES (?, ?, ?)", chunk)
+                db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+                db.commit()
+            except BaseException:
+                # Источник упал на середине: ни задания, ни части фраз не остается
+                db.rollback()
+                raise
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["source"] = json.loads(job["source"]) if job["source"] else None
+        return job
+
+    def iter_items(self, job_id: str, only_unfinished: bool = False) -> Iterator[Dict]:
+        """Фразы задания по порядку (читаются страницами, а не все сразу)"""
+        query = "SELECT * FROM job_items WHERE job_id = ? AND idx > ?"
+        if only_unfinished:
+            query += " AND state NOT IN (%s)" % ",".join("?" * len(DONE_STATES))
+        query += " ORDER BY idx LIMIT ?"
+        last_idx = -1
+        while True:
+            params = (job_id, last_idx) + (DONE_STATES if only_unfinished else ()) + (self.PAGE_SIZE,)
+            with self._lock:
+                rows = [dict(row) for row in self._db().execute(query, params).fetchall()]
+            if not rows:
+                return
+            yield from rows
+            last_idx = rows[-1]["idx"]
+
+    def update_item(self, job_id: str, idx: int, state: str, **fields):
+        """Сохраняет новое состояние фразы (контрольная точка)"""
+        allowed = {"translation", "context", "audio_path", "note_id", "error"}
+        columns = ["state = ?"] + [f"{name} = ?" for name in fields if name in allowed]
+        values = [state] + [value for name, value in fields.items() if name in allowed]
+        if state != ITEM_FAILED and "error" not in fields:
+            columns.append("error = NULL")
+        with self._lock:
+            db = self._db()
+            db.execute(f"UPDATE job_items SET {', '.join(columns)} WHERE job_id = ? AND idx = ?",
+                       values + [job_id, idx])
+            db.execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time(), job_id))
+            db.commit()
+
+    def set_status(self, job_id: str, status: str):
+        with self._lock:
+            db = self._db()
+            db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+            db.commit()
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        """Количество фраз задания по состояниям"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT state, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY state", (job_id,)).fetchall()
+        return {state: count for state, count in rows}
+
+    def unfinished_jobs(self, limit: int = 20) -> List[Dict]:
+        """Незавершенные задания, новые первыми"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id FROM jobs WHERE status != ? ORDER BY updated DESC LIMIT ?", (JOB_DONE, limit)).fetchall()
+        jobs = []
+        for row in rows:
+            job = self.get_job(row["id"])
+            job["progress"] = self.progress(row["id"])
+            jobs.append(job)
+        return jobs
+
+    def finish(self, job_id: str) -> str:
+        """Завершает запуск задания: done, если все фразы обработаны, иначе stopped"""
+        progress = self.progress(job_id)
+        unfinished = sum(count for state, count in progress.items() if state not in DONE_STATES)
+        status = JOB_STOPPED if unfinished else JOB_DONE
+        self.set_status(job_id, status)
+        return status
+
+
+# Глобальное хранилище заданий
+job_store = JobStore()
@@ -2,26 +2,82 @@
 import time
 import os
 from core.app_state import app_state
-from api.anki_api import anki_api
+from core.profiling import profiler
+from core.workers import generate_translation, model_label
+from core.history import history_store, file_hash
+from core.outbox import anki_outbox
+from modules.batch_generator.jobs import (
+    job_store, DONE_STATES, JOB_RUNNING, JOB_STOPPED, ITEM_GENERATED, ITEM_AUDIO,
+    ITEM_ADDED, ITEM_QUEUED, ITEM_SKIPPED, ITEM_FAILED,
+)
+from modules.batch_generator.sources import BatchSource
+from modules.batch_generator.planner import BatchPlan
 
-def batch_processing_worker(q, phrase_list, deck_name, audio_enabled, context_enabled, get_current_ai_provider_func, audio_utils_module):
+PHRASE_DELAY = 3.0  # Пауза между фразами, сек (бережет бесплатный gTTS)
+
+@profiler.worker("batch_processing_worker")
+def batch_processing_worker(q, phrase_list, deck_name, audio_enabled, context_enabled, get_current_ai_provider_func, audio_utils_module,
+                            job_id=None):
     """
     Чистая логика пакетной обработки.
     Не зависит от UI напрямую, общается через очередь q.
+    Прогресс сохраняется в задание (job_store); если передан job_id,
+    задание продолжается с его параметрами, выполненные фразы пропускаются.
     """
     app_state.batch_running = True
-    total = len(phrase_list)
     
-    q.put(("batch_log", f"🚀 Начало обработки {total} фраз..."))
+    if job_id:
+        job = job_store.get_job(job_id)
+        if job is None:
+            # Задание удалено (или база заданий заменена) - продолжать нечего
+            q.put(("batch_log", f"❌ Задание {job_id} не найдено."))
+            app_state.batch_running = False
+            q.put(("batch_done", True))
+            return
+        deck_name = job["deck"]
+        audio_enabled = bool(job["audio_enabled"])
+        context_enabled = bool(job["context_enabled"])
+        total = job["total"]
+        progress = job_store.progress(job_id)
+        remaining = total - sum(count for state, count in progress.items() if state in DONE_STATES)
+        job_store.set_status(job_id, JOB_RUNNING)
+        q.put(("batch_log", f"♻️ Продолжение задания {job_id}: осталось {remaining} из {total} фраз..."))
+    else:
+        # phrase_list - список строк или файловый источник (читается потоково)
+        source = phrase_list.describe() if isinstance(phrase_list, BatchSource) else None
+        # План: повторы в пакете и фразы, уже существующие в Anki, отсекаются до генерации
+        q.put(("batch_log", "🔎 Проверка фраз..."))
+        plan = BatchPlan(phrase_list, check_collection=app_state.check_duplicates)
+        try:
+            job_id = job_store.create_job(plan, deck_name, audio_enabled, context_enabled, source=source)
+        except Exception as e:
+            q.put(("batch_log", f"❌ Не удалось прочитать источник: {e}"))
+            app_state.batch_running = False
+            q.put(("batch_done", True))
+            return
+        total = job_store.get_job(job_id)["total"]
+        q.put(("batch_log", plan.summary()))
+        q.put(("batch_log", f"🚀 Начало обработки {total} фраз (задание {job_id})..."))
     
-    for i, phrase in enumerate(phrase_list):
+    for n, item in enumerate(job_store.iter_items(job_id, only_unfinished=True)):
+        # Пауза между фразами
+        if n > 0:
+            for _ in range(int(PHRASE_DELAY * 10)):
+                if not app_state.batch_running: break
+                # Если во время ожидания нажали паузу - заходим в цикл ожидания паузы
+                if app_state.batch_paused:
+                    while app_state.batch_paused:
+                        time.sleep(0.2)
+                        if not app_state.batch_running: break
+                time.sleep(0.1)
+        
         if not app_state.batch_running:
             q.put(("batch_log", "🛑 Обработка прервана."))
             break
         
         # Проверка паузы
         if app_state.batch_paused:
-            q.put(("batch_log", f"⏸ Пауза перед фразой: {phrase[:30]}..."))
+            q.put(("batch_log", f"⏸ Пауза перед фразой: {item['phrase'][:30]}..."))
             while app_state.batch_paused:
                 time.sleep(0.2)
                 if not app_state.batch_running:
@@ -33,85 +89,102 @@ def batch_processing_worker(q, phrase_list, deck_name, audio_enabled, context_en
             q.put(("batch_log", "🛑 Обработка прервана."))
             break
             
-        phrase = phrase.strip()
-        if not phrase:
-            continue
-            
-        q.put(("batch_progress", (i + 1, total, phrase)))
+        phrase = item["phrase"]
+        index = item["idx"]
+        q.put(("batch_progress", (index + 1, total, phrase)))
         
         # Начало логирования фразы (одна строка на фразу)
         short_phrase = (phrase[:40] + '...') if len(phrase) > 40 else phrase
         q.put(("batch_log", f"{short_phrase}:"))
         
         try:
-            # 1. Проверка дубликата
-            if app_state.check_duplicates:
-                existing = anki_api.find_notes(phrase)
-                if existing:
-                    q.put(("batch_log_append", "⚠️ Дубликат (пропущено)"))
-                    continue
-            
-            # 2. Генерация через AI
-            q.put(("batch_log_append", "🤖"))
-            provider = get_current_ai_provider_func()
-            
-            # Определяем модель в зависимости от провайдера
-            if provider.name == "Ollama":
-                model = app_state.ollama_model
-            elif provider.name == "OpenRouter":
-                model = app_state.openrouter_model
-            else:
-                model = None  # Провайдер сам определит модель
-            
-            if context_enabled:
-                translation, context = provider.translate_with_context(
-                    phrase, app_state.context_prompt, model,
-                    delimiter=app_state.context_delimiter
-                )
-            else:
-                translation, context = provider.translate(
-                    phrase, app_state.translate_prompt, model
-                )
-            
-            # 3. Озвучка
-            audio_path = None
-            if audio_enabled:
-                q.put(("batch_log_append", "🔊"))
-                audio_path = audio_utils_module.generate_audio(
-                    phrase, 
-                    app_state.tts.lang, 
-                    app_state.tts.speed_level, 
-                    app_state.tts.tld
-                )
-            
-            # 4. Добавление в Anki
-            q.put(("batch_log_append", "📇"))
-            anki_api.add_note(phrase, translation, context, deck_name, audio_path, allow_duplicate=not app_state.check_duplicates)
-            
-            # Очистка аудио
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    os.remove(audio_path)
-                except OSError:
-                    pass
-                
-            q.put(("batch_log_append", "✅ Готово"))
-            
+            _process_item(q, job_id, item, deck_name, audio_enabled, context_enabled,
+                          get_current_ai_provider_func, audio_utils_module)
         except Exception as e:
+            if app_state.check_duplicates and "duplicate" in str(e).lower():
+                # Карточка появилась в Anki уже после планирования
+                job_store.update_item(job_id, index, ITEM_SKIPPED)
+                q.put(("batch_log_append", "⚠️ Дубликат (пропущено)"))
+                continue
+            job_store.update_item(job_id, index, ITEM_FAILED, error=str(e))
             q.put(("batch_log_append", f"❌ Ошибка: {str(e)}"))
-            
-        # Пауза 3 секунды между фразами
-        if i < total - 1 and app_state.batch_running:
-            # q.put(("batch_log", "⏳ Ожидание 3 сек..."))
-            for _ in range(30): 
-                if not app_state.batch_running: break
-                # Если во время ожидания нажали паузу - заходим в цикл ожидания паузы
-                if app_state.batch_paused:
-                    while app_state.batch_paused:
-                        time.sleep(0.2)
-                        if not app_state.batch_running: break
-                time.sleep(0.1)
                 
+    if job_store.finish(job_id) == JOB_STOPPED:
+        progress = job_store.progress(job_id)
+        failed = progress.get(ITEM_FAILED, 0)
+        q.put(("batch_log", f"💾 Задание {job_id} сохранено (ошибок: {failed}). Его можно продолжить."))
+    
     app_state.batch_running = False
     app_state.batch_paused = False
     q.put(("batch_done", True))
+
+
+def _process_item(q, job_id, item, deck_name, audio_enabled, context_enabled,
+                  get_current_ai_provider_func, audio_utils_module):
+    """
+    Обрабатывает одну фразу задания, сохраняя состояние после каждого шага.
+    Уже выполненные шаги (перевод, озвучка) повторно не выполняются.
+    """
+    phrase = item["phrase"]
+    index = item["idx"]
+    translation, context = item["translation"], item["context"]
+    audio_path = item["audio_path"]
+    model_used = ""
+    generation_seconds = audio_seconds = None
+    
+    if translation is None:
+        # 1. Генерация через AI (дубликаты отсеяны планировщиком)
+        q.put(("batch_log_append", "🤖"))
+        provider = get_current_ai_provider_func()
+        
+        # Определяем модель в зависимости от провайдера
+        if provider.name == "Ollama":
+            model = app_state.ollama_model
+        elif provider.name == "OpenRouter":
+            model = app_state.openrouter_model
+        else:
+            model = None  # Провайдер сам определит модель
+        
+        start = time.time()
+        translation, context = generate_translation(provider, phrase, context_enabled, model)
+        generation_seconds = time.time() - start
+        model_used = model_label(provider, model)
+        job_store.update_item(job_id, index, ITEM_GENERATED, translation=translation, context=context)
+    
+    # 2. Озвучка
+    if audio_enabled and not (audio_path and os.path.exists(audio_path)):
+        q.put(("batch_log_append", "🔊"))
+        start = time.time()
+        audio_path = audio_utils_module.generate_audio(
+            phrase, 
+            app_state.tts.lang, 
+            app_state.tts.speed_level, 
+            app_state.tts.tld
+        )
+        audio_seconds = time.time() - start
+        job_store.update_item(job_id, index, ITEM_AUDIO, audio_path=audio_path)
+    
+    # 3. Добавление в Anki
+    q.put(("batch_log_append", "📇"))
+    audio_hash = file_hash(audio_path)
+    status, ref = anki_outbox.submit(phrase, translation, context, deck_name, audio_path,
+                                     allow_duplicate=not app_state.check_duplicates)
+    job_store.update_item(job_id, index, ITEM_QUEUED if status == "queued" else ITEM_ADDED, note_id=ref)
+    history_store.record(
+        phrase, translation, context, deck_name,
+        note_id=ref if status == "added" else None, status=status,
+        model=model_used, preset=app_state.prompt_preset, audio_hash=audio_hash,
+        generation_seconds=generation_seconds, audio_seconds=audio_seconds, source="batch"
+    )
+    
+    # Очистка аудио (отложенная карточка хранит свою копию)
+    if audio_path and os.path.exists(audio_path):
+        try:
+            os.remove(audio_path)
+        except OSError:
+            pass
+        
+    if status == "queued":
+        q.put(("batch_log_append", "📥 В очереди (Anki недоступен)"))
+    else:
+        q.put(("batch_log_append", "✅ Готово"))
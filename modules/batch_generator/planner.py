@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Предварительное планирование пакета (до генерации).
+Фразы нормализуются (регистр, пробелы, пунктуация), повторы внутри
+пакета схлопываются, а фразы, уже существующие в коллекции, находятся
+пачками: один findNotes с OR на порцию фраз вместо запроса на каждую.
+Если загружен локальный индекс дубликатов, проверка идет по нему
+(с учетом порога похожести DUPLICATE_SIMILARITY), без AnkiConnect.
+С SEMANTIC_DEDUPE оставшиеся фразы порции дополнительно сравниваются
+с заметками по смыслу (эмбеддинги порции считаются одним запросом).
+Время LLM и TTS тратится только на фразы, которые станут карточками.
+"""
+from typing import Iterable, Iterator, List, Set
+
+from api.anki_api import anki_api, is_connection_error
+from core.app_state import app_state
+from core.dedupe_index import duplicate_index
+from core.semantic_index import semantic_index
+from core.logger import debug_log
+from modules.batch_generator.segmenter import normalize_key
+
+
+LOOKUP_CHUNK = 50  # Фраз в одном OR-запросе findNotes
+
+
+class BatchPlan:
+    """
+    План пакета. Итерация по плану отдает только новые фразы; счетчики
+    заполняются по мере чтения (источник может быть генератором).
+    """
+
+    def __init__(self, phrases: Iterable[str], check_collection: bool = True,
+                 chunk_size: int = LOOKUP_CHUNK):
+        self._phrases = phrases
+        self.check_collection = check_collection
+        self.chunk_size = chunk_size
+        self.new = 0
+        self.batch_duplicates = 0    # Повторы внутри пакета
+        self.existing = 0            # Уже есть в Anki
+        self.similar = 0             # Совпадают с заметками по смыслу
+        self.collection_error = None  # Anki недоступен: проверка по коллекции пропущена
+        self.semantic_error = None    # Эмбеддинги недоступны: смысловая проверка пропущена
+
+    def _existing_keys(self, phrases: List[str]) -> Set[str]:
+        """Нормализованные ключи фраз порции, которые уже есть в коллекции"""
+        note_ids = anki_api.find_notes_by_phrases(phrases)
+        if not note_ids:
+            return set()
+        notes = anki_api.notes_info(note_ids)
+        return {normalize_key(anki_api.note_field(note, "Phrase")) for note in notes}
+
+    def _collection_unavailable(self, error: Exception):
+        """Anki недоступен: дальше пакет идет без проверки по коллекции"""
+        self.collection_error = str(error)
+        debug_log(f"⚠️ Планировщик: проверка по коллекции недоступна ({error})")
+
+    def _check_one_by_one(self, chunk: List[str]) -> List[str]:
+        """Проверка порции отдельными запросами: ошибка одной фразы не снимает проверку с остальных"""
+        kept = []
+        for phrase in chunk:
+            if self.collection_error:
+                kept.append(phrase)
+                continue
+            try:
+                if normalize_key(phrase) not in self._existing_keys([phrase]):
+                    kept.append(phrase)
+            except Exception as e:
+                if is_connection_error(e):
+                    self._collection_unavailable(e)
+                else:
+                    debug_log(f"⚠️ Планировщик: '{phrase[:40]}' не проверена по коллекции ({e})")
+                kept.append(phrase)
+        return kept
+
+    def _flush(self, chunk: List[str]) -> List[str]:
+        """Отбрасывает фразы порции, найденные в коллекции"""
+        if not chunk or not self.check_collection:
+            return chunk
+        if duplicate_index.ready:
+            threshold = app_state.duplicate_similarity / 100
+            kept = [phrase for phrase in chunk if not duplicate_index.lookup(phrase, threshold)]
+        elif self.collection_error:
+            kept = chunk
+        else:
+            try:
+                existing = self._existing_keys(chunk)
+                kept = [phrase for phrase in chunk if normalize_key(phrase) not in existing]
+            except Exception as e:
+                if is_connection_error(e):
+                    self._collection_unavailable(e)
+                    kept = chunk
+                else:
+                    debug_log(f"⚠️ Планировщик: общий запрос порции не удался ({e}), проверка по одной фразе")
+                    kept = self._check_one_by_one(chunk)
+        self.existing += len(chunk) - len(kept)
+        return self._drop_similar(kept)
+
+    def _drop_similar(self, chunk: List[str]) -> List[str]:
+        """Отбрасывает фразы, совпадающие с заметками по смыслу"""
+        if not chunk or not app_state.semantic_dedupe or not semantic_index.ready or self.semantic_error:
+            return chunk
+        try:
+            matches = semantic_index.find_duplicates(chunk, app_state.semantic_similarity / 100)
+        except Exception as e:
+            self.semantic_error = str(e)
+            debug_log(f"⚠️ Планировщик: смысловая проверка недоступна ({e})")
+            return chunk
+        kept = []
+        for phrase, match in zip(chunk, matches):
+            if match is None:
+                kept.append(phrase)
+            else:
+                debug_log(f"🧠 '{phrase[:40]}' ~ заметка {match[0]} ({match[1]:.2f})")
+        self.similar += len(chunk) - len(kept)
+        return kept
+
+    def __iter__(self) -> Iterator[str]:
+        seen: Set[str] = set()
+        chunk: List[str] = []
+        for phrase in self._phrases:
+            phrase = " ".join(phrase.split())
+            if not phrase:
+                continue
+            key = normalize_key(phrase)
+            if not key or key in seen:
+                self.batch_duplicates += 1
+                continue
+            seen.add(key)
+            chunk.append(phrase)
+            if len(chunk) >= self.chunk_size:
+                for kept in self._flush(chunk):
+                    self.new += 1
+                    yield kept
+                chunk = []
+        for kept in self._flush(chunk):
+            self.new += 1
+            yield kept
+
+    @property
+    def skipped(self) -> int:
+        return self.batch_duplicates + self.existing + self.similar
+
+    def summary(self) -> str:
+        """Строка для журнала: 'N новых, M пропущено (...)'"""
+        text = (f"📋 План: {self.new} новых, {self.skipped} пропущено "
+                f"(повторы в пакете: {self.batch_duplicates}, уже в Anki: {self.existing}")
+        if self.similar:
+            text += f", похожи по смыслу: {self.similar}"
+        text += ")"
+        if self.collection_error:
+            text += " ⚠️ Anki недоступен, проверка по коллекции пропущена"
+        if self.semantic_error:
+            text += " ⚠️ Эмбеддинги недоступны, смысловая проверка пропущена"
+        return text
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная разбивка текста на предложения (без ИИ).
+Правила настроены на немецкий: сокращения (z.B., usw., Dr.), порядковые
+числительные (am 3. Oktober), кавычки („...“, »...«), многоточия.
+Убирает таймкоды, номера реплик, теги и имена говорящих, удаляет
+повторы и слишком короткие/длинные фрагменты.
+
+Фрагменты, которые правила не могут надежно разобрать (очень длинные,
+без знаков конца предложения, спорная точка после числа), помечаются
+как неоднозначные - только их имеет смысл отправлять ИИ.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Set
+
+# Ключ для поиска повторов: регистр, пунктуация, пробелы и HTML не важны
+from core.dedupe_index import normalize_phrase as normalize_key
+
+
+# Сокращения, после которых точка не заканчивает предложение (в нижнем регистре, без точки)
+ABBREVIATIONS = frozenset({
+    "z.b", "u.a", "d.h", "u.ä", "o.ä", "s.o", "s.u", "v.a", "z.t", "u.u", "i.d.r", "z.zt",
+    "usw", "bzw", "etc", "evtl", "ggf", "inkl", "exkl", "bspw", "sog", "vgl", "ca", "ebd",
+    "dr", "prof", "hr", "fr", "frl", "nr", "str", "st", "jh", "jhd", "mio", "mrd", "abs",
+    "tel", "min", "max", "std", "sek", "kap", "bd", "hrsg", "zzgl", "abb", "anm", "allg",
+    "bzgl", "einschl", "gegr", "geb", "gest", "jr", "sen", "dipl", "ing", "mag", "rd",
+    "s", "f", "ff", "vs", "mr", "mrs", "ms", "no", "co", "ltd", "gmbh",
+})
+
+MONTHS = frozenset({
+    "januar", "jänner", "februar", "märz", "april", "mai", "juni", "juli", "august",
+    "september", "oktober", "november", "dezember",
+})
+
+# Очистка строк (субтитры, расшифровки)
+_TIMESTAMP_RE = re.compile(
+    r"(\d{1,2}:)?\d{1,2}:\d{2}([.,]\d{1,3})?\s*-->\s*(\d{1,2}:)?\d{1,2}:\d{2}([.,]\d{1,3})?[^\n]*"
+    r"|[\[(]\s*(\d{1,2}:)?\d{1,2}:\d{2}([.,]\d{1,3})?\s*[\])]"
+    r"|^\s*(\d{1,2}:)?\d{1,2}:\d{2}([.,]\d{1,3})?\s+"
+)
+_CUE_NUMBER_RE = re.compile(r"^\s*\d+\s*$")
+_TAG_RE = re.compile(r"<[^>]+>|\{\\[^}]*\}")
+_SOUND_RE = re.compile(r"\[[^\]]*\]|\([A-ZÄÖÜ\s]+\)|♪+")
+_SPEAKER_RE = re.compile(
+    r"^\s*(?:-|–|—|>>|(?:Sprecher(?:in)?|Speaker)\s*\d*:|[A-ZÄÖÜ][A-ZÄÖÜ\d .\-]{1,30}:(?=\s))\s*")
+_SUBTITLE_MARK_RE = re.compile(r"-->|^WEBVTT|^\s*\[?\d{1,2}:\d{2}", re.MULTILINE)
+_SPACES_RE = re.compile(r"[ \t ]+")
+
+# Кандидаты на границу предложения: знак конца + (закрывающая кавычка) + пробел
+_BOUNDARY_RE = re.compile(r"(\.\.\.|…|[.!?]+)([\"'“”»«)]*)\s+")
+_WORD_BEFORE_RE = re.compile(r"([\wÄÖÜäöüß.]+)$")
+_TERMINAL_RE = re.compile(r"[.!?…][\"'“”»«)]*$")
+
+
+@dataclass
+class SegmentResult:
+    """Результат разбивки: предложения и индексы неоднозначных"""
+    sentences: List[str] = field(default_factory=list)
+    ambiguous: Set[int] = field(default_factory=set)
+    duplicates: int = 0
+    filtered: int = 0
+
+
+def clean_line(line: str) -> str:
+    """Убирает из строки таймкоды, теги, звуковые пометки и имя говорящего"""
+    if _CUE_NUMBER_RE.match(line):
+        return ""
+    line = _TAG_RE.sub("", line)
+    line = _TIMESTAMP_RE.sub(" ", line)
+    line = _SOUND_RE.sub(" ", line)
+    line = _SPEAKER_RE.sub("", line)
+    return _SPACES_RE.sub(" ", line).strip()
+
+
+def _is_boundary(text: str, start: int, punct: str, end: int):
+    """
+    Решает, является ли найденная пунктуация концом предложения.
+
+    Returns:
+        True / False, или None если случай спорный
+    """
+    next_char = text[end] if end < len(text) else ""
+    if not next_char:
+        return True
+    if next_char.islower():
+        return False  # "z.B. so", "... und dann"
+    if punct[0] in "!?" or punct in ("...", "…"):
+        return True
+
+    word = _WORD_BEFORE_RE.search(text, max(0, start - 40), start)
+    if not word:
+        return True
+    token = word.group(1)
+    bare = token.rstrip(".").casefold()
+    if bare in ABBREVIATIONS or "." in token.strip("."):
+        return False  # сокращение: "Dr.", "u.a.", "z.B."
+    if len(bare) == 1 and bare.isalpha() and token[0].isupper():
+        return False  # инициал: "A. Merkel"
+    if bare.isdigit():
+        next_word = text[end:end + 12].split(" ", 1)[0].strip(",;:").casefold()
+        if next_word in MONTHS:
+            return False  # дата: "am 3. Oktober"
+        if len(bare) <= 2 or len(bare) == 4 and bare.startswith(("1", "2")):
+            return None  # "der 2. Weltkrieg" или "Er war 30. Dann..."
+    return True
+
+
+def split_sentences(text: str, ambiguous: Set[int] = None) -> List[str]:
+    """
+    Делит текст на предложения по правилам для немецкого.
+    Если передан ambiguous, в него добавляются индексы предложений
+    со спорной границей (граница при этом не ставится).
+    """
+    sentences = []
+    start = 0
+    doubtful = False
+    for match in _BOUNDARY_RE.finditer(text):
+        decision = _is_boundary(text, match.start(), match.group(1), match.end())
+        if decision is None:
+            doubtful = True
+            continue
+        if not decision:
+            continue
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            if doubtful and ambiguous is not None:
+                ambiguous.add(len(sentences))
+            sentences.append(sentence)
+        start = match.end()
+        doubtful = False
+    tail = text[start:].strip()
+    if tail:
+        if doubtful and ambiguous is not None:
+            ambiguous.add(len(sentences))
+        sentences.append(tail)
+    return sentences
+
+
+def _blocks(lines: Iterable[str], join_lines: bool) -> Iterator[str]:
+    """
+    Склеивает строки в блоки для разбивки на предложения.
+    В субтитрах (join_lines) строки склеиваются всегда, пустые строки
+    между репликами не граница (предложение часто идет через несколько
+    реплик). В обычном тексте пустая строка - граница, строки склеиваются
+    только если строка явно продолжается на следующей (следующая
+    начинается со строчной буквы).
+    """
+    buffer = []
+    for raw in lines:
+        if not raw.strip():
+            if join_lines:
+                continue
+            if buffer:
+                yield " ".join(buffer)
+                buffer = []
+            continue
+        line = clean_line(raw)
+        if not line or (buffer and line == buffer[-1]):
+            continue  # повтор строки (авто-субтитры)
+        if buffer and not join_lines and not line[0].islower():
+            yield " ".join(buffer)
+            buffer = []
+        buffer.append(line)
+    if buffer:
+        yield " ".join(buffer)
+
+
+def segment_text(text: str, min_words: int = 1, max_chars: int = 300,
+                 dedupe: bool = True, one_per_line: bool = False) -> SegmentResult:
+    """
+    Полная обработка текста: очистка, разбивка, удаление повторов, фильтр длины.
+
+    Args:
+        text: Исходный текст (вставка, расшифровка, субтитры)
+        min_words: Минимум слов во фразе
+        max_chars: Длиннее - фраза помечается неоднозначной
+        dedupe: Удалять повторы (без учета регистра и пунктуации)
+        one_per_line: Каждая строка - отдельная фраза (список), без склейки
+    
+    Строки субтитров (есть таймкоды) склеиваются в предложения.
+    """
+    result = SegmentResult()
+    seen = set()
+    lines = text.splitlines()
+    if one_per_line:
+        blocks = (clean_line(line) for line in lines)
+    else:
+        blocks = _blocks(lines, join_lines=bool(_SUBTITLE_MARK_RE.search(text)))
+
+    for block in blocks:
+        if not block:
+            continue
+        block_ambiguous: Set[int] = set()
+        sentences = [block] if one_per_line else split_sentences(block, block_ambiguous)
+        for i, sentence in enumerate(sentences):
+            if len(sentence.split()) < min_words:
+                result.filtered += 1
+                continue
+            if dedupe:
+                key = normalize_key(sentence)
+                if key in seen:
+                    result.duplicates += 1
+                    continue
+                seen.add(key)
+            if (i in block_ambiguous or len(sentence) > max_chars
+                    or (not _TERMINAL_RE.search(sentence) and len(sentence.split()) > 12)):
+                result.ambiguous.add(len(result.sentences))
+            result.sentences.append(sentence)
+    return result
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Источники фраз для пакетной обработки.
+Файлы читаются потоково (построчно), без загрузки в текстовое поле:
+- TXT: одна фраза на строку
+- CSV/TSV: фраза из выбранной колонки
+- SRT/VTT: субтитры без номеров, таймкодов и разметки, строки
+  склеиваются в предложения
+"""
+import csv
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional, Union
+
+from modules.batch_generator.segmenter import clean_line, split_sentences
+
+
+SUPPORTED_EXTENSIONS = (".txt", ".csv", ".tsv", ".srt", ".vtt")
+
+# Субтитры без знаков препинания: предложение принудительно обрывается
+MAX_SENTENCE_CHARS = 300
+
+
+def _open_text(path: str):
+    """Открывает текстовый файл (UTF-8 с BOM или без, иначе cp1252)"""
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            f.read(4096)
+        return open(path, "r", encoding="utf-8-sig", newline="")
+    except UnicodeDecodeError:
+        return open(path, "r", encoding="cp1252", newline="")
+
+
+class BatchSource(ABC):
+    """Базовый источник: итерация по фразам + описание для сохранения в задании"""
+
+    kind = "base"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        """Фразы источника по одной"""
+        pass
+
+    def count(self) -> int:
+        """Количество фраз (отдельный проход по файлу)"""
+        return sum(1 for _ in self)
+
+    def describe(self) -> Dict:
+        """Описание источника (хранится в задании, позволяет открыть его снова)"""
+        return {"kind": self.kind, "path": self.path}
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+class TextFileSource(BatchSource):
+    """Текстовый файл: одна фраза на строку"""
+
+    kind = "txt"
+
+    def __iter__(self) -> Iterator[str]:
+        with _open_text(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+class CsvFileSource(BatchSource):
+    """
+    CSV/TSV файл: фраза берется из колонки column (имя из заголовка или
+    номер с 0). Разделитель определяется автоматически.
+    """
+
+    kind = "csv"
+
+    def __init__(self, path: str, column: Union[int, str] = 0, has_header: Optional[bool] = None):
+        super().__init__(path)
+        self.column = column
+        self.has_header = has_header
+
+    def _dialect(self, sample: str):
+        try:
+            return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            return csv.excel_tab if self.path.lower().endswith(".tsv") else csv.excel
+
+    def header(self):
+        """Первая строка файла (имена колонок)"""
+        with _open_text(self.path) as f:
+            sample = f.read(4096)
+            f.seek(0)
+            return next(csv.reader(f, self._dialect(sample)), [])
+
+    def __iter__(self) -> Iterator[str]:
+        with _open_text(self.path) as f:
+            sample = f.read(4096)
+            f.seek(0)
+            reader = csv.reader(f, self._dialect(sample))
+            has_header = self.has_header
+            if has_header is None:
+                try:
+                    has_header = csv.Sniffer().has_header(sample)
+                except csv.Error:
+                    has_header = False
+                has_header = has_header or isinstance(self.column, str)
+
+            index = self.column if isinstance(self.column, int) else 0
+            if has_header:
+                header = next(reader, [])
+                if isinstance(self.column, str):
+                    names = [name.strip().lower() for name in header]
+                    if self.column.strip().lower() not in names:
+                        raise ValueError(f"Колонка '{self.column}' не найдена: {', '.join(header)}")
+                    index = names.index(self.column.strip().lower())
+
+            for row in reader:
+                if index < len(row):
+                    value = row[index].strip()
+                    if value:
+                        yield value
+
+    def describe(self) -> Dict:
+        return {"kind": self.kind, "path": self.path, "column": self.column, "has_header": self.has_header}
+
+
+class SubtitleFileSource(BatchSource):
+    """
+    Субтитры SRT/VTT: номера реплик, таймкоды, заголовки VTT, теги
+    (<i>, <c.color>, {\\an8}) и звуковые пометки ([Musik]) удаляются,
+    текст реплик склеивается и режется на предложения (segmenter).
+    Повторы соседних строк (авто-субтитры YouTube) отбрасываются.
+    """
+
+    kind = "subtitles"
+
+    def _lines(self) -> Iterator[str]:
+        """Чистые строки текста реплик"""
+        skip_block = False
+        previous = None
+        with _open_text(self.path) as f:
+            for raw in f:
+                line = raw.strip()
+                if not line:
+                    skip_block = False
+                    continue
+                if skip_block:
+                    continue
+                if line.startswith("WEBVTT") or line.startswith(("NOTE", "STYLE", "REGION")):
+                    skip_block = True
+                    continue
+                line = clean_line(line)
+                if not line or line == previous:
+                    continue
+                previous = line
+                yield line
+
+    def __iter__(self) -> Iterator[str]:
+        buffer = ""
+        for line in self._lines():
+            buffer = f"{buffer} {line}".strip() if buffer else line
+            parts = split_sentences(buffer)
+            # Последний кусок может быть незаконченным предложением - ждем продолжения
+            for sentence in parts[:-1]:
+                sentence = sentence.strip()
+                if sentence:
+                    yield sentence
+            buffer = parts[-1]
+            if len(buffer) > MAX_SENTENCE_CHARS:
+                yield buffer.strip()
+                buffer = ""
+        if buffer.strip():
+            yield buffer.strip()
+
+
+def open_source(path: str, **options) -> BatchSource:
+    """Создает источник по расширению файла"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".srt", ".vtt"):
+        return SubtitleFileSource(path)
+    if ext in (".csv", ".tsv"):
+        return CsvFileSource(path, **options)
+    return TextFileSource(path)
+
+
+def source_from_descriptor(descriptor: Dict) -> BatchSource:
+    """Восстанавливает источник из описания, сохраненного в задании"""
+    options = {key: value for key, value in descriptor.items() if key not in ("kind", "path")}
+    return open_source(descriptor["path"], **options)
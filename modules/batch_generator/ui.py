@@ -3,19 +3,28 @@ import customtkinter as ctk
 import tkinter as tk
 import os
 import threading
+import time
 from core.clipboard_manager import setup_text_widget_context_menu
 
+# Режимы подготовки текста: ключ настройки -> подпись
+CLEAN_MODES = {
+    "local": "✂️ Локально",
+    "hybrid": "✂️ + 🤖 ИИ",
+    "ai": "🤖 ИИ",
+}
+
 class BatchSidebarPanel(ctk.CTkFrame):
-    def __init__(self, parent, start_callback, stop_callback):
+    def __init__(self, parent, start_callback, stop_callback, resume_callback=None):
         # Инициализируем как полноценный фрейм (не прозрачный), чтобы он выглядел как левая панель
         super().__init__(parent)
         self.parent = parent
+        self.resume_callback = resume_callback
         
         # 1. Заголовок с кнопками очистки текста
         header_frame = ctk.CTkFrame(self, fg_color="transparent")
         header_frame.pack(fill="x", pady=0, padx=5)
         
-        # Кнопка очистки текста через ИИ
+        # Кнопка подготовки текста (локальная разбивка и/или ИИ)
         self.clean_btn = ctk.CTkButton(
             header_frame, 
             text="🧹 Подготовить текст",
@@ -23,10 +32,24 @@ class BatchSidebarPanel(ctk.CTkFrame):
             width=130,
             fg_color="#6366F1", 
             hover_color="#4F46E5",
-            command=self._clean_text_with_ai
+            command=self._prepare_text
         )
         self.clean_btn.pack(side="left", padx=(0, 5))
         
+        # Режим подготовки текста
+        from core.settings_manager import load_settings
+        saved_mode = load_settings(update_app_state=False).get("BATCH_CLEAN_MODE", "local")
+        self.clean_mode_var = tk.StringVar(value=CLEAN_MODES.get(saved_mode, CLEAN_MODES["local"]))
+        self.clean_mode_menu = ctk.CTkOptionMenu(
+            header_frame,
+            values=list(CLEAN_MODES.values()),
+            variable=self.clean_mode_var,
+            width=110,
+            height=30,
+            command=self._save_clean_mode
+        )
+        self.clean_mode_menu.pack(side="left", padx=(0, 5))
+        
         # Кнопка редактирования промпта
         self.edit_prompt_btn = ctk.CTkButton(
             header_frame, 
@@ -38,6 +61,20 @@ class BatchSidebarPanel(ctk.CTkFrame):
             command=self._edit_clean_prompt
         )
         self.edit_prompt_btn.pack(side="left")
+        
+        # Кнопка загрузки файла (TXT/CSV/SRT/VTT) без вставки в поле ввода
+        self.file_btn = ctk.CTkButton(
+            header_frame, 
+            text="📂",
+            height=30,
+            width=40,
+            fg_color="#0EA5E9", 
+            hover_color="#0284C7",
+            command=self._choose_file_source
+        )
+        self.file_btn.pack(side="left", padx=(5, 0))
+        self.file_source = None
+        self._clean_cancel = None  # threading.Event, пока идет очистка через ИИ
 
         # Кнопка Собиратель
         def toggle_collector_mode():
@@ -93,6 +130,16 @@ class BatchSidebarPanel(ctk.CTkFrame):
                 text_color="white"
             )
         
+        # Выбранный файл-источник
+        self.source_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.source_label = ctk.CTkLabel(self.source_frame, text="", font=("Roboto", 12), anchor="w")
+        self.source_label.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(
+            self.source_frame, text="✕", width=30, height=24,
+            fg_color="transparent", hover_color="#DC2626", border_width=1,
+            command=self._clear_file_source
+        ).pack(side="right")
+        
         # 2. Поле ввода
         self.placeholder_text = "Вставьте список фраз (каждая с новой строки) или включите 'Собиратель'..."
         self.batch_input = ctk.CTkTextbox(self, height=220, font=("Roboto", 14), text_color="gray")
@@ -126,18 +173,16 @@ class BatchSidebarPanel(ctk.CTkFrame):
             
             if self.button_state == "start":
                 # Запуск обработки
+                if self.file_source is not None:
+                    self.set_running_state()
+                    start_callback(self.file_source)
+                    return
+                
                 text = self.batch_input.get("1.0", "end-1c")
                 if not text.strip() or text.strip() == self.placeholder_text:
                     return
                 
-                self.button_state = "pause"
-                self.start_btn.configure(
-                    text="⏸ Пауза",
-                    fg_color="#F59E0B",
-                    hover_color="#D97706"
-                )
-                self.stop_btn.configure(state="normal")
-                app_state.batch_paused = False
+                self.set_running_state()
                 start_callback(text)
                 
             elif self.button_state == "pause":
@@ -198,6 +243,28 @@ class BatchSidebarPanel(ctk.CTkFrame):
             command=on_stop_click
         )
         self.stop_btn.pack(side="left")
+        
+        self.resume_btn = ctk.CTkButton(
+            controls_frame, 
+            text="♻️", 
+            width=45,
+            height=45,
+            fg_color="#6366F1", 
+            hover_color="#4F46E5",
+            command=self._open_resume_dialog
+        )
+        self.resume_btn.pack(side="left", padx=(10, 0))
+        
+        self.maintenance_btn = ctk.CTkButton(
+            controls_frame, 
+            text="🛠", 
+            width=45,
+            height=45,
+            fg_color="#6B7280", 
+            hover_color="#4B5563",
+            command=self._open_maintenance_dialog
+        )
+        self.maintenance_btn.pack(side="left", padx=(10, 0))
 
         # 4. Прогресс
         progress_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -224,6 +291,129 @@ class BatchSidebarPanel(ctk.CTkFrame):
             "batch_log": self.batch_log
         })
         
+    def _choose_file_source(self):
+        """Выбор файла с фразами: файл читается потоково при запуске"""
+        from tkinter import filedialog, simpledialog, messagebox
+        from modules.batch_generator.sources import open_source, CsvFileSource
+        
+        path = filedialog.askopenfilename(
+            parent=self,
+            title="Файл с фразами",
+            filetypes=[
+                ("Фразы и субтитры", "*.txt *.csv *.tsv *.srt *.vtt"),
+                ("Все файлы", "*.*"),
+            ]
+        )
+        if not path:
+            return
+        
+        try:
+            source = open_source(path)
+            if isinstance(source, CsvFileSource):
+                header = source.header()
+                column = simpledialog.askstring(
+                    "Колонка CSV",
+                    f"Колонки: {', '.join(header)}\nИмя или номер колонки с фразами (с 0):",
+                    initialvalue="0", parent=self
+                )
+                if column is None:
+                    return
+                column = column.strip()
+                source = open_source(path, column=int(column) if column.isdigit() else column)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось открыть файл:\n{e}", parent=self)
+            return
+        
+        self.file_source = source
+        self.source_label.configure(text=f"📄 {source.name}: подсчет...")
+        self.source_frame.pack(fill="x", padx=5, pady=(5, 0), before=self.batch_input)
+        
+        def count_worker():
+            try:
+                text = f"📄 {source.name}: {source.count()} фраз"
+            except Exception as e:
+                text = f"📄 {source.name}: ❌ {e}"
+            
+            def update_label():
+                if self.file_source is source:
+                    self.source_label.configure(text=text)
+            
+            self.after(0, update_label)
+        
+        threading.Thread(target=count_worker, daemon=True).start()
+
+    def _clear_file_source(self):
+        """Возвращает ввод фраз из текстового поля"""
+        self.file_source = None
+        self.source_frame.pack_forget()
+
+    def set_running_state(self):
+        """Переводит кнопки в состояние выполнения"""
+        from core.app_state import app_state
+        self.button_state = "pause"
+        self.start_btn.configure(
+            text="⏸ Пауза",
+            fg_color="#F59E0B",
+            hover_color="#D97706"
+        )
+        self.stop_btn.configure(state="normal")
+        app_state.batch_paused = False
+
+    def _open_resume_dialog(self):
+        """Показывает незавершенные задания и продолжает выбранное"""
+        from tkinter import messagebox
+        from core.app_state import app_state
+        from modules.batch_generator.jobs import job_store, ITEM_FAILED, DONE_STATES
+        
+        if app_state.batch_running or not self.resume_callback:
+            return
+        
+        jobs = job_store.unfinished_jobs()
+        if not jobs:
+            messagebox.showinfo("Задания", "Нет незавершенных заданий.", parent=self)
+            return
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Продолжить задание")
+        dialog.geometry("520x360")
+        dialog.transient(self)
+        dialog.grab_set()
+        dialog.focus_force()
+        
+        ctk.CTkLabel(dialog, text="Незавершенные задания:", font=("Roboto", 14, "bold")).pack(pady=(15, 5), padx=15, anchor="w")
+        jobs_frame = ctk.CTkScrollableFrame(dialog)
+        jobs_frame.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+        
+        def resume(job_id):
+            dialog.destroy()
+            self.set_running_state()
+            self.resume_callback(job_id)
+        
+        for job in jobs:
+            progress = job["progress"]
+            done = sum(count for state, count in progress.items() if state in DONE_STATES)
+            failed = progress.get(ITEM_FAILED, 0)
+            created = time.strftime("%d.%m %H:%M", time.localtime(job["created"]))
+            source = f"  📄 {os.path.basename(job['source']['path'])}" if job["source"] else ""
+            
+            row = ctk.CTkFrame(jobs_frame, fg_color="transparent")
+            row.pack(fill="x", pady=3)
+            ctk.CTkLabel(
+                row, 
+                text=f"{created}  {job['deck']}{source}\n✅ {done}/{job['total']}   ❌ {failed}",
+                justify="left", anchor="w"
+            ).pack(side="left", fill="x", expand=True)
+            ctk.CTkButton(
+                row, text="▶", width=40, 
+                fg_color="#10B981", hover_color="#059669",
+                command=lambda job_id=job["id"]: resume(job_id)
+            ).pack(side="right")
+
+    def _open_maintenance_dialog(self):
+        """Обслуживание коллекции: озвучка заметок без звука и т.п."""
+        from modules.maintenance.ui import open_maintenance_dialog
+        open_maintenance_dialog(self)
+
     def reset_state(self):
         """Сбрасывает состояние кнопок к исходному"""
         self.button_state = "start"
@@ -326,77 +516,164 @@ class BatchSidebarPanel(ctk.CTkFrame):
             hover_color="#D63C3C"
         ).pack(side="right", padx=10, expand=True)
     
-    def _clean_text_with_ai(self):
-        """Отправляет текст ИИ для очистки"""
-        import os
-        import threading
+    def _save_clean_mode(self, label):
+        """Сохраняет выбранный режим подготовки текста"""
+        from core.settings_manager import load_settings, save_settings
+        settings = load_settings(update_app_state=False)
+        settings["BATCH_CLEAN_MODE"] = self._clean_mode()
+        save_settings(settings)
+
+    def _clean_mode(self):
+        """Ключ режима подготовки: local / hybrid / ai"""
+        label = self.clean_mode_var.get()
+        for key, value in CLEAN_MODES.items():
+            if value == label:
+                return key
+        return "local"
+
+    def _log(self, text):
+        """Добавляет строку в журнал панели (только из UI потока)"""
+        self.batch_log.configure(state="normal")
+        self.batch_log.insert("end", text + "\n")
+        self.batch_log.see("end")
+        self.batch_log.configure(state="disabled")
+
+    def _set_input_text(self, text):
+        self.batch_input.delete("1.0", "end")
+        self.batch_input.configure(text_color=("gray10", "gray90"))
+        self.batch_input.insert("1.0", text)
+
+    def _prepare_text(self):
+        """
+        Подготовка текста к пакетной обработке.
+        local - локальная разбивка на предложения (мгновенно);
+        hybrid - локальная разбивка + ИИ только для неоднозначных фрагментов;
+        ai - весь текст через ИИ.
+        """
         from tkinter import messagebox
+        from modules.batch_generator.segmenter import segment_text
         
-        # Получаем текст из поля ввода
-        dirty_text = self.batch_input.get("1.0", "end-1c").strip()
+        # Повторное нажатие во время очистки - отмена
+        if self._clean_cancel is not None:
+            self._clean_cancel.set()
+            self.clean_btn.configure(state="disabled")
+            return
         
-        if not dirty_text:
+        dirty_text = self.batch_input.get("1.0", "end-1c").strip()
+        if not dirty_text or dirty_text == self.placeholder_text:
             messagebox.showwarning("Пусто", "Вставьте текст для очистки!", parent=self)
             return
         
-        # Загружаем промпт
+        mode = self._clean_mode()
+        if mode == "ai":
+            self._clean_text_with_ai(dirty_text)
+            return
+        
+        result = segment_text(dirty_text)
+        self._set_input_text("\n".join(result.sentences))
+        self._log(f"✂️ Фраз: {len(result.sentences)} (повторов удалено: {result.duplicates}, "
+                  f"неоднозначных: {len(result.ambiguous)})")
+        
+        if mode == "hybrid" and result.ambiguous:
+            self._refine_with_ai(result.sentences, result.ambiguous)
+
+    def _get_cleaning_provider(self):
+        """AI провайдер и модель для очистки текста"""
+        from core.workers import get_current_ai_provider
+        from core.app_state import app_state
+        ai_provider = get_current_ai_provider()
+        
+        # Получаем текущую модель в зависимости от провайдера
+        current_model = None
+        if app_state.ai_provider == "ollama":
+            current_model = app_state.ollama_model
+        elif app_state.ai_provider == "openrouter":
+            current_model = app_state.openrouter_model
+        return ai_provider, current_model
+
+    def _refine_with_ai(self, sentences, ambiguous):
+        """Отправляет ИИ только неоднозначные фрагменты и подставляет результат на их место"""
+        # Соседние неоднозначные предложения объединяются в один фрагмент
+        runs = []
+        for index in sorted(ambiguous):
+            if runs and runs[-1][-1] == index - 1:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+        
+        def work(cleaner, on_progress, cancel_event):
+            chunks = ["\n".join(sentences[i] for i in run) for run in runs]
+            cleaned = cleaner.clean_chunks(chunks, on_progress, cancel_event)
+            replacements = {run[0]: lines for run, lines in zip(runs, cleaned)}
+            skip = {i for run in runs for i in run}
+            result = []
+            for i, sentence in enumerate(sentences):
+                if i in replacements:
+                    result.extend(replacements[i])
+                elif i not in skip:
+                    result.append(sentence)
+            return result
+        
+        self._run_cleaner(work, "⏳ Уточнение...",
+                          lambda result: f"✅ ИИ уточнил фрагментов: {len(runs)}, итого фраз: {len(result)}")
+
+    def _clean_text_with_ai(self, dirty_text):
+        """Очищает весь текст через ИИ: параллельно, фрагментами по абзацам"""
+        def work(cleaner, on_progress, cancel_event):
+            return cleaner.clean(dirty_text, on_progress, cancel_event)
+        
+        self._run_cleaner(work, "⏳ Очистка...", lambda result: f"✅ Текст очищен ({len(result)} фраз)")
+
+    def _run_cleaner(self, work, busy_text, done_message):
+        """
+        Выполняет очистку в фоне: прогресс пишется в журнал, повторное
+        нажатие кнопки отменяет очистку.
+        """
+        from tkinter import messagebox
+        from modules.batch_generator.cleaner import ChunkedCleaner, CleaningCancelled
+        
         clean_prompt = self._load_clean_prompt()
+        cancel_event = threading.Event()
+        self._clean_cancel = cancel_event
+        self.clean_btn.configure(text=busy_text + " ⏹")
         
-        # Формируем полный запрос для ИИ
-        full_request = f"{clean_prompt}\n\n{dirty_text}"
+        def finish():
+            self._clean_cancel = None
+            self.clean_btn.configure(state="normal", text="🧹 Подготовить текст")
         
-        # Блокируем кнопку
-        self.clean_btn.configure(state="disabled", text="⏳ Очистка...")
+        def on_progress(done, total):
+            self.after(0, lambda: self._log(f"🧹 Фрагмент {done}/{total}"))
         
         def worker():
             try:
-                # Получаем AI провайдер и текущую модель
-                from core.workers import get_current_ai_provider
-                from core.app_state import app_state
-                ai_provider = get_current_ai_provider()
-                
-                # Получаем текущую модель в зависимости от провайдера
-                current_model = None
-                if app_state.ai_provider == "ollama":
-                    current_model = app_state.ollama_model
-                elif app_state.ai_provider == "openrouter":
-                    current_model = app_state.openrouter_model
-                
-                # Отправляем запрос напрямую через generate()
-                cleaned_text = ai_provider.generate(full_request, model=current_model)
+                ai_provider, current_model = self._get_cleaning_provider()
+                cleaner = ChunkedCleaner(ai_provider, current_model, clean_prompt)
+                result = work(cleaner, on_progress, cancel_event)
                 
-                # Обновляем поле ввода с очищенным текстом
                 def update_ui():
-                    self.batch_input.delete("1.0", "end")
-                    self.batch_input.configure(text_color=("gray10", "gray90"))
-                    self.batch_input.insert("1.0", cleaned_text)
-                    self.clean_btn.configure(state="normal", text="🧹 Подготовить текст")
-                    
-                    # Добавляем запись в лог
-                    self.batch_log.configure(state="normal")
-                    self.batch_log.insert("end", f"✅ Текст очищен ({len(cleaned_text)} символов)\n")
-                    self.batch_log.see("end")
-                    self.batch_log.configure(state="disabled")
+                    finish()
+                    self._set_input_text("\n".join(result))
+                    self._log(done_message(result))
                 
                 self.after(0, update_ui)
+            except CleaningCancelled:
+                def show_cancelled():
+                    finish()
+                    self._log("⏹ Очистка отменена")
                 
+                self.after(0, show_cancelled)
             except Exception as e:
                 error_msg = str(e)
                 def show_error():
-                    self.clean_btn.configure(state="normal", text="🧹 Подготовить текст")
+                    finish()
                     messagebox.showerror("Ошибка", f"Не удалось очистить текст:\n{error_msg}", parent=self)
-                    
-                    # Добавляем ошибку в лог
-                    self.batch_log.configure(state="normal")
-                    self.batch_log.insert("end", f"❌ Ошибка очистки: {error_msg}\n")
-                    self.batch_log.see("end")
-                    self.batch_log.configure(state="disabled")
+                    self._log(f"❌ Ошибка очистки: {error_msg}")
                 
                 self.after(0, show_error)
         
         # Запускаем в отдельном потоке
         threading.Thread(target=worker, daemon=True).start()
 
-def create_batch_panel(parent, start_callback, stop_callback):
+def create_batch_panel(parent, start_callback, stop_callback, resume_callback=None):
     """Создает и возвращает панель пакетной обработки"""
-    return BatchSidebarPanel(parent, start_callback, stop_callback)
+    return BatchSidebarPanel(parent, start_callback, stop_callback, resume_callback)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Общие части заданий обслуживания: порции заметок, пауза/остановка через
+кнопки пакетной панели, контрольные точки и отчет о скорости.
+"""
+import time
+from typing import Dict, Iterable, Iterator, List
+
+from core.app_state import app_state
+from modules.maintenance.jobs import maintenance_store, ITEM_FAILED
+
+
+def chunks(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Разбивает поток заметок на порции"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def wait_if_paused() -> bool:
+    """Ждет снятия паузы; False - задание остановлено"""
+    while app_state.batch_paused and app_state.batch_running:
+        time.sleep(0.2)
+    return app_state.batch_running
+
+
+def save_updates(q, run_id: str, updates: List, counts: Dict[str, int]) -> int:
+    """Контрольная точка порции; ошибки - в журнал. Возвращает число заметок"""
+    maintenance_store.checkpoint(run_id, updates)
+    for note_id, state, _, error in updates:
+        counts[state] = counts.get(state, 0) + 1
+        if state == ITEM_FAILED:
+            q.put(("batch_log", f"⚠️ Заметка {note_id}: {error}"))
+    return len(updates)
+
+
+def report_progress(q, icon: str, done: int, total: int, started: float, processed: int):
+    """Прогресс и скорость (заметок в минуту, оставшееся время)"""
+    elapsed = max(time.time() - started, 0.001)
+    rate = processed / elapsed
+    left = (total - done) / rate if rate else 0
+    q.put(("batch_progress", (done, total, f"{rate * 60:.0f} заметок/мин")))
+    q.put(("batch_log", f"{icon} {done}/{total} · {rate * 60:.0f} заметок/мин · осталось ~{left / 60:.1f} мин"))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Задания обслуживания коллекции (озвучка, перегенерация заметок).
+Задание - список ID заметок и состояние каждой из них. Состояние
+сохраняется пакетами после каждой порции, поэтому прерванное задание
+продолжается с места остановки: готовые заметки не обрабатываются повторно.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+MAINTENANCE_DB_NAME = "maintenance_jobs.sqlite3"
+
+# Состояния заметки
+ITEM_PENDING = "pending"    # Еще не обрабатывалась
+ITEM_READY = "ready"        # Результат подготовлен (аудио / новый текст), но не записан в Anki
+ITEM_DONE = "done"          # Заметка обновлена
+ITEM_SKIPPED = "skipped"    # Обновлять не нужно (например, звук уже есть)
+ITEM_FAILED = "failed"      # Ошибка (error)
+
+DONE_STATES = (ITEM_DONE, ITEM_SKIPPED)
+
+# Состояния задания
+JOB_RUNNING = "running"
+JOB_STOPPED = "stopped"
+JOB_DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT,
+    total INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_items (
+    run_id TEXT NOT NULL,
+    note_id INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    data TEXT,
+    error TEXT,
+    PRIMARY KEY (run_id, note_id)
+);
+CREATE INDEX IF NOT EXISTS idx_run_items_state ON run_items(run_id, state);
+"""
+
+# Обновление заметки в задании: (note_id, состояние, данные или None, ошибка или None)
+ItemUpdate = Tuple[int, str, Optional[Dict[str, Any]], Optional[str]]
+
+
+class MaintenanceStore:
+    """Хранилище заданий обслуживания (SQLite в user_files)"""
+
+    PAGE_SIZE = 500
+
+    def __init__(self, base_dir: str = None):
+        self._base_dir = base_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self._base_dir is None:
+                from core.settings_manager import get_base_data_dir
+                self._base_dir = os.path.join(get_base_data_dir(), "user_files")
+            os.makedirs(self._base_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self._base_dir, MAINTENANCE_DB_NAME),
+                                   timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def create_run(self, kind: str, note_ids: List[int], params: Dict = None) -> str:
+        """Создает задание для заметок, возвращает его ID"""
+        run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO runs (id, kind, created, updated, status, params, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, kind, now, now, JOB_RUNNING, json.dumps(params or {}, ensure_ascii=False), len(note_ids)))
+            db.executemany("INSERT OR IGNORE INTO run_items (run_id, note_id) VALUES (?, ?)",
+                           [(run_id, note_id) for note_id in note_ids])
+            db.commit()
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["params"] = json.loads(run["params"]) if run["params"] else {}
+        return run
+
+    def iter_unfinished(self, run_id: str) -> Iterator[Dict]:
+        """Незавершенные заметки задания по порядку ID (читаются страницами)"""
+        query = ("SELECT * FROM run_items WHERE run_id = ? AND note_id > ? AND state NOT IN (%s) "
+                 "ORDER BY note_id LIMIT ?" % ",".join("?" * len(DONE_STATES)))
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._db().execute(query, (run_id, last_id) + DONE_STATES + (self.PAGE_SIZE,)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                item = dict(row)
+                item["data"] = json.loads(item["data"]) if item["data"] else {}
+                yield item
+            last_id = rows[-1]["note_id"]
+
+    def checkpoint(self, run_id: str, updates: List[ItemUpdate]):
+        """Сохраняет состояние порции заметок одной транзакцией"""
+        if not updates:
+            return
+        rows = [(state, json.dumps(data, ensure_ascii=False) if data is not None else None, error, run_id, note_id)
+                for note_id, state, data, error in updates]
+        with self._lock:
+            db = self._db()
+            db.executemany("UPDATE run_items SET state = ?, data = COALESCE(?, data), error = ? "
+                           "WHERE run_id = ? AND note_id = ?", rows)
+            db.execute("UPDATE runs SET updated = ? WHERE id = ?", (time.time(), run_id))
+            db.commit()
+
+    def set_status(self, run_id: str, status: str):
+        with self._lock:
+            db = self._db()
+            db.execute("UPDATE runs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), run_id))
+            db.commit()
+
+    def progress(self, run_id: str) -> Dict[str, int]:
+        """Количество заметок задания по состояниям"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT state, COUNT(*) FROM run_items WHERE run_id = ? GROUP BY state", (run_id,)).fetchall()
+        return {state: count for state, count in rows}
+
+    def unfinished_runs(self, kind: str = None, limit: int = 20) -> List[Dict]:
+        """Незавершенные задания (одного вида или всех), новые первыми"""
+        query = "SELECT id FROM runs WHERE status != ?"
+        params: list = [JOB_DONE]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            rows = self._db().execute(query + " ORDER BY updated DESC LIMIT ?", params + [limit]).fetchall()
+        runs = []
+        for row in rows:
+            run = self.get_run(row["id"])
+            run["progress"] = self.progress(row["id"])
+            runs.append(run)
+        return runs
+
+    def finish(self, run_id: str) -> str:
+        """Завершает запуск: done, если все заметки обработаны, иначе stopped"""
+        progress = self.progress(run_id)
+        unfinished = sum(count for state, count in progress.items() if state not in DONE_STATES)
+        status = JOB_STOPPED if unfinished else JOB_DONE
+        self.set_status(run_id, status)
+        return status
+
+
+# Глобальное хранилище заданий обслуживания
+maintenance_store = MaintenanceStore()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Перегенерация перевода и контекста существующих заметок.
+Заметки выбираются по колоде или запросу Anki, генерируются текущими
+промптами (generate_translation: объединение запросов, маршрутизация
+моделей; без памяти переводов - иначе модель получила бы прежний перевод
+той же фразы примером) в несколько потоков и записываются порциями
+через updateNoteFields в multi. Меняются только поля Translation и
+Context - заметки и карточки не пересоздаются, история повторений
+сохраняется.
+
+Предпросмотр (dry run) ничего не пишет в Anki: новые тексты сохраняются
+в задании, а различия - в файл. Продолжение задания записывает уже
+сгенерированные результаты без повторной генерации.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from api.anki_api import anki_api, is_connection_error
+from core.app_state import app_state
+from core.workers import generate_translation, get_current_ai_provider
+from modules.maintenance.common import chunks, wait_if_paused, save_updates, report_progress
+from modules.maintenance.jobs import (
+    maintenance_store, DONE_STATES, ITEM_READY, ITEM_DONE, ITEM_SKIPPED, ITEM_FAILED,
+)
+
+
+REGENERATE_KIND = "regenerate"
+DEFAULT_CONCURRENCY = 4   # Одновременных запросов к модели
+WRITE_BATCH = 50          # Заметок в одном multi
+DIFF_PREVIEW_LINES = 3    # Сколько различий показать в журнале при предпросмотре
+
+
+def deck_query(deck: str) -> str:
+    """Запрос findNotes: заметки модели в колоде (с подколодами)"""
+    return '"note:%s" "deck:%s"' % (anki_api.model_name, deck.replace('"', '\\"'))
+
+
+def _field_to_text(value: str) -> str:
+    """Поле заметки -> текст (build_note заменяет переводы строк на <br>)"""
+    return value.replace("<br>", "\n").replace("<br/>", "\n").replace("<br />", "\n").strip()
+
+
+def _text_to_field(text: str) -> str:
+    return text.replace("\n", "<br>")
+
+
+def diff_path(run_id: str) -> str:
+    """Файл с различиями предпросмотра"""
+    from core.settings_manager import get_base_data_dir
+    return os.path.join(get_base_data_dir(), "user_files", f"regenerate-{run_id}.diff")
+
+
+def format_diff(note_id: int, data: Dict[str, str]) -> str:
+    """Различия одной заметки: старые строки с '-', новые с '+'"""
+    phrase = data["phrase"].replace("\n", " ")
+    lines = [f"# {note_id}: {phrase}"]
+    for field in ("translation", "context"):
+        old, new = data.get(f"old_{field}"), data.get(f"new_{field}")
+        if new is None or old == new:
+            continue
+        lines.append(f"@@ {field.capitalize()}")
+        lines += [f"- {line}" for line in old.splitlines() or [""]]
+        lines += [f"+ {line}" for line in new.splitlines() or [""]]
+    return "\n".join(lines) + "\n"
+
+
+def _current_model(provider) -> Optional[str]:
+    return app_state.ollama_model if provider.name == "Ollama" else None
+
+
+class _Batch:
+    """Порция заметок: запущенные генерации и готовые результаты"""
+
+    def __init__(self):
+        self.pending = []   # (note_id, data, future)
+        self.ready = []     # (note_id, data) - уже сгенерированы (продолжение)
+        self.updates = []   # Итоги без записи (пропуски, ошибки)
+
+
+def _prepare(pool: ThreadPoolExecutor, items: List[Dict], provider, model, with_context: bool,
+             use_memory: bool) -> _Batch:
+    """Читает текущие поля заметок и запускает генерацию"""
+    batch = _Batch()
+    todo = []
+    for item in items:
+        if item["state"] == ITEM_READY and "new_translation" in item["data"]:
+            batch.ready.append((item["note_id"], item["data"]))
+        else:
+            todo.append(item["note_id"])
+    if not todo:
+        return batch
+
+    field = anki_api.note_field
+    notes = {note.get("noteId"): note for note in anki_api.notes_info(todo)}
+    for note_id in todo:
+        note = notes.get(note_id)
+        if not note:
+            batch.updates.append((note_id, ITEM_SKIPPED, None, "заметка удалена"))
+            continue
+        data = {
+            "phrase": _field_to_text(field(note, "Phrase")),
+            "old_translation": _field_to_text(field(note, "Translation")),
+            "old_context": _field_to_text(field(note, "Context")),
+        }
+        if not data["phrase"]:
+            batch.updates.append((note_id, ITEM_FAILED, None, "пустая фраза"))
+            continue
+        future = pool.submit(generate_translation, provider, data["phrase"], with_context, model, use_memory)
+        batch.pending.append((note_id, data, future))
+    return batch
+
+
+def _collect(batch: _Batch, with_context: bool) -> Tuple[List, List]:
+    """Дожидается генерации порции: (заметки с изменениями, итоги без записи)"""
+    updates = list(batch.updates)
+    changed = []
+    for note_id, data in batch.ready:
+        changed.append((note_id, data))
+    for note_id, data, future in batch.pending:
+        try:
+            translation, context = future.result()
+        except Exception as e:
+            updates.append((note_id, ITEM_FAILED, None, f"генерация: {e}"))
+            continue
+        if not translation:
+            updates.append((note_id, ITEM_FAILED, None, "пустой перевод"))
+            continue
+        data["new_translation"] = translation.strip()
+        data["new_context"] = (context or "").strip() if with_context else None
+        if data["new_translation"] == data["old_translation"] and data["new_context"] in (None, data["old_context"]):
+            updates.append((note_id, ITEM_SKIPPED, data, None))
+        else:
+            changed.append((note_id, data))
+    return changed, updates
+
+
+def _write(changed: List[Tuple[int, Dict]]) -> List:
+    """Записывает новые поля порции одним multi (только Translation/Context)"""
+    actions = []
+    for note_id, data in changed:
+        fields = {"Translation": _text_to_field(data["new_translation"])}
+        if data.get("new_context") is not None:
+            fields["Context"] = _text_to_field(data["new_context"])
+        actions.append(("updateNoteFields", {"note": {"id": note_id, "fields": fields}}))
+    results = anki_api.multi(actions)
+    updates = []
+    for n, (note_id, data) in enumerate(changed):
+        error = results[n][1] if n < len(results) else "нет ответа"
+        if error:
+            updates.append((note_id, ITEM_FAILED, data, str(error)))
+        else:
+            updates.append((note_id, ITEM_DONE, data, None))
+    return updates
+
+
+def start_regenerate_run(query: str, with_context: bool, dry_run: bool = False,
+                         concurrency: int = DEFAULT_CONCURRENCY, deck: str = None) -> Optional[str]:
+    """
+    Создает задание перегенерации для заметок по запросу Anki.
+
+    Returns:
+        ID задания или None, если заметок нет
+
+    Raises:
+        Exception: ANKI_CONNECT_ERROR и ошибки AnkiConnect
+    """
+    note_ids = anki_api.find_notes_by_query(query)
+    if not note_ids:
+        return None
+    params = {"query": query, "deck": deck, "with_context": with_context,
+              "dry_run": dry_run, "concurrency": concurrency}
+    return maintenance_store.create_run(REGENERATE_KIND, sorted(note_ids), params)
+
+
+def regenerate_worker(q, audio_utils_module=None, query: str = None, deck: str = None,
+                      with_context: bool = True, dry_run: bool = False,
+                      concurrency: int = DEFAULT_CONCURRENCY, use_memory: bool = False, run_id: str = None):
+    """
+    Перегенерирует заметки (новое задание по колоде/запросу или продолжение run_id).
+    Продолжение всегда записывает результаты в Anki, в том числе сгенерированные
+    при предпросмотре. Общается с интерфейсом через очередь q.
+    """
+    app_state.batch_running = True
+    app_state.batch_paused = False
+    diff_file = None
+    try:
+        if run_id is None:
+            q.put(("batch_log", "🔎 Поиск заметок..."))
+            run_id = start_regenerate_run(query or deck_query(deck), with_context, dry_run, concurrency, deck)
+            if run_id is None:
+                q.put(("batch_log", "✅ Заметок по запросу нет."))
+                return
+        else:
+            dry_run = False
+        run = maintenance_store.get_run(run_id)
+        params = run["params"]
+        with_context = params["with_context"]
+        concurrency = max(1, int(params.get("concurrency") or DEFAULT_CONCURRENCY))
+        total = run["total"]
+        done = sum(count for state, count in maintenance_store.progress(run_id).items() if state in DONE_STATES)
+
+        provider = get_current_ai_provider()
+        model = _current_model(provider)
+        mode = "предпросмотр" if dry_run else "запись в Anki"
+        q.put(("batch_log", f"🔁 Перегенерация {total - done} из {total} заметок ({mode}, задание {run_id}, "
+                            f"{concurrency} потоков)..."))
+        if dry_run:
+            diff_file = open(diff_path(run_id), "a", encoding="utf-8")
+
+        started = time.time()
+        processed = 0
+        shown = 0
+        counts = {ITEM_READY: 0, ITEM_DONE: 0, ITEM_SKIPPED: 0, ITEM_FAILED: 0}
+
+        def finish_batch(batch):
+            nonlocal processed, shown
+            changed, updates = _collect(batch, with_context)
+            if dry_run:
+                for note_id, data in changed:
+                    diff = format_diff(note_id, data)
+                    diff_file.write(diff + "\n")
+                    if shown < DIFF_PREVIEW_LINES:
+                        q.put(("batch_log", diff.rstrip()))
+                        shown += 1
+                    updates.append((note_id, ITEM_READY, data, None))
+                diff_file.flush()
+            elif changed:
+                updates += _write(changed)
+            processed += save_updates(q, run_id, updates, counts)
+            report_progress(q, "🔁", done + processed, total, started, processed)
+
+        # В предпросмотре уже сгенерированные заметки не повторяются
+        items = maintenance_store.iter_unfinished(run_id)
+        if dry_run:
+            items = (item for item in items if item["state"] != ITEM_READY)
+        # Очередь пула - до двух порций: модель не простаивает, пока пишется предыдущая
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="regenerate") as pool:
+            previous = None
+            for batch_items in chunks(items, WRITE_BATCH):
+                if not wait_if_paused():
+                    break
+                current = _prepare(pool, batch_items, provider, model, with_context, use_memory)
+                if previous is not None:
+                    finish_batch(previous)
+                previous = current
+            if previous is not None:
+                if app_state.batch_running:
+                    finish_batch(previous)
+                else:
+                    for _, _, future in previous.pending:
+                        future.cancel()
+
+        if not app_state.batch_running:
+            q.put(("batch_log", "🛑 Перегенерация остановлена, задание можно продолжить."))
+        elapsed = time.time() - started
+        if dry_run:
+            q.put(("batch_log", f"🏁 Предпросмотр: изменится {counts[ITEM_READY]}, без изменений {counts[ITEM_SKIPPED]}, "
+                                f"ошибок {counts[ITEM_FAILED]} ({elapsed:.0f}с). Различия: {diff_path(run_id)}"))
+            q.put(("batch_log", "♻️ Чтобы записать результаты, продолжите задание в окне обслуживания."))
+        else:
+            q.put(("batch_log", f"🏁 Обновлено: {counts[ITEM_DONE]}, без изменений: {counts[ITEM_SKIPPED]}, "
+                                f"ошибок: {counts[ITEM_FAILED]} ({elapsed:.0f}с)"))
+    except Exception as e:
+        if is_connection_error(e):
+            q.put(("batch_log", "📡 Anki недоступен. Задание сохранено, его можно продолжить."))
+        else:
+            q.put(("batch_log", f"❌ Ошибка перегенерации: {e}"))
+    finally:
+        if diff_file is not None:
+            diff_file.close()
+        if run_id is not None:
+            maintenance_store.finish(run_id)
+        app_state.batch_running = False
+        q.put(("batch_done", True))
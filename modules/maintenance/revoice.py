@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Озвучка заметок без звука.
+Заметки с пустым полем Sound находятся одним findNotes. Аудио создается
+параллельно (gTTS с кэшем файлов), а загрузка в Anki идет порциями:
+storeMediaFile + updateNoteFields для всей порции одним запросом multi.
+Пока порция загружается, следующая уже озвучивается. Прогресс
+сохраняется после каждой порции (modules.maintenance.jobs).
+"""
+import base64
+import html
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from api.anki_api import anki_api, is_connection_error
+from core.app_state import app_state
+from modules.maintenance.common import chunks, wait_if_paused, save_updates, report_progress
+from modules.maintenance.jobs import (
+    maintenance_store, DONE_STATES, ITEM_DONE, ITEM_SKIPPED, ITEM_FAILED,
+)
+
+
+REVOICE_KIND = "revoice"
+TTS_WORKERS = 4       # Параллельных запросов к gTTS
+UPLOAD_BATCH = 50     # Заметок в одном multi (аудио в Base64 - запрос не должен быть огромным)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def speech_text(phrase: str) -> str:
+    """Текст для озвучки из поля заметки (без HTML)"""
+    return _SPACE_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", phrase))).strip()
+
+
+def empty_sound_query(field: str, deck: str = None) -> str:
+    """Запрос findNotes: заметки модели с пустым полем звука (в колоде, если указана)"""
+    query = f'"note:{anki_api.model_name}" "{field}:"'
+    if deck:
+        query += ' "deck:%s"' % deck.replace('"', '\\"')
+    return query
+
+
+class _Batch:
+    """Порция заметок: запущенная озвучка и уже известные результаты"""
+
+    def __init__(self):
+        self.pending = []   # (note_id, phrase, future)
+        self.updates = []   # Итоги без загрузки (пропуски, ошибки)
+
+
+def _prepare(pool: ThreadPoolExecutor, items: List[Dict], field: str, audio_utils_module) -> _Batch:
+    """Проверяет заметки (звук могли добавить вручную) и запускает озвучку"""
+    batch = _Batch()
+    notes = {note.get("noteId"): note for note in anki_api.notes_info([item["note_id"] for item in items])}
+    for item in items:
+        note_id = item["note_id"]
+        note = notes.get(note_id)
+        if not note:
+            batch.updates.append((note_id, ITEM_SKIPPED, None, "заметка удалена"))
+            continue
+        if anki_api.note_field(note, field).strip():
+            batch.updates.append((note_id, ITEM_SKIPPED, None, None))
+            continue
+        phrase = speech_text(anki_api.note_field(note, "Phrase"))
+        if not phrase:
+            batch.updates.append((note_id, ITEM_FAILED, None, "пустая фраза"))
+            continue
+        future = pool.submit(audio_utils_module.generate_audio, phrase, debug=False, cache=True)
+        batch.pending.append((note_id, phrase, future))
+    return batch
+
+
+def _upload(batch: _Batch, field: str) -> List:
+    """Дожидается озвучки порции и записывает ее в Anki одним multi"""
+    updates = list(batch.updates)
+    ready = []
+    for note_id, phrase, future in batch.pending:
+        try:
+            path = future.result()
+        except Exception as e:
+            updates.append((note_id, ITEM_FAILED, None, f"TTS: {e}"))
+            continue
+        if not path or not os.path.exists(path):
+            updates.append((note_id, ITEM_FAILED, None, "TTS не создал файл"))
+            continue
+        ready.append((note_id, path))
+
+    actions = []
+    for note_id, path in ready:
+        filename = os.path.basename(path)
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("utf-8")
+        actions.append(("storeMediaFile", {"filename": filename, "data": data}))
+        actions.append(("updateNoteFields", {"note": {"id": note_id, "fields": {field: f"[sound:{filename}]"}}}))
+    results = anki_api.multi(actions)
+
+    for n, (note_id, path) in enumerate(ready):
+        store_error = results[2 * n][1] if 2 * n < len(results) else "нет ответа"
+        update_error = results[2 * n + 1][1] if 2 * n + 1 < len(results) else "нет ответа"
+        error = store_error or update_error
+        if error:
+            updates.append((note_id, ITEM_FAILED, None, str(error)))
+        else:
+            updates.append((note_id, ITEM_DONE, {"file": os.path.basename(path)}, None))
+    return updates
+
+
+def start_revoice_run(deck: str = None) -> Optional[str]:
+    """
+    Создает задание озвучки для заметок без звука.
+
+    Returns:
+        ID задания или None, если таких заметок нет
+
+    Raises:
+        Exception: ANKI_CONNECT_ERROR и ошибки AnkiConnect
+    """
+    field = anki_api.sound_field()
+    query = empty_sound_query(field, deck)
+    note_ids = anki_api.find_notes_by_query(query)
+    if not note_ids:
+        return None
+    return maintenance_store.create_run(REVOICE_KIND, sorted(note_ids), {"deck": deck, "field": field, "query": query})
+
+
+def revoice_worker(q, audio_utils_module, deck: str = None, run_id: str = None):
+    """
+    Озвучивает заметки без звука (новое задание для колоды или продолжение run_id).
+    Общается с интерфейсом через очередь q теми же сообщениями, что и пакетная обработка.
+    """
+    app_state.batch_running = True
+    app_state.batch_paused = False
+    try:
+        if run_id is None:
+            q.put(("batch_log", "🔎 Поиск заметок без звука..."))
+            run_id = start_revoice_run(deck)
+            if run_id is None:
+                q.put(("batch_log", "✅ Заметок без звука нет."))
+                return
+        run = maintenance_store.get_run(run_id)
+        field = run["params"]["field"]
+        total = run["total"]
+        done = sum(count for state, count in maintenance_store.progress(run_id).items() if state in DONE_STATES)
+        q.put(("batch_log", f"🔊 Озвучка {total - done} из {total} заметок (задание {run_id}, "
+                            f"{TTS_WORKERS} потока, порции по {UPLOAD_BATCH})..."))
+
+        started = time.time()
+        processed = 0
+        counts = {ITEM_DONE: 0, ITEM_SKIPPED: 0, ITEM_FAILED: 0}
+        with ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="revoice-tts") as pool:
+            previous = None
+            for items in chunks(maintenance_store.iter_unfinished(run_id), UPLOAD_BATCH):
+                if not wait_if_paused():
+                    break
+                # Следующая порция озвучивается, пока загружается предыдущая
+                current = _prepare(pool, items, field, audio_utils_module)
+                if previous is not None:
+                    processed += save_updates(q, run_id, _upload(previous, field), counts)
+                    report_progress(q, "🔊", done + processed, total, started, processed)
+                previous = current
+            if previous is not None:
+                if app_state.batch_running:
+                    processed += save_updates(q, run_id, _upload(previous, field), counts)
+                    report_progress(q, "🔊", done + processed, total, started, processed)
+                else:
+                    for _, _, future in previous.pending:
+                        future.cancel()
+
+        if not app_state.batch_running:
+            q.put(("batch_log", "🛑 Озвучка остановлена, задание можно продолжить."))
+        elapsed = time.time() - started
+        q.put(("batch_log", f"🏁 Озвучено: {counts[ITEM_DONE]}, пропущено: {counts[ITEM_SKIPPED]}, "
+                            f"ошибок: {counts[ITEM_FAILED]} ({elapsed:.0f}с)"))
+    except Exception as e:
+        if is_connection_error(e):
+            q.put(("batch_log", "📡 Anki недоступен. Задание сохранено, его можно продолжить."))
+        else:
+            q.put(("batch_log", f"❌ Ошибка озвучки: {e}"))
+    finally:
+        if run_id is not None:
+            maintenance_store.finish(run_id)
+        app_state.batch_running = False
+        q.put(("batch_done", True))
+
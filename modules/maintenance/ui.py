@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Окно обслуживания коллекции: озвучка заметок без звука, перегенерация
+перевода и контекста, продолжение незавершенных заданий.
+Задания выполняются в фоне и пишут в журнал пакетной панели; пауза и
+остановка - теми же кнопками.
+"""
+import threading
+import time
+
+import customtkinter as ctk
+
+from api.anki_api import anki_api
+from core.app_state import app_state
+from modules.maintenance.jobs import maintenance_store, DONE_STATES, ITEM_FAILED
+from modules.maintenance.revoice import REVOICE_KIND, revoice_worker
+from modules.maintenance.regenerate import REGENERATE_KIND, DEFAULT_CONCURRENCY, regenerate_worker
+
+# Вид задания -> подпись
+KIND_LABELS = {
+    REVOICE_KIND: "🔊 Озвучка",
+    REGENERATE_KIND: "🔁 Перегенерация",
+}
+
+# Вид задания -> воркер (продолжение по run_id)
+WORKERS = {
+    REVOICE_KIND: revoice_worker,
+    REGENERATE_KIND: regenerate_worker,
+}
+
+
+def _current_deck() -> str:
+    from core.deck_catalog import deck_catalog
+    deck_var = app_state.main_window_components.get("vars", {}).get("deck_var")
+    return deck_catalog.name_of(deck_var.get()) if deck_var else ""
+
+
+def _run_in_background(panel, target, **kwargs):
+    from core import audio_utils
+    panel.set_running_state()
+    threading.Thread(target=target, args=(app_state.results_queue, audio_utils), kwargs=kwargs, daemon=True).start()
+
+
+def open_maintenance_dialog(panel):
+    """Показывает задания обслуживания; panel - пакетная панель (журнал, пауза, стоп)"""
+    if app_state.batch_running:
+        return
+
+    dialog = ctk.CTkToplevel(panel)
+    dialog.title("Обслуживание")
+    dialog.geometry("560x620")
+    dialog.transient(panel)
+    dialog.grab_set()
+    dialog.focus_force()
+
+    deck = _current_deck()
+    scope_var = ctk.StringVar(value="deck" if deck else "all")
+
+    # 1. Озвучка заметок без звука
+    ctk.CTkLabel(dialog, text="🔊 Озвучить заметки без звука", font=("Roboto", 14, "bold")).pack(pady=(15, 5), padx=15, anchor="w")
+    scope_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+    scope_frame.pack(fill="x", padx=15)
+    if deck:
+        ctk.CTkRadioButton(scope_frame, text=f"Колода {deck}", variable=scope_var, value="deck").pack(side="left", padx=(0, 10))
+    ctk.CTkRadioButton(scope_frame, text="Все колоды", variable=scope_var, value="all").pack(side="left")
+
+    def start_revoice():
+        dialog.destroy()
+        _run_in_background(panel, revoice_worker, deck=deck if scope_var.get() == "deck" else None)
+
+    ctk.CTkButton(dialog, text="▶ Запустить", width=120, fg_color="#10B981", hover_color="#059669",
+                  command=start_revoice).pack(padx=15, pady=(8, 0), anchor="w")
+
+    # 2. Перегенерация перевода и контекста текущими промптами
+    ctk.CTkLabel(dialog, text="🔁 Перегенерировать перевод и контекст", font=("Roboto", 14, "bold")).pack(pady=(20, 5), padx=15, anchor="w")
+    query_entry = ctk.CTkEntry(dialog, placeholder_text="Запрос Anki (пусто - выбранная выше область)")
+    query_entry.pack(fill="x", padx=15)
+    options_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+    options_frame.pack(fill="x", padx=15, pady=(5, 0))
+    context_default = app_state.main_window_components.get("vars", {}).get("context_var")
+    context_var = ctk.BooleanVar(value=context_default.get() if context_default else True)
+    dry_run_var = ctk.BooleanVar(value=True)
+    ctk.CTkCheckBox(options_frame, text="С контекстом", variable=context_var).pack(side="left", padx=(0, 10))
+    ctk.CTkCheckBox(options_frame, text="Только предпросмотр", variable=dry_run_var).pack(side="left", padx=(0, 10))
+    ctk.CTkLabel(options_frame, text="Потоков:").pack(side="left")
+    concurrency_entry = ctk.CTkEntry(options_frame, width=45)
+    concurrency_entry.insert(0, str(DEFAULT_CONCURRENCY))
+    concurrency_entry.pack(side="left", padx=5)
+
+    def start_regenerate():
+        concurrency = concurrency_entry.get().strip()
+        query = query_entry.get().strip()
+        scope_deck = deck if scope_var.get() == "deck" else None
+        if not query and not scope_deck:
+            query = f'"note:{anki_api.model_name}"'
+        dialog.destroy()
+        _run_in_background(panel, regenerate_worker, query=query or None, deck=scope_deck,
+                           with_context=context_var.get(), dry_run=dry_run_var.get(),
+                           concurrency=int(concurrency) if concurrency.isdigit() else DEFAULT_CONCURRENCY)
+
+    ctk.CTkButton(dialog, text="▶ Запустить", width=120, fg_color="#10B981", hover_color="#059669",
+                  command=start_regenerate).pack(padx=15, pady=(8, 0), anchor="w")
+
+    # 3. Незавершенные задания (предпросмотр перегенерации продолжается записью в Anki)
+    runs = maintenance_store.unfinished_runs()
+    ctk.CTkLabel(dialog, text="Незавершенные задания:", font=("Roboto", 14, "bold")).pack(pady=(20, 5), padx=15, anchor="w")
+    runs_frame = ctk.CTkScrollableFrame(dialog)
+    runs_frame.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+    if not runs:
+        ctk.CTkLabel(runs_frame, text="Нет", text_color=("#888888", "#888888")).pack(anchor="w")
+
+    def resume(run):
+        dialog.destroy()
+        _run_in_background(panel, WORKERS[run["kind"]], run_id=run["id"])
+
+    for run in runs:
+        if run["kind"] not in WORKERS:
+            continue
+        progress = run["progress"]
+        done = sum(count for state, count in progress.items() if state in DONE_STATES)
+        failed = progress.get(ITEM_FAILED, 0)
+        created = time.strftime("%d.%m %H:%M", time.localtime(run["created"]))
+        scope = run["params"].get("deck") or run["params"].get("query") or "все колоды"
+        if run["params"].get("dry_run"):
+            scope += "  👁"
+
+        row = ctk.CTkFrame(runs_frame, fg_color="transparent")
+        row.pack(fill="x", pady=3)
+        ctk.CTkLabel(
+            row,
+            text=f"{created}  {KIND_LABELS.get(run['kind'], run['kind'])}  {scope}\n✅ {done}/{run['total']}   ❌ {failed}",
+            justify="left", anchor="w"
+        ).pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(
+            row, text="▶", width=40,
+            fg_color="#10B981", hover_color="#059669",
+            command=lambda run=run: resume(run)
+        ).pack(side="right")
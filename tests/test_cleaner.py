@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Тесты деления текста на фрагменты и склейки (modules.batch_generator.cleaner)"""
+from modules.batch_generator.cleaner import split_chunks, stitch
+
+
+def _paragraph(n: int, size: int) -> str:
+    text = f"Absatz {n}: " + "Das ist ein Satz. " * (size // 18 + 1)
+    return text[:size].strip()
+
+
+def test_empty_text():
+    assert split_chunks("") == []
+    assert split_chunks("\n\n  \n\n") == []
+
+
+def test_short_text_is_one_chunk():
+    text = "Erster Absatz.\n\nZweiter Absatz."
+    assert split_chunks(text, max_chars=2000) == [text]
+
+
+def test_large_paragraphs_drop_overlap():
+    paragraphs = [_paragraph(n, 1500) for n in range(6)]
+    chunks = split_chunks("\n\n".join(paragraphs), max_chars=2000)
+
+    assert chunks == paragraphs
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+
+
+def test_overlap_kept_when_it_fits():
+    paragraphs = [_paragraph(n, 400) for n in range(10)]
+    chunks = split_chunks("\n\n".join(paragraphs), max_chars=2000)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.startswith(previous.split("\n\n")[-1])
+
+
+def test_every_paragraph_in_order():
+    paragraphs = [_paragraph(n, 300 + 97 * n) for n in range(12)]
+    chunks = split_chunks("\n\n".join(paragraphs), max_chars=1500)
+
+    seen = []
+    for chunk in chunks:
+        for paragraph in chunk.split("\n\n"):
+            if not seen or seen[-1] != paragraph:
+                seen.append(paragraph)
+    assert seen == paragraphs
+
+
+def test_long_paragraph_split_by_lines():
+    block = "\n".join(f"Zeile {n} mit etwas Text." for n in range(200))
+    chunks = split_chunks(block, max_chars=500, overlap=0)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert "\n".join(chunks).split("\n") == block.split("\n")
+
+
+def test_stitch_removes_seam_repeats():
+    results = [["Eins.", "Zwei."], ["Zwei.", "Drei."], ["drei", "Vier."]]
+    assert stitch(results) == ["Eins.", "Zwei.", "Drei.", "Vier."]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Тесты кэша колод (core.deck_catalog): счетчики только для видимых колод"""
+import time
+
+from core.deck_catalog import DROPDOWN_LIMIT, DeckCatalog, dropdown_values
+
+TOP = ["Default"] + [f"Top{i}" for i in range(5)]
+SUB = [f"Top{i % 5}::Sub{i}" for i in range(DROPDOWN_LIMIT + 100)]
+
+
+class FakeAPI:
+    def __init__(self, names):
+        self.names = names
+        self.counted = []
+
+    def deck_names(self):
+        return list(self.names)
+
+    def deck_stats(self, decks):
+        self.counted += decks
+        return {name: 3 for name in decks}
+
+    @staticmethod
+    def clean_deck_name(label):
+        return label.rsplit(" (", 1)[0]
+
+
+def test_small_tree_counts_every_deck():
+    api = FakeAPI(TOP + SUB[:10])
+    catalog = DeckCatalog(api)
+    catalog.refresh()
+    catalog.fill_counts()
+    assert sorted(api.counted) == sorted(TOP + SUB[:10])
+
+
+def test_large_tree_counts_only_dropdown():
+    api = FakeAPI(TOP + SUB)
+    catalog = DeckCatalog(api)
+    labels = catalog.refresh(selected="Top3::Sub3")
+    catalog.fill_counts(current="Top3::Sub3")
+    assert sorted(api.counted) == sorted(TOP + ["Top3::Sub3"])
+    shown = [catalog.name_of(label) for label in dropdown_values(catalog.labels(), catalog.label("Top3::Sub3"))]
+    assert set(shown) <= set(api.counted)
+    assert len(labels) == len(TOP + SUB)
+
+
+def test_search_counts_results_in_background():
+    api = FakeAPI(TOP + SUB)
+    catalog = DeckCatalog(api)
+    catalog.refresh()
+    names = [catalog.name_of(label) for label in catalog.search("sub12", limit=5)]
+    deadline = time.time() + 2
+    while not set(names) <= set(api.counted) and time.time() < deadline:
+        time.sleep(0.01)
+    assert set(names) <= set(api.counted)
+    assert catalog.search("sub12", limit=5) == [f"{name} (3)" for name in names]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Тесты поиска колод по мере ввода (core.deck_index)"""
+from core.deck_index import DeckIndex
+
+DECKS = [
+    "Deutsch",
+    "Deutsch::Verben",
+    "Deutsch::Verben::Unregelmäßig",
+    "Deutsch::Nomen",
+    "German Verbs",
+    "Englisch::Vokabeln",
+    "YouTube::Serien (Staffel 2)",
+]
+
+
+def test_empty_query_returns_top_level_sorted():
+    assert DeckIndex(DECKS + ["Anki"]).search("") == ["Anki", "Deutsch", "German Verbs"]
+
+
+def test_path_prefix_first():
+    assert DeckIndex(DECKS).search("deutsch::verben")[:2] == ["Deutsch::Verben", "Deutsch::Verben::Unregelmäßig"]
+
+
+def test_word_prefixes_in_order():
+    result = DeckIndex(DECKS).search("ger verb")
+    assert result[0] == "German Verbs"
+    assert "Deutsch::Verben" not in result[:1]
+
+
+def test_leaf_match_ranks_before_parent_path():
+    result = DeckIndex(DECKS).search("verben")
+    assert result[0] == "Deutsch::Verben"
+    assert "Deutsch::Verben::Unregelmäßig" in result
+
+
+def test_substring_and_case():
+    assert "YouTube::Serien (Staffel 2)" in DeckIndex(DECKS).search("STAFFEL")
+
+
+def test_fuzzy_subsequence():
+    assert DeckIndex(DECKS).search("dtschnmn")[0] == "Deutsch::Nomen"
+
+
+def test_limit_and_rebuild():
+    index = DeckIndex([f"Deck {n:04d}" for n in range(5000)])
+    assert len(index.search("deck", limit=10)) == 10
+    index.rebuild(["Neu::Deck"])
+    assert len(index) == 1
+    assert index.search("deck") == ["Neu::Deck"]
+    assert index.search("zzz") == []
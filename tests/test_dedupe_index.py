@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Тесты индекса дубликатов (core.dedupe_index)"""
+from itertools import combinations
+
+from core.dedupe_index import DuplicateIndex, _ngrams, normalize_phrase
+
+
+def _index(phrases):
+    index = DuplicateIndex()
+    index.replace_all(list(enumerate(phrases, start=1)))
+    return index
+
+
+def test_normalize_phrase():
+    assert normalize_phrase("Ich gehe nach Hause.") == "ich gehe nach hause"
+    assert normalize_phrase("  Ich <b>gehe</b>&nbsp;nach<br>Hause! ") == "ich gehe nach hause"
+    assert normalize_phrase("...") == ""
+
+
+def test_exact_ignores_case_and_punctuation():
+    index = _index(["Ich gehe nach Hause.", "Er kommt."])
+    assert index.find_exact("ich gehe nach hause") == [1]
+    assert index.lookup("Er kommt?") == [2]
+    assert index.lookup("Sie kommt.") == []
+
+
+def test_similar_only_above_threshold():
+    index = _index(["Wir haben uns lange nicht gesehen", "Das kommt darauf an"])
+    assert index.lookup("Wir haben uns lange nicht gesehen!!") == [1]
+    assert index.lookup("Wir haben uns so lange nicht gesehen", threshold=0.8) == [1]
+    assert index.lookup("Wir haben uns so lange nicht gesehen", threshold=0.99) == []
+    assert index.lookup("Wir haben uns so lange nicht gesehen") == []
+
+
+def test_prefix_filtering_matches_brute_force():
+    phrases = [f"Satz {a} und {b} mit Wort {a * b}" for a, b in combinations(range(12), 2)]
+    index = _index(phrases)
+    query = "Satz 3 und 7 mit Wort 21"
+    query_grams = _ngrams(normalize_phrase(query))
+    for threshold in (0.5, 0.7, 0.9):
+        expected = set()
+        for phrase in phrases:
+            grams = _ngrams(normalize_phrase(phrase))
+            if 2 * len(query_grams & grams) / (len(query_grams) + len(grams)) >= threshold:
+                expected.add(normalize_phrase(phrase))
+        found = {key for key, _, _ in index.find_similar(query, threshold, limit=len(phrases))}
+        assert found == expected
+
+
+def test_add_update_remove():
+    index = DuplicateIndex()
+    index.add(1, "Guten Morgen")
+    index.add(2, "guten morgen!")
+    assert index.find_exact("Guten Morgen.") == [1, 2]
+
+    index.add(1, "Gute Nacht")
+    assert index.find_exact("Guten Morgen") == [2]
+    assert index.find_exact("gute nacht") == [1]
+
+    index.remove(2)
+    index.remove(99)
+    assert index.find_exact("Guten Morgen") == []
+    assert index.find_similar("Guten Morgen", 0.5) == []
+    assert len(index) == 1
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Тесты хранилища заданий пакетной обработки (modules.batch_generator.jobs)"""
+import pytest
+
+from modules.batch_generator.jobs import JobStore
+
+
+def _store(tmp_path, chunk=3):
+    store = JobStore(str(tmp_path))
+    store.INSERT_CHUNK = chunk
+    return store
+
+
+def test_create_job_stores_all_phrases(tmp_path):
+    store = _store(tmp_path)
+    job_id = store.create_job(iter(["eins", "zwei", "drei", "vier"]), "Deutsch", True, False)
+    assert store.get_job(job_id)["total"] == 4
+    assert [item["phrase"] for item in store.iter_items(job_id)] == ["eins", "zwei", "drei", "vier"]
+
+
+def test_failing_source_leaves_no_job(tmp_path):
+    store = _store(tmp_path)
+
+    def phrases():
+        yield from ["eins", "zwei", "drei", "vier"]
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    with pytest.raises(UnicodeDecodeError):
+        store.create_job(phrases(), "Deutsch", True, False)
+    # Следующая запись на том же соединении не сохраняет остатки упавшего задания
+    job_id = store.create_job(["fünf"], "Deutsch", True, False)
+    assert [job["id"] for job in store.unfinished_jobs()] == [job_id]
+    assert store._db().execute("SELECT COUNT(*) FROM job_items").fetchone()[0] == 1
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Тесты очереди исходящих заметок (core.outbox) с поддельным Anki"""
+import time
+
+import pytest
+
+from core import outbox as outbox_module
+from core.outbox import AnkiOutbox
+
+
+class FakeAnki:
+    """Поддельный AnkiConnect: заметки в словаре, ID - время создания в мс"""
+
+    def __init__(self):
+        self.notes = {}
+        self.sent = []          # Заметки, пришедшие в add_notes
+        self.fail_with = None   # Ошибка следующего add_note / add_notes
+        self.apply_on_fail = False  # Таймаут, после которого заметка все же добавлена
+
+    def _store(self, phrase, translation):
+        note_id = max([int(time.time() * 1000)] + [n + 1 for n in self.notes])
+        self.notes[note_id] = {"Phrase": phrase, "Translation": translation}
+        return note_id
+
+    def add_note(self, phrase, translation, context, deck_name, audio_path=None, allow_duplicate=False):
+        if self.fail_with:
+            if self.apply_on_fail:
+                self._store(phrase, translation)
+            raise Exception(self.fail_with)
+        return self._store(phrase, translation)
+
+    @staticmethod
+    def build_note(phrase, translation, context, deck_name, audio_path=None, allow_duplicate=False):
+        return {"phrase": phrase, "translation": translation}
+
+    def add_notes(self, notes):
+        if self.fail_with:
+            raise Exception(self.fail_with)
+        self.sent += notes
+        return [(self._store(note["phrase"], note["translation"]), None) for note in notes]
+
+    def find_notes_by_query(self, query):
+        return [note_id for note_id, note in self.notes.items() if query == f'Phrase:"{note["Phrase"]}"']
+
+    def notes_info(self, note_ids):
+        return [{"noteId": note_id, "fields": {name: {"value": value} for name, value in self.notes[note_id].items()}}
+                for note_id in note_ids]
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def note_added(self, *args):
+        self.calls.append(args)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    anki = FakeAnki()
+    for name in ("add_note", "build_note", "add_notes", "find_notes_by_query", "notes_info"):
+        monkeypatch.setattr(outbox_module.anki_api, name, getattr(anki, name))
+    mirror, catalog = Recorder(), Recorder()
+    monkeypatch.setattr(outbox_module, "anki_mirror", mirror)
+    monkeypatch.setattr(outbox_module, "deck_catalog", catalog)
+    return AnkiOutbox(str(tmp_path)), anki, mirror, catalog, tmp_path
+
+
+def _audio(tmp_path, name="a.mp3"):
+    path = tmp_path / name
+    path.write_bytes(b"mp3")
+    return str(path)
+
+
+def _kept_audio(outbox):
+    return [row[0] for row in outbox._db().execute("SELECT audio_path FROM outbox")]
+
+
+def test_timeout_applied_by_anki_is_not_sent_again(env):
+    outbox, anki, mirror, catalog, tmp_path = env
+    anki.fail_with, anki.apply_on_fail = "ANKI_TIMEOUT_ERROR", True
+    status, _ = outbox.submit("der Arm", "рука", "", "Deutsch", _audio(tmp_path))
+    assert status == "queued"
+    audio = _kept_audio(outbox)[0]
+
+    anki.fail_with = None
+    assert outbox.flush() == 1
+    assert anki.sent == []
+    assert len(anki.notes) == 1
+    assert outbox.counts() == {"pending": 0, "failed": 0, "delivered": 1}
+    assert len(mirror.calls) == 1 and catalog.calls == [("Deutsch",)]
+    assert not (tmp_path / audio).exists()
+
+
+def test_timeout_not_applied_is_sent_again(env):
+    outbox, anki, mirror, catalog, tmp_path = env
+    anki.fail_with = "ANKI_TIMEOUT_ERROR"
+    outbox.submit("der Arm", "рука", "", "Deutsch")
+
+    anki.fail_with = None
+    assert outbox.flush() == 1
+    assert [note["phrase"] for note in anki.sent] == ["der Arm"]
+    assert len(anki.notes) == 1 and len(mirror.calls) == 1
+
+
+def test_found_notes_complete_when_sending_the_rest_fails(env):
+    outbox, anki, mirror, catalog, tmp_path = env
+    anki.fail_with, anki.apply_on_fail = "ANKI_TIMEOUT_ERROR", True
+    outbox.submit("der Arm", "рука", "", "Deutsch", _audio(tmp_path, "arm.mp3"))
+    anki.apply_on_fail = False
+    outbox.enqueue("das Bein", "нога", "", "Deutsch")
+    found_audio = _kept_audio(outbox)[0]
+
+    anki.fail_with = "ANKI_CONNECT_ERROR"
+    with pytest.raises(Exception, match="ANKI_CONNECT_ERROR"):
+        outbox.flush()
+    assert outbox.counts() == {"pending": 1, "failed": 0, "delivered": 1}
+    assert [call[1] for call in mirror.calls] == ["der Arm"]
+    assert catalog.calls == [("Deutsch",)]
+    assert not (tmp_path / found_audio).exists()
+    attempts = outbox._db().execute("SELECT phrase, attempts, last_error FROM outbox").fetchall()
+    assert attempts == [("das Bein", 1, "ANKI_CONNECT_ERROR")]
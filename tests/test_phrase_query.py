@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""Тесты экранирования фразы в поиске Anki"""
+from api.anki_api import AnkiAPI
+
+
+def test_plain_phrase():
+    assert AnkiAPI.phrase_query("der Arm") == 'Phrase:"der Arm"'
+
+
+def test_quote_and_backslash():
+    assert AnkiAPI.phrase_query('C:\\') == 'Phrase:"C\\:\\\\"'
+    assert AnkiAPI.phrase_query('Er sagt "ja"') == 'Phrase:"Er sagt \\"ja\\""'
+
+
+def test_wildcards_are_literal():
+    assert AnkiAPI.phrase_query("a*b_c") == 'Phrase:"a\\*b\\_c"'
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Тесты локальной разбивки на предложения (modules.batch_generator.segmenter)"""
+from modules.batch_generator.segmenter import clean_line, segment_text, split_sentences
+
+
+def test_split_simple_sentences():
+    assert split_sentences("Ich komme. Kommst du? Ja!") == ["Ich komme.", "Kommst du?", "Ja!"]
+
+
+def test_abbreviations_do_not_split():
+    text = "Wir kaufen z.B. Äpfel usw. Dann gehen wir zu Dr. Müller."
+    assert split_sentences(text) == ["Wir kaufen z.B. Äpfel usw. Dann gehen wir zu Dr. Müller."]
+
+
+def test_date_ordinal_does_not_split():
+    assert split_sentences("Am 3. Oktober ist Feiertag. Wir feiern.") == [
+        "Am 3. Oktober ist Feiertag.", "Wir feiern."]
+
+
+def test_quotes_and_ellipsis():
+    text = "Er sagte: „Ich komme.“ Dann ging er… Später kam sie."
+    assert split_sentences(text) == ["Er sagte: „Ich komme.“", "Dann ging er…", "Später kam sie."]
+
+
+def test_number_before_dot_is_ambiguous():
+    ambiguous = set()
+    sentences = split_sentences("Er war 30. Dann zog er um.", ambiguous)
+    assert sentences == ["Er war 30. Dann zog er um."]
+    assert ambiguous == {0}
+
+
+def test_clean_line_subtitle_markup():
+    assert clean_line("12") == ""
+    assert clean_line("00:01:02,500 --> 00:01:04,000") == ""
+    assert clean_line("<i>ANNA: Hallo [Musik] du</i>") == "Hallo du"
+    assert clean_line("- Wie geht's?") == "Wie geht's?"
+
+
+def test_subtitles_joined_into_sentences():
+    srt = ("1\n00:00:01,000 --> 00:00:02,000\nIch weiß nicht,\n\n"
+           "2\n00:00:02,000 --> 00:00:03,000\nwas du meinst.\n")
+    assert segment_text(srt).sentences == ["Ich weiß nicht, was du meinst."]
+
+
+def test_duplicates_and_short_fragments_removed():
+    result = segment_text("Das ist gut.\nDas ist gut!\nJa.", min_words=2)
+    assert result.sentences == ["Das ist gut."]
+    assert result.duplicates == 1
+    assert result.filtered == 1
+
+
+def test_one_per_line_keeps_lines():
+    result = segment_text("Guten Morgen. Wie geht's?\nDanke", one_per_line=True)
+    assert result.sentences == ["Guten Morgen. Wie geht's?", "Danke"]
+
+
+def test_long_unterminated_text_is_ambiguous():
+    text = " ".join(["Wort"] * 20)
+    result = segment_text(text)
+    assert result.sentences == [text]
+    assert result.ambiguous == {0}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Тесты памяти переводов (core.translation_memory)"""
+import sqlite3
+
+from core.translation_memory import TM_DB_NAME, TranslationMemory
+
+PROMPT = "Переведи: {phrase}"
+
+
+def _memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path))
+    memory.load()
+    return memory
+
+
+def test_reuse_only_for_same_model(tmp_path):
+    memory = _memory(tmp_path)
+    memory.record("Er kommt.", False, PROMPT, "Ollama:gemma3:1b", "Он приходит.")
+    assert memory.match("Er kommt.", False, PROMPT, "Ollama:gemma3:1b").reuse == ("Он приходит.", "")
+    other = memory.match("Er kommt.", False, PROMPT, "Ollama:gemma3:4b")
+    assert other.reuse is None
+    assert other.examples == []  # Прежний перевод той же фразы - не пример
+
+
+def test_models_keep_separate_entries(tmp_path):
+    memory = _memory(tmp_path)
+    memory.record("Er kommt.", False, PROMPT, "a", "Он приходит.")
+    memory.record("Er kommt.", False, PROMPT, "b", "Он идет.")
+    assert memory.match("Er kommt.", False, PROMPT, "a").reuse[0] == "Он приходит."
+    assert memory.match("Er kommt.", False, PROMPT, "b").reuse[0] == "Он идет."
+
+
+def test_punctuation_and_prompt_block_reuse(tmp_path):
+    memory = _memory(tmp_path)
+    memory.record("Er kommt.", False, PROMPT, "a", "Он приходит.")
+    assert memory.match("Er kommt?", False, PROMPT, "a").reuse is None
+    assert memory.match("Er kommt.", False, PROMPT + "!", "a").reuse is None
+    assert memory.match("Er kommt.", True, PROMPT, "a").reuse is None
+
+
+def test_old_table_is_migrated_without_model(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / TM_DB_NAME))
+    conn.executescript("""
+        CREATE TABLE memory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, with_context INTEGER NOT NULL,
+            prompt_hash TEXT NOT NULL, phrase TEXT NOT NULL, translation TEXT NOT NULL,
+            context TEXT NOT NULL, created REAL NOT NULL, UNIQUE (key, with_context, prompt_hash));
+        INSERT INTO memory VALUES (1, 'er kommt', 0, 'x', 'Er kommt.', 'Он приходит.', '', 0);
+    """)
+    conn.commit()
+    conn.close()
+    memory = _memory(tmp_path)
+    assert len(memory) == 1
+    assert memory.match("Er kommt.", False, PROMPT, "a").reuse is None
+    assert memory.match("Er kommt nicht.", False, PROMPT, "a", example_threshold=0.3).examples == [
+        ("Er kommt.", "Он приходит.")]
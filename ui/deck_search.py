@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск колоды по мере ввода в поле выбора колоды.
+Под полем открывается список лучших совпадений (core.deck_index):
+стрелки - выбор, Enter - подтвердить, Escape - отмена. Отрисовывается
+только несколько десятков строк, даже если колод тысячи.
+"""
+import tkinter as tk
+
+POPUP_ROWS = 12
+_NAVIGATION_KEYS = {"Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "Shift_L", "Shift_R",
+                    "Control_L", "Control_R", "Alt_L", "Alt_R", "Left", "Right", "Home", "End"}
+
+
+def attach_deck_search(combo, var, search, has_deck):
+    """
+    Подключает поиск к полю CTkComboBox.
+
+    Args:
+        combo: поле выбора колоды
+        var: переменная поля
+        search: callback(text) -> подписи подходящих колод
+        has_deck: callback(text) -> True, если текст - существующая колода (подпись или имя)
+    """
+    state = {"popup": None, "listbox": None, "before": None}
+
+    def hide(restore=False):
+        if state["popup"] is not None:
+            state["popup"].destroy()
+            state["popup"] = state["listbox"] = None
+        # Недописанный текст не должен остаться выбранной колодой
+        if restore and state["before"] is not None and not has_deck(var.get()):
+            var.set(state["before"])
+        state["before"] = None
+
+    def choose(event=None):
+        listbox = state["listbox"]
+        if listbox is not None and listbox.curselection():
+            var.set(listbox.get(listbox.curselection()[0]))
+            state["before"] = None
+        hide(restore=True)
+        return "break"
+
+    def show(results):
+        if state["popup"] is None:
+            popup = tk.Toplevel(combo)
+            popup.wm_overrideredirect(True)
+            listbox = tk.Listbox(popup, font=("Roboto", 11), activestyle="none", borderwidth=1,
+                                 highlightthickness=0, selectmode="browse", exportselection=False)
+            listbox.pack(fill="both", expand=True)
+            listbox.bind("<ButtonRelease-1>", choose)
+            state["popup"], state["listbox"] = popup, listbox
+        listbox = state["listbox"]
+        listbox.delete(0, "end")
+        for label in results:
+            listbox.insert("end", label)
+        listbox.configure(height=min(POPUP_ROWS, len(results)))
+        listbox.selection_set(0)
+        state["popup"].wm_geometry(f"{combo.winfo_width()}x{listbox.winfo_reqheight()}"
+                                   f"+{combo.winfo_rootx()}+{combo.winfo_rooty() + combo.winfo_height()}")
+        state["popup"].lift()
+
+    def on_key(event):
+        if event.keysym in _NAVIGATION_KEYS or str(combo.cget("state")) != "normal":
+            return
+        if state["before"] is None:
+            state["before"] = var.get() if has_deck(var.get()) else None
+        text = var.get()
+        results = search(text) if text.strip() else []
+        if results:
+            show(results)
+        elif state["popup"] is not None:
+            state["popup"].destroy()
+            state["popup"] = state["listbox"] = None
+
+    def move(step):
+        listbox = state["listbox"]
+        if listbox is None or not listbox.size():
+            return None
+        current = listbox.curselection()
+        index = min(max((current[0] if current else -1) + step, 0), listbox.size() - 1)
+        listbox.selection_clear(0, "end")
+        listbox.selection_set(index)
+        listbox.see(index)
+        return "break"
+
+    combo.bind("<KeyRelease>", on_key, add=True)
+    combo.bind("<Down>", lambda e: move(1), add=True)
+    combo.bind("<Up>", lambda e: move(-1), add=True)
+    combo.bind("<Return>", lambda e: choose() if state["popup"] is not None else None, add=True)
+    combo.bind("<Escape>", lambda e: hide(restore=True), add=True)
+    # Щелчок по списку тоже уводит фокус из поля: закрываем с задержкой, чтобы выбор успел сработать
+    combo.bind("<FocusOut>", lambda e: combo.after(150, lambda: hide(restore=True)), add=True)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Окно истории карточек.
+Поиск по мере ввода по всем созданным карточкам (FTS5), просмотр
+перевода и контекста, открытие карточки в главном окне или повторное
+добавление в Anki без обращения к модели.
+"""
+import time
+import tkinter as tk
+from datetime import datetime
+
+import customtkinter as ctk
+
+from core.history import history_store
+from core.localization import localization_manager
+
+
+SEARCH_DELAY_MS = 120  # Пауза после ввода перед поиском
+
+
+def format_entry(entry) -> str:
+    """Строка списка: дата, фраза, перевод"""
+    date = datetime.fromtimestamp(entry["created"]).strftime("%d.%m.%y")
+    translation = entry["translation"].replace("\n", " ")
+    return f"{date}  {entry['phrase']}  —  {translation}"
+
+
+def format_details(entry) -> str:
+    """Подробности карточки для нижней панели"""
+    lines = [entry["phrase"], "", entry["translation"]]
+    if entry["context"]:
+        lines += ["", entry["context"]]
+    meta = [entry["deck"], entry["model"], entry["preset"]]
+    if entry["generation_seconds"]:
+        meta.append(f"{entry['generation_seconds']:.1f}с")
+    if entry["status"] == "queued":
+        meta.append("📥")
+    lines += ["", " · ".join(part for part in meta if part)]
+    return "\n".join(lines)
+
+
+def open_history_window(parent, on_open, on_readd):
+    """
+    Открывает окно истории.
+
+    Args:
+        on_open: callback(entry) - показать карточку в главном окне
+        on_readd: callback(entry) - добавить карточку в Anki повторно
+    """
+    win = ctk.CTkToplevel(parent)
+    win.title(localization_manager.get_text("history"))
+    win.geometry("720x520")
+    win.transient(parent)
+
+    query_var = tk.StringVar()
+    entry_field = ctk.CTkEntry(win, textvariable=query_var,
+                               placeholder_text=localization_manager.get_text("history_search"))
+    entry_field.pack(fill="x", padx=10, pady=(10, 5))
+
+    status_label = ctk.CTkLabel(win, text="", font=("Roboto", 10), text_color=("#888888", "#888888"))
+    status_label.pack(anchor="w", padx=12)
+
+    # Обычный Listbox: сотни строк перерисовываются мгновенно, в отличие от виджетов CTk
+    list_frame = ctk.CTkFrame(win)
+    list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+    listbox = tk.Listbox(list_frame, font=("Roboto", 11), activestyle="none", borderwidth=0,
+                         highlightthickness=0, selectmode="browse")
+    scrollbar = ctk.CTkScrollbar(list_frame, command=listbox.yview)
+    listbox.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    listbox.pack(side="left", fill="both", expand=True)
+
+    details = ctk.CTkTextbox(win, height=130, wrap="word")
+    details.pack(fill="x", padx=10, pady=5)
+    details.configure(state="disabled")
+
+    state = {"results": [], "job": None}
+
+    def selected():
+        selection = listbox.curselection()
+        return state["results"][selection[0]] if selection else None
+
+    def show_details(event=None):
+        entry = selected()
+        details.configure(state="normal")
+        details.delete("1.0", "end")
+        if entry:
+            details.insert("1.0", format_details(entry))
+        details.configure(state="disabled")
+
+    def run_search():
+        state["job"] = None
+        start = time.perf_counter()
+        results = history_store.search(query_var.get())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        state["results"] = results
+        listbox.delete(0, "end")
+        for entry in results:
+            listbox.insert("end", format_entry(entry))
+        if results:
+            listbox.selection_set(0)
+            status_label.configure(text=localization_manager.get_text("history_count", count=len(results), ms=elapsed_ms))
+        else:
+            status_label.configure(text=localization_manager.get_text("history_empty"))
+        show_details()
+
+    def schedule_search(*_):
+        if state["job"]:
+            win.after_cancel(state["job"])
+        state["job"] = win.after(SEARCH_DELAY_MS, run_search)
+
+    def open_selected(event=None):
+        entry = selected()
+        if entry:
+            on_open(entry)
+            win.destroy()
+
+    def readd_selected():
+        entry = selected()
+        if entry:
+            on_readd(entry)
+            win.destroy()
+
+    buttons = ctk.CTkFrame(win, fg_color="transparent")
+    buttons.pack(fill="x", padx=10, pady=(0, 10))
+    ctk.CTkButton(buttons, text=localization_manager.get_text("history_open"), width=120,
+                  command=open_selected).pack(side="left")
+    ctk.CTkButton(buttons, text=localization_manager.get_text("history_readd"), width=140,
+                  fg_color="#2CC985", hover_color="#26AD72", command=readd_selected).pack(side="left", padx=10)
+
+    query_var.trace_add("write", schedule_search)
+    listbox.bind("<<ListboxSelect>>", show_details)
+    listbox.bind("<Double-Button-1>", open_selected)
+    entry_field.bind("<Return>", open_selected)
+    win.bind("<Escape>", lambda e: win.destroy())
+
+    run_search()
+    entry_field.focus_set()
+    return win
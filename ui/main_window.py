@@ -15,6 +15,8 @@ from ui.theme_manager import theme_manager
 from core.clipboard_manager import setup_text_widget_context_menu, GlobalClipboardManager
 from core.localization import localization_manager
 from modules.batch_generator.ui import create_batch_panel
+from ui.deck_search import attach_deck_search
+from core.deck_catalog import dropdown_values
 
 
 class ToolTip:
@@ -196,7 +198,8 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
                 right_panel[0] = create_batch_panel(
                     master_container, 
                     dependencies.start_batch_processing,
-                    dependencies.stop_batch_processing
+                    dependencies.stop_batch_processing,
+                    dependencies.resume_batch_processing
                 )
             
             # Показываем правую панель
@@ -245,6 +248,50 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
     help_btn.pack(side="left", padx=(5, 5))
     ToolTip(help_btn, localization_manager.get_text("help_tooltip"))
 
+    # Статистика AI провайдеров (задержки, токены/сек)
+    def open_stats():
+        from ui.stats_window import open_stats_window
+        open_stats_window(root)
+    
+    widgets["stats_btn"] = ctk.CTkButton(header_frame, text="📊", width=40, height=30,
+                                         fg_color="transparent", border_width=1, command=open_stats)
+    widgets["stats_btn"].pack(side="left", padx=(0, 5))
+    ToolTip(widgets["stats_btn"], localization_manager.get_text("stats_tooltip"))
+
+    # Последние карточки: время этапов от перехвата до Anki
+    def open_traces():
+        from ui.trace_window import open_trace_window
+        open_trace_window(root)
+
+    widgets["traces_btn"] = ctk.CTkButton(header_frame, text="⏱", width=40, height=30,
+                                          fg_color="transparent", border_width=1, command=open_traces)
+    widgets["traces_btn"].pack(side="left", padx=(0, 5))
+    ToolTip(widgets["traces_btn"], localization_manager.get_text("traces_tooltip"))
+
+    # История карточек: найти прошлый перевод без повторной генерации
+    def show_history_entry(entry):
+        """Показывает карточку из истории в полях главного окна"""
+        main_window_components["original_phrase"] = entry["phrase"]
+        app_state.last_generation = {"phrase": entry["phrase"], "model": entry["model"], "seconds": None}
+        for name, value in (("german_text", entry["phrase"]), ("translation_text", entry["translation"]),
+                            ("context_widget", entry["context"])):
+            widgets[name].configure(text_color=("gray10", "gray90"))
+            widgets[name].delete("1.0", tk.END)
+            widgets[name].insert("1.0", value)
+
+    def readd_history_entry(entry):
+        show_history_entry(entry)
+        main_window_components.get("on_yes_action_func", lambda: None)()
+
+    def open_history():
+        from ui.history_window import open_history_window
+        open_history_window(root, show_history_entry, readd_history_entry)
+
+    widgets["history_btn"] = ctk.CTkButton(header_frame, text="🕘", width=40, height=30,
+                                           fg_color="transparent", border_width=1, command=open_history)
+    widgets["history_btn"].pack(side="left", padx=(0, 5))
+    ToolTip(widgets["history_btn"], localization_manager.get_text("history_tooltip"))
+
     # Кнопка Пакет в правой части хедера (как было раньше)
     # Используем закругления с одной стороны (15, 0, 0, 15) для обратного эффекта "стрелки"
     batch_btn = ctk.CTkButton(header_frame, text="Пакет ➔", width=80, height=30, 
@@ -441,6 +488,7 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
             from core.prompts_manager import prompts_manager
             preset = prompts_manager.get_preset(choice)
             if preset:
+                app_state.prompt_preset = choice
                 new_translate = preset.get("translate", preset.get("translation", ""))
                 new_context = preset.get("context", "")
                 new_delimiter = preset.get("delimiter", "КОНТЕКСТ")
@@ -573,16 +621,41 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
     widgets["deck_combo"] = ctk.CTkComboBox(deck_frame, variable=tvars["deck_var"], values=initial_deck_values, state="disabled")
     widgets["deck_combo"].pack(side="left", fill="x", expand=True, padx=5, pady=5)
     ToolTip(widgets["deck_combo"], localization_manager.get_text("deck_selection_tooltip"))
+    attach_deck_search(widgets["deck_combo"], tvars["deck_var"], dependencies.search_decks, dependencies.has_deck)
     
     def refresh_decks_button():
+        """Обновляет список колод в фоне: запрос к Anki не блокирует окно"""
+        current_full = tvars["deck_var"].get()
+        current_clean = dependencies.clean_deck_name(current_full) if hasattr(dependencies, 'clean_deck_name') else current_full
+        
+        def worker():
+            try:
+                decks = dependencies.get_deck_names(current_clean, force=True)
+            except Exception as e:
+                print(f"Ошибка обновления колод: {e}")
+                return
+            root.after(0, lambda: apply_decks(decks, current_full, current_clean))
+            if isinstance(decks, list) and decks:
+                # Счетчики остальных колод - следом, список уже можно выбирать
+                dependencies.fill_deck_counts(lambda labels: root.after(0, lambda: update_deck_labels(labels)), force=True)
+        
+        dependencies.threading.Thread(target=worker, daemon=True).start()
+    
+    def update_deck_labels(labels):
+        if str(widgets["deck_combo"].cget("state")) != "normal":
+            return
+        widgets["deck_combo"].configure(values=dropdown_values(labels, dependencies.deck_label(tvars["deck_var"].get())))
+        current_clean = dependencies.clean_deck_name(tvars["deck_var"].get())
+        for label in labels:
+            if dependencies.clean_deck_name(label) == current_clean:
+                tvars["deck_var"].set(label)
+                break
+    
+    def apply_decks(decks, current_full, current_clean):
         try:
-            current_full = tvars["deck_var"].get()
-            current_clean = dependencies.clean_deck_name(current_full) if hasattr(dependencies, 'clean_deck_name') else current_full
-            
-            decks = dependencies.get_deck_names()
             if isinstance(decks, list) and decks:
                 cached_decks[:] = decks
-                widgets["deck_combo"].configure(values=decks, state="normal")
+                widgets["deck_combo"].configure(values=dropdown_values(decks, dependencies.deck_label(current_clean)), state="normal")
                 
                 found_match = False
                 if current_clean:
@@ -617,9 +690,9 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
         """Создает новую колоду используя универсальный диалог"""
         new_name = ask_string_dialog(root, localization_manager.get_text("create_deck"), localization_manager.get_text("new_deck_name"))
         if new_name and dependencies.create_deck(new_name):
-            decks = dependencies.get_deck_names() or [new_name]
-            widgets["deck_combo"].configure(values=decks)
-            tvars["deck_var"].set(new_name)
+            dependencies.deck_added(new_name)
+            widgets["deck_combo"].configure(values=dropdown_values(dependencies.deck_labels(), dependencies.deck_label(new_name)) or [new_name], state="normal")
+            tvars["deck_var"].set(dependencies.deck_label(new_name))
             messagebox.showinfo(localization_manager.get_text("success"), localization_manager.get_text("deck_created", name=new_name))
     
     widgets["create_deck_btn"] = ctk.CTkButton(deck_frame, text="+", width=30, command=on_create_deck)
@@ -643,6 +716,10 @@ def populate_main_window(dependencies, root, settings, main_frame, widgets, tvar
     widgets["prompt_status_label"] = ctk.CTkLabel(status_left_frame, text="", font=("Roboto", 10), text_color=("#888888", "#888888"))
     widgets["prompt_status_label"].pack(side="left", padx=0)
     
+    widgets["outbox_label"] = ctk.CTkLabel(status_left_frame, text="", font=("Roboto", 10), text_color=("#d4a05a", "#d4a05a"))
+    widgets["outbox_label"].pack(side="left", padx=(10, 0))
+    ToolTip(widgets["outbox_label"], localization_manager.get_text("outbox_tooltip"))
+    
     add_to_anki_frame = ctk.CTkFrame(action_frame, fg_color="transparent")
     add_to_anki_frame.pack(side="right", padx=5)
     
@@ -9,6 +9,7 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox
 import threading
+import json
 
 from core import audio_utils
 from ui.theme_manager import theme_manager
@@ -16,7 +17,7 @@ from core.clipboard_manager import setup_text_widget_context_menu
 from core.settings_manager import save_settings, get_user_dir
 from core.prompts_manager import prompts_manager, update_active_prompts, rename_prompt_preset
 from core.app_state import app_state
-from ui.main_window import ask_string_dialog
+from ui.main_window import ask_string_dialog, ToolTip
 from core.localization import localization_manager
 
 # Импорт извлеченных модулей вкладок
@@ -113,6 +114,16 @@ def open_settings_window(parent, dependencies=None, settings=None, initial_tab=N
         settings["OPENROUTER_API_KEY"] = ai_vars["openrouter_key_var"].get()
         settings["OPENROUTER_MODEL"] = ai_vars["openrouter_model_var"].get()
         settings["GOOGLE_API_KEY"] = ai_vars["google_key_var"].get()
+        settings["AI_FALLBACK_PROVIDERS"] = ai_vars["fallback_var"].get().strip()
+        settings["AI_HEDGING"] = ai_vars["hedging_var"].get()
+        settings["MODEL_ROUTING_ENABLED"] = ai_vars["model_routing_var"].get()
+        try:
+            rules = json.loads(ai_vars["routing_rules_editor"].get("1.0", "end-1c").strip() or "[]")
+            if not isinstance(rules, list):
+                raise ValueError("ожидается список правил")
+            settings["MODEL_ROUTING_RULES"] = rules
+        except ValueError as e:
+            messagebox.showwarning(localization_manager.get_text("warning"), f"Правила выбора модели не сохранены:\n{e}", parent=win)
         settings["UI_LANGUAGE"] = theme_vars["language_map"].get(theme_vars["language_var"].get(), "ru")
         
         # Промпты
@@ -142,6 +153,10 @@ def open_settings_window(parent, dependencies=None, settings=None, initial_tab=N
         app_state.openrouter_api_key = settings.get("OPENROUTER_API_KEY", "")
         app_state.openrouter_model = settings.get("OPENROUTER_MODEL", "")
         app_state.google_api_key = settings.get("GOOGLE_API_KEY", "")
+        app_state.ai_fallback_providers = settings.get("AI_FALLBACK_PROVIDERS", "")
+        app_state.ai_hedging = settings.get("AI_HEDGING", False)
+        app_state.model_routing_enabled = settings.get("MODEL_ROUTING_ENABLED", False)
+        app_state.model_routing_rules = settings.get("MODEL_ROUTING_RULES", [])
         
         
         audio_utils.update_tts_settings(settings["TTS_LANG"], settings["TTS_SPEED_LEVEL"], settings["TTS_TLD"])
@@ -176,6 +191,32 @@ def _create_ai_tab(tab_ai, settings, win):
     provider_combo = ctk.CTkComboBox(provider_row, variable=provider_var, values=["ollama", "openrouter", "google"], width=150)
     provider_combo.pack(side="left")
     
+    # Резервные провайдеры и хеджирование
+    routing_row = ctk.CTkFrame(tab_ai, fg_color="transparent")
+    routing_row.pack(fill="x", padx=10, pady=(0, 10))
+    
+    ctk.CTkLabel(routing_row, text=localization_manager.get_text("fallback_providers_label")).pack(side="left", padx=(0, 10))
+    fallback_var = tk.StringVar(value=settings.get("AI_FALLBACK_PROVIDERS", ""))
+    fallback_entry = ctk.CTkEntry(routing_row, textvariable=fallback_var, width=160)
+    fallback_entry.pack(side="left")
+    setup_text_widget_context_menu(fallback_entry)
+    
+    hedging_var = tk.BooleanVar(value=settings.get("AI_HEDGING", False))
+    ctk.CTkCheckBox(routing_row, text=localization_manager.get_text("hedging_label"), variable=hedging_var).pack(side="left", padx=(15, 0))
+    
+    # Выбор модели по длине фразы (правила в JSON)
+    routing_rules_frame = ctk.CTkFrame(tab_ai, fg_color="transparent")
+    routing_rules_frame.pack(fill="x", padx=10, pady=(0, 10))
+    
+    model_routing_var = tk.BooleanVar(value=settings.get("MODEL_ROUTING_ENABLED", False))
+    ctk.CTkCheckBox(routing_rules_frame, text=localization_manager.get_text("model_routing_label"), variable=model_routing_var).pack(anchor="w")
+    
+    routing_rules_editor = ctk.CTkTextbox(routing_rules_frame, height=60, font=("Consolas", 11))
+    routing_rules_editor.pack(fill="x", pady=(5, 0))
+    routing_rules_editor.insert("1.0", json.dumps(settings.get("MODEL_ROUTING_RULES", []), ensure_ascii=False))
+    setup_text_widget_context_menu(routing_rules_editor)
+    ToolTip(routing_rules_editor, localization_manager.get_text("model_routing_tooltip"))
+    
     # Контейнер для настроек провайдеров
     provider_settings_container = ctk.CTkFrame(tab_ai)
     provider_settings_container.pack(fill="both", expand=True, padx=10, pady=5)
@@ -301,7 +342,11 @@ def _create_ai_tab(tab_ai, settings, win):
         "ollama_model_var": ollama_model_var,
         "openrouter_key_var": openrouter_key_var,
         "openrouter_model_var": openrouter_model_var,
-        "google_key_var": google_key_var
+        "google_key_var": google_key_var,
+        "fallback_var": fallback_var,
+        "hedging_var": hedging_var,
+        "model_routing_var": model_routing_var,
+        "routing_rules_editor": routing_rules_editor
     }
 
 
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Окно статистики AI провайдеров.
+Показывает p50/p95 задержки, время до первого токена, разбивку на
+загрузку модели / prefill / decode и скорость генерации.
+"""
+import customtkinter as ctk
+
+from api.ai.metrics import metrics_registry
+from core.localization import localization_manager
+
+
+REFRESH_MS = 2000
+
+
+def format_stats_table(rows) -> str:
+    """Форматирует сводку метрик в моноширинную таблицу"""
+    if not rows:
+        return localization_manager.get_text("stats_empty")
+
+    text = localization_manager.get_text
+    header = (f"{text('stats_col_model'):<34}{text('stats_col_requests'):>6}{text('stats_col_errors'):>6}"
+              f"{'p50':>8}{'p95':>8}{'TTFT':>8}{text('stats_col_queue'):>8}{text('stats_col_load'):>8}"
+              f"{'prefill':>9}{'decode':>8}{text('stats_col_speed'):>8}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        name = f"{row['provider']} / {row['model']}"
+        if len(name) > 33:
+            name = name[:32] + "…"
+        lines.append(
+            f"{name:<34}{row['requests']:>6}{row['errors']:>6}"
+            f"{row['latency_p50']:>7.2f}s{row['latency_p95']:>7.2f}s"
+            f"{row['ttft_p50']:>7.2f}s{row['queue_wait_p95']:>7.2f}s"
+            f"{row['load_p50']:>7.2f}s{row['prefill_p50']:>8.2f}s{row['decode_p50']:>7.2f}s"
+            f"{row['tokens_per_sec']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def open_stats_window(parent):
+    """Открывает окно статистики (обновляется раз в 2 секунды)"""
+    win = ctk.CTkToplevel(parent)
+    win.title(localization_manager.get_text("stats"))
+    win.geometry("900x320")
+    win.transient(parent)
+
+    text = ctk.CTkTextbox(win, font=("Consolas", 12), wrap="none")
+    text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+    def render():
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        text.insert("1.0", format_stats_table(metrics_registry.snapshot()))
+        text.configure(state="disabled")
+
+    def refresh():
+        if not win.winfo_exists():
+            return
+        render()
+        win.after(REFRESH_MS, refresh)
+
+    def reset():
+        metrics_registry.reset()
+        render()
+
+    ctk.CTkButton(win, text=localization_manager.get_text("stats_reset"), command=reset, width=120).pack(pady=(0, 10))
+    refresh()
+    return win
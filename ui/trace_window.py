@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Окно последних карточек: время каждого этапа от перехвата буфера до
+добавления в Anki (очереди, дубликаты, генерация, озвучка, Anki, интерфейс)
+и p50/p95 по этапам. Под таблицей - интервалы последней карточки.
+"""
+import customtkinter as ctk
+
+from core.localization import localization_manager
+from core.tracing import tracer, format_traces_table, format_trace_detail
+
+
+REFRESH_MS = 2000
+LAST_CARDS = 20
+
+
+def open_trace_window(parent):
+    """Открывает окно последних карточек (обновляется раз в 2 секунды)"""
+    win = ctk.CTkToplevel(parent)
+    win.title(localization_manager.get_text("traces"))
+    win.geometry("1040x480")
+    win.transient(parent)
+
+    text = ctk.CTkTextbox(win, font=("Consolas", 12), wrap="none")
+    text.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def render():
+        records = tracer.recent(LAST_CARDS)
+        content = localization_manager.get_text("traces_empty")
+        if records:
+            content = format_traces_table(records) + "\n\n" + format_trace_detail(records[0])
+        text.configure(state="normal")
+        text.delete("1.0", "end")
+        text.insert("1.0", content)
+        text.configure(state="disabled")
+
+    def refresh():
+        if not win.winfo_exists():
+            return
+        render()
+        win.after(REFRESH_MS, refresh)
+
+    refresh()
+    return win